@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""Benchmark registration inserts: one insert_one per request (direct) versus
+the group-commit RegistrationWriteQueue (buffered).
+
+Needs a running MongoDB (MONGO_URL). Everything is written to a throwaway
+database, BENCH_DB_NAME (default: campus_events_bench), which is dropped
+afterwards. About 1% of the requests are duplicates so the per-document
+error path is exercised too.
+
+Usage: python bench_registrations.py [requests...]   (default: 2000 20000)
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "campus_events_bench")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import server  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", "500"))
+
+
+def make_registrations(n):
+    rng = random.Random(42)
+    docs = []
+    for i in range(n):
+        # Duplicates repeat the (event_id, user_id) of an earlier request
+        original = rng.randrange(i) if i and rng.random() < 0.01 else i
+        docs.append({
+            "registration_id": f"reg_{uuid.uuid4().hex[:12]}",
+            "event_id": f"event_{original % 20:012x}",
+            "user_id": f"user_{original:012x}",
+            "team_name": None,
+            "team_members": None,
+            "payment_status": "pending",
+            "status": "active",
+            "certificate_type": None,
+            "created_at": datetime.now(timezone.utc)
+        })
+    return docs
+
+
+async def run(insert, docs):
+    gate = asyncio.Semaphore(CONCURRENCY)
+    duplicates = 0
+
+    async def request(doc):
+        nonlocal duplicates
+        async with gate:
+            try:
+                await insert(dict(doc))
+            except DuplicateKeyError:
+                duplicates += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(doc) for doc in docs))
+    return time.perf_counter() - start, duplicates
+
+
+async def reset():
+    await server.db.registrations.drop()
+    await server.db.registrations.create_index([("event_id", 1), ("user_id", 1)], unique=True)
+    await server.db.registrations.create_index([("registration_id", 1)], unique=True)
+
+
+async def main(sizes):
+    print(f"concurrency {CONCURRENCY}, batch <= {server.REGISTRATION_BATCH_MAX_DOCS} docs / "
+          f"{server.REGISTRATION_BATCH_MAX_WAIT_MS:g} ms")
+    print(f"{'requests':>10}{'path':>10}{'seconds':>10}{'req/s':>10}{'dupes':>8}")
+    try:
+        for n in sizes:
+            docs = make_registrations(n)
+
+            await reset()
+            elapsed, dupes = await run(server.db.registrations.insert_one, docs)
+            print(f"{n:>10}{'direct':>10}{elapsed:>10.2f}{n / elapsed:>10.0f}{dupes:>8}")
+
+            await reset()
+            writer = server.RegistrationWriteQueue(
+                server.REGISTRATION_BATCH_MAX_DOCS, server.REGISTRATION_BATCH_MAX_WAIT_MS, n
+            )
+            writer.start()
+            elapsed, dupes = await run(writer.insert, docs)
+            await writer.close()
+            print(f"{n:>10}{'buffered':>10}{elapsed:>10.2f}{n / elapsed:>10.0f}{dupes:>8}"
+                  f"   ({writer.batches} batches)")
+    finally:
+        await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(a) for a in sys.argv[1:]] or [2000, 20000]))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Stress the atomic seat reservation: fire many concurrent
+create_registration calls at one event with a fixed capacity and check
+that it never overbooks.
+
+Needs a running MongoDB (MONGO_URL). Everything is written to a throwaway
+database, BENCH_DB_NAME (default: campus_events_bench), which is dropped
+afterwards. Each run is done twice: with the waitlist enabled (the
+overflow is queued) and disabled (the overflow is rejected as full).
+
+Usage: python bench_reservations.py [requests] [capacity]   (default: 1000 50)
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "campus_events_bench")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import server  # noqa: E402
+from fastapi import HTTPException, Response  # noqa: E402
+
+
+def make_users(n):
+    now = datetime.now(timezone.utc)
+    return [
+        server.User(user_id=f"user_{i:012x}", email=f"stress{i}@example.edu", name=f"Student {i}", created_at=now)
+        for i in range(n)
+    ]
+
+
+async def create_event(capacity, waitlist_enabled):
+    event_id = f"event_{uuid.uuid4().hex[:12]}"
+    await server.db.events.insert_one({
+        "event_id": event_id,
+        "title": "Stress test",
+        "status": "active",
+        "capacity": capacity,
+        "seats_taken": 0,
+        "teams_registered": 0,
+        "waitlist_enabled": waitlist_enabled,
+        "event_date": datetime.now(timezone.utc) + timedelta(days=30),
+        "deadline": datetime.now(timezone.utc) + timedelta(days=7),
+        "created_at": datetime.now(timezone.utc)
+    })
+    return event_id
+
+
+async def run(users, capacity, waitlist_enabled):
+    event_id = await create_event(capacity, waitlist_enabled)
+    outcomes = {"registered": 0, "waitlisted": 0, "rejected": 0}
+
+    async def request(user):
+        response = Response()
+        try:
+            await server.create_registration(server.RegistrationCreate(event_id=event_id), response, user)
+        except HTTPException:
+            outcomes["rejected"] += 1
+            return
+        outcomes["waitlisted" if response.status_code == 202 else "registered"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(user) for user in users))
+    elapsed = time.perf_counter() - start
+
+    event = await server.db.events.find_one({"event_id": event_id}, {"_id": 0, "seats_taken": 1})
+    active = await server.db.registrations.count_documents(
+        {"event_id": event_id, "status": {"$in": server.ACTIVE_REGISTRATION_STATUSES}}
+    )
+    queued = await server.db.waitlist.count_documents({"event_id": event_id})
+    overflow = len(users) - capacity
+    assert event["seats_taken"] == capacity, f"seats_taken {event['seats_taken']} != capacity {capacity}"
+    assert active == capacity, f"{active} active registrations != capacity {capacity}"
+    assert outcomes["registered"] == capacity, outcomes
+    if waitlist_enabled:
+        assert outcomes["waitlisted"] == queued == overflow, (outcomes, queued)
+    else:
+        assert outcomes["rejected"] == overflow and queued == 0, (outcomes, queued)
+    return elapsed, outcomes
+
+
+async def main(requests, capacity):
+    assert requests > capacity, "requests must exceed capacity to exercise the full-event path"
+    await server.sync_indexes()
+    users = make_users(requests)
+    print(f"{requests} concurrent registrations, capacity {capacity}")
+    print(f"{'waitlist':>10}{'seconds':>10}{'registered':>12}{'waitlisted':>12}{'rejected':>10}")
+    try:
+        for waitlist_enabled in (True, False):
+            elapsed, outcomes = await run(users, capacity, waitlist_enabled)
+            print(f"{'on' if waitlist_enabled else 'off':>10}{elapsed:>10.2f}{outcomes['registered']:>12}"
+                  f"{outcomes['waitlisted']:>12}{outcomes['rejected']:>10}")
+        print("OK: no overbooking")
+    finally:
+        await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(*(args + [1000, 50][len(args):])))
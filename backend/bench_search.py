@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Benchmark the in-process event search index against the old regex path.
+
+The regex path is reproduced in-process: an unanchored, case-insensitive
+regex applied to title and description of every event, which is what Mongo
+does for `$regex` without a usable index (a full collection scan).
+
+Usage: python bench_search.py [sizes...]   (default: 10000 100000)
+"""
+
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# server.py reads these at import time; no connection is made by the benchmark
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+from server import EventSearchIndex  # noqa: E402
+
+# Zipf-ish vocabulary: a few very common words, a long tail of rare ones
+COMMON = (
+    "coding hackathon robotics quiz debate music dance drama art photography "
+    "football cricket chess workshop seminar startup pitch design gaming "
+    "marathon poetry science expo treasure hunt cultural technical fest"
+).split()
+_rng = random.Random(7)
+RARE = ["".join(_rng.choices("abcdefghijklmnopqrstuvwxyz", k=_rng.randint(4, 10))) for _ in range(20000)]
+WORDS = COMMON + RARE
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+CATEGORIES = ["technical", "cultural", "sports", "workshop"]
+QUERIES = ["hackathon", "robotics workshop", "photo", "treasure hunt", "mara"]
+
+
+def make_events(n):
+    rng = random.Random(42)
+    base = datetime.now(timezone.utc)
+    for i in range(n):
+        yield {
+            "event_id": f"event_{i:012x}",
+            "title": " ".join(rng.choices(WORDS, WEIGHTS, k=3)).title(),
+            "description": " ".join(rng.choices(WORDS, WEIGHTS, k=30)),
+            "status": "active",
+            "category": rng.choice(CATEGORIES),
+            "event_type": rng.choice(["single", "team"]),
+            "event_date": base + timedelta(days=rng.randint(0, 365))
+        }
+
+
+def regex_search(events, query):
+    pattern = re.compile(query, re.IGNORECASE)
+    hits = [e for e in events if pattern.search(e["title"]) or pattern.search(e["description"])]
+    hits.sort(key=lambda e: e["event_date"])
+    return hits[:100]
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(sizes):
+    for n in sizes:
+        events = list(make_events(n))
+        start = time.perf_counter()
+        index = EventSearchIndex()
+        for event in events:
+            index.add(event)
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"\n{n} events (index build {build_ms:.0f} ms)")
+        print(f"{'query':<20}{'regex ms':>12}{'index ms':>12}{'speedup':>10}")
+        for query in QUERIES:
+            regex_ms = timed(lambda: regex_search(events, query))
+            index_ms = timed(lambda: index.search(query))
+            print(f"{query:<20}{regex_ms:>12.2f}{index_ms:>12.2f}{regex_ms / index_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10000, 100000])
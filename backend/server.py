@@ -1,21 +1,40 @@
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from fastapi import FastAPI, APIRouter, HTTPException, Response, Request, Depends
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, validator
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, validator
 from typing import List, Optional, Dict, Any
 import uuid
+import base64
+import copy
+import csv
+import hashlib
+import json
+import hmac
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
 from datetime import datetime, timezone, timedelta
 import httpx
-from openpyxl import Workbook
-from io import BytesIO
+from openpyxl import Workbook, load_workbook
+from io import BytesIO, RawIOBase, StringIO
 import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
 ROOT_DIR = Path(__file__).parent
@@ -38,10 +57,89 @@ SUPER_ADMIN_EMAIL = os.environ.get('SUPER_ADMIN_EMAIL', 'superadmin@college.edu'
 SUPER_ADMIN_PASSWORD = os.environ.get('SUPER_ADMIN_PASSWORD', 'SuperAdmin@123')
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt is deliberately CPU-heavy (100ms+ per call), so it runs on a small
+# dedicated pool instead of the event loop. When more than
+# PASSWORD_HASH_MAX_PENDING jobs are in flight we shed load with a 503.
+# Raising BCRYPT_ROUNDS rehashes existing passwords on their next login.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '16'))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_jobs_pending = 0
+
+
+async def _run_password_job(fn, *args):
+    global _password_jobs_pending
+    if _password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Login service is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    _password_jobs_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        _password_jobs_pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run_password_job(pwd_context.hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> tuple:
+    """Verify a password. Returns (valid, new_hash); new_hash is set when the
+    stored hash uses outdated parameters and should be replaced."""
+    return await _run_password_job(pwd_context.verify_and_update, password, password_hash)
+
+# Application lifespan: startup/shutdown hooks for background maintenance
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if INDEX_MANAGER_MODE != "off":
+        try:
+            index_report = await sync_indexes(dry_run=INDEX_MANAGER_MODE == "dry-run")
+        except Exception as e:
+            logging.error(f"✗ Index sync failed: {str(e)}", exc_info=True)
+        else:
+            require_unique_indexes(index_report)
+    start_http_client()
+    stats_task = asyncio.create_task(ensure_registration_stats())
+    ticket_migration_task = asyncio.create_task(migrate_ticket_replies())
+    search_keys_task = asyncio.create_task(backfill_search_keys())
+    email_task = asyncio.create_task(normalize_user_emails())
+    heartbeat_task = asyncio.create_task(live_hub.run_heartbeats())
+    sweeper_task = asyncio.create_task(session_sweeper())
+    search_task = asyncio.create_task(event_search_refresher())
+    catalog_task = asyncio.create_task(catalog_version_poller())
+    revocation_task = asyncio.create_task(revocation_refresher()) if SESSION_TOKEN_MODE == "signed" else None
+    deletion_task = asyncio.create_task(deletion_job_resumer())
+    if REGISTRATION_WRITE_MODE == "buffered":
+        registration_writer.start()
+    try:
+        yield
+    finally:
+        await registration_writer.close()
+        stats_task.cancel()
+        ticket_migration_task.cancel()
+        search_keys_task.cancel()
+        email_task.cancel()
+        heartbeat_task.cancel()
+        deletion_task.cancel()
+        for task in list(_export_job_tasks) + list(_import_job_tasks) + list(_deletion_job_tasks.values()):
+            task.cancel()
+        sweeper_task.cancel()
+        search_task.cancel()
+        catalog_task.cancel()
+        if revocation_task:
+            revocation_task.cancel()
+        await close_http_client()
+        password_executor.shutdown(wait=False)
+        export_executor.shutdown(wait=False)
+        import_executor.shutdown(wait=False)
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # Pydantic Models
@@ -89,9 +187,40 @@ class HelpTicketCreate(BaseModel):
 
 class HelpTicketReply(BaseModel):
     message: str
+    version: Optional[int] = None  # Expected ticket version (optimistic concurrency)
 
 class CertificateIssue(BaseModel):
     certificate_type: str  # "participant", "winner", "1st", "2nd", "3rd"
+    version: Optional[int] = None
+
+class BulkRegistrationAction(BaseModel):
+    action: str  # "certificate", "cancel", "approve_cancellation", "payment_status"
+    registration_ids: Optional[List[str]] = None
+    event_id: Optional[str] = None  # Every registration of the event instead of ids
+    status: Optional[str] = None  # Narrows event_id to one registration status
+    certificate_type: Optional[str] = None
+    payment_status: Optional[str] = None
+
+class UserFilter(BaseModel):
+    # Same filters as GET /superadmin/users
+    q: Optional[str] = None
+    role: Optional[str] = None  # Comma-separated
+    college: Optional[str] = None
+    department: Optional[str] = None
+    year: Optional[str] = None
+    is_blocked: Optional[bool] = None
+    profile_complete: Optional[bool] = None
+
+class BulkUserAction(BaseModel):
+    action: str  # "block", "unblock", "set_role"
+    user_ids: Optional[List[str]] = None
+    filter: Optional[UserFilter] = None  # Every matching user instead of ids
+    role: Optional[str] = None  # Target role for set_role
+    dry_run: bool = False
+
+class ExportJobCreate(BaseModel):
+    event_id: Optional[str] = None  # None = all events
+    format: str = "xlsx"  # xlsx, csv, ndjson
 
 class AdminCreate(BaseModel):
     email: str
@@ -148,6 +277,11 @@ class Event(BaseModel):
     event_image: Optional[str] = None
     required_fields: List[str] = ["name", "email", "phone", "college"]
     custom_fields: Optional[List[CustomField]] = None  # Custom registration fields
+    capacity: Optional[int] = None  # Max participant seats (None = unlimited)
+    max_teams: Optional[int] = None  # Max team registrations (None = unlimited)
+    seats_taken: int = 0
+    teams_registered: int = 0
+    waitlist_enabled: bool = True  # Queue students once the event is full
     created_at: datetime
 
 class EventCreate(BaseModel):
@@ -163,6 +297,9 @@ class EventCreate(BaseModel):
     organizer_info: Optional[str] = None
     is_paid: bool = False
     custom_fields: Optional[List[CustomField]] = None  # Custom registration fields
+    capacity: Optional[int] = None
+    max_teams: Optional[int] = None
+    waitlist_enabled: bool = True
 
 class EventUpdate(BaseModel):
     title: Optional[str] = None
@@ -178,6 +315,10 @@ class EventUpdate(BaseModel):
     organizer_info: Optional[str] = None
     is_paid: Optional[bool] = None
     custom_fields: Optional[List[CustomField]] = None  # Custom registration fields
+    capacity: Optional[int] = None
+    max_teams: Optional[int] = None
+    waitlist_enabled: Optional[bool] = None
+    version: Optional[int] = None
 
 class TeamMember(BaseModel):
     name: str
@@ -226,8 +367,1001 @@ class SuperAdminLogin(BaseModel):
     email: str
     password: str
 
+# ===== CACHING UTILITIES =====
+class TTLCache:
+    """Small bounded LRU cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# ===== SESSION CACHE =====
+# get_current_user runs on every authenticated request. Resolved session -> User
+# lookups are cached in-process for a short TTL so bursts (e.g. registration
+# openings) don't cost two Mongo round-trips per request. Any change to a
+# user's access (logout, block, role change, delete, profile edit) must
+# invalidate the affected entries so revocation stays immediate.
+SESSION_CACHE_TTL_SECONDS = float(os.environ.get('SESSION_CACHE_TTL_SECONDS', '30'))
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', '10000'))
+
+
+def _parse_expires_at(expires_at) -> datetime:
+    """Normalize a stored expires_at (datetime or legacy ISO string) to aware UTC."""
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at
+
+
+class SessionCache:
+    """Bounded LRU cache mapping session_token -> resolved User.
+
+    An entry lives for at most ``ttl`` seconds and never past the session's
+    own expiry. ``generation`` is bumped on every invalidation so a lookup
+    that raced with an invalidation doesn't re-populate a stale entry.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[str, set] = {}
+
+    def get(self, session_token: str) -> Optional[User]:
+        entry = self._entries.get(session_token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, deadline = entry
+        if deadline <= time.monotonic():
+            self._remove(session_token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(session_token)
+        self.hits += 1
+        return user
+
+    def set(self, session_token: str, user: User, session_expires_at: datetime, generation: int):
+        if self.max_entries <= 0 or generation != self.generation:
+            return
+        remaining = (session_expires_at - datetime.now(timezone.utc)).total_seconds()
+        ttl = min(self.ttl, remaining)
+        if ttl <= 0:
+            return
+        self._remove(session_token)
+        self._entries[session_token] = (user, time.monotonic() + ttl)
+        self._tokens_by_user.setdefault(user.user_id, set()).add(session_token)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_token(self, session_token: str):
+        self.generation += 1
+        self._remove(session_token)
+
+    def invalidate_user(self, user_id: str):
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids: List[str]):
+        self.generation += 1
+        for user_id in user_ids:
+            for session_token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(session_token)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _remove(self, session_token: str):
+        entry = self._entries.pop(session_token, None)
+        if entry is None:
+            return
+        user_id = entry[0].user_id
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(session_token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+session_cache = SessionCache(SESSION_CACHE_MAX_ENTRIES, SESSION_CACHE_TTL_SECONDS)
+
+
+# ===== INDEX MANAGEMENT =====
+# Declarative registry of every index the API relies on. Applied at startup
+# by the lifespan hook (INDEX_MANAGER_MODE=apply|dry-run|off). Indexes that
+# exist in Mongo but differ from the registry are reported, never dropped.
+# A unique index that can't be built (typically duplicate documents) stops
+# startup: writes like create_registration rely on it to reject duplicates.
+INDEX_MANAGER_MODE = os.environ.get('INDEX_MANAGER_MODE', 'apply').lower()
+
+
+def _index(collection: str, keys: List[tuple], **options) -> Dict[str, Any]:
+    name = options.pop("name", None) or "_".join(f"{field}_{direction}" for field, direction in keys)
+    return {"collection": collection, "keys": keys, "name": name, "options": options}
+
+
+INDEX_REGISTRY: List[Dict[str, Any]] = [
+    # users
+    _index("users", [("user_id", 1)], unique=True),
+    _index("users", [("email", 1)], unique=True),
+    _index("users", [("created_at", -1), ("user_id", -1)]),
+    _index("users", [("search_keys", 1)]),
+    _index("users", [("role", 1), ("created_at", -1), ("user_id", -1)]),
+    _index("users", [("college", 1), ("created_at", -1), ("user_id", -1)]),
+    # user_sessions
+    _index("user_sessions", [("session_token", 1)], unique=True),
+    _index("user_sessions", [("user_id", 1)]),
+    # TTL: Mongo deletes a session as soon as expires_at passes (BSON dates only)
+    _index("user_sessions", [("expires_at", 1)], expireAfterSeconds=0),
+    # events
+    _index("events", [("event_id", 1)], unique=True),
+    _index("events", [("status", 1), ("event_date", 1), ("event_id", 1)]),
+    _index("events", [("status", 1), ("event_type", 1), ("event_date", 1), ("event_id", 1)]),
+    _index("events", [("status", 1), ("category", 1), ("event_date", 1), ("event_id", 1)]),
+    # registrations
+    _index("registrations", [("registration_id", 1)], unique=True),
+    _index("registrations", [("event_id", 1), ("user_id", 1)], unique=True),
+    _index("registrations", [("user_id", 1), ("created_at", -1), ("registration_id", -1)]),
+    _index("registrations", [("event_id", 1), ("created_at", -1), ("registration_id", -1)]),
+    _index("registrations", [("created_at", -1), ("registration_id", -1)]),
+    _index("registrations", [("stats_gen", 1)]),
+    # registration_stats (analytics rollup)
+    _index("registration_stats", [("gen", 1), ("event_id", 1), ("day", 1), ("college", 1), ("department", 1), ("year", 1)], unique=True),
+    _index("registration_stats", [("gen", 1), ("day", 1)]),
+    # import_jobs
+    _index("import_jobs", [("job_id", 1)], unique=True),
+    # deletion_jobs
+    _index("deletion_jobs", [("job_id", 1)], unique=True),
+    _index("deletion_jobs", [("status", 1), ("updated_at", 1)]),
+    # export_jobs
+    _index("export_jobs", [("job_id", 1)], unique=True),
+    _index("export_jobs", [("event_id", 1), ("format", 1), ("data_version", 1), ("created_at", -1)]),
+    # waitlist
+    _index("waitlist", [("waitlist_id", 1)], unique=True),
+    _index("waitlist", [("event_id", 1), ("user_id", 1)], unique=True),
+    _index("waitlist", [("event_id", 1), ("seq", 1)], unique=True),
+    _index("waitlist", [("user_id", 1)]),
+    # help_tickets
+    _index("help_tickets", [("ticket_id", 1)], unique=True),
+    _index("help_tickets", [("user_id", 1), ("created_at", -1), ("ticket_id", -1)]),
+    _index("help_tickets", [("updated_at", -1), ("ticket_id", -1)]),
+    _index("help_tickets", [("status", 1), ("updated_at", -1), ("ticket_id", -1)]),
+    # ticket_replies
+    _index("ticket_replies", [("ticket_id", 1), ("reply_id", 1)], unique=True),
+    _index("ticket_replies", [("ticket_id", 1), ("created_at", 1), ("reply_id", 1)]),
+    # system_config
+    _index("system_config", [("config_key", 1)], unique=True),
+    # session_revocations (signed session token mode)
+    _index("session_revocations", [("kind", 1), ("key", 1)], unique=True),
+    _index("session_revocations", [("revoked_at", 1)]),
+    _index("session_revocations", [("expires_at", 1)], expireAfterSeconds=0),
+]
+
+# Query shapes issued by each route: equality filter fields + sort fields.
+# Used by check_index_coverage() to report routes that would scan.
+ROUTE_QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"route": "get_current_user", "collection": "user_sessions", "filter": ["session_token"], "sort": []},
+    {"route": "get_current_user", "collection": "users", "filter": ["user_id"], "sort": []},
+    {"route": "POST /api/auth/admin/login", "collection": "users", "filter": ["email"], "sort": []},
+    {"route": "PUT /api/superadmin/users/{user_id}/block", "collection": "user_sessions", "filter": ["user_id"], "sort": []},
+    {"route": "GET /api/events", "collection": "events", "filter": ["status"], "sort": ["event_date", "event_id"]},
+    {"route": "GET /api/events?event_type=", "collection": "events", "filter": ["status", "event_type"], "sort": ["event_date", "event_id"]},
+    {"route": "GET /api/events?category=", "collection": "events", "filter": ["status", "category"], "sort": ["event_date", "event_id"]},
+    {"route": "GET /api/events/{event_id}", "collection": "events", "filter": ["event_id"], "sort": []},
+    {"route": "POST /api/registrations", "collection": "registrations", "filter": ["event_id", "user_id"], "sort": []},
+    {"route": "GET /api/registrations", "collection": "registrations", "filter": ["user_id"], "sort": ["created_at", "registration_id"]},
+    {"route": "GET /api/admin/registrations", "collection": "registrations", "filter": [], "sort": ["created_at", "registration_id"]},
+    {"route": "GET /api/admin/registrations?event_id=", "collection": "registrations", "filter": ["event_id"], "sort": ["created_at", "registration_id"]},
+    {"route": "GET /api/admin/registrations?user_id=", "collection": "registrations", "filter": ["user_id"], "sort": ["created_at", "registration_id"]},
+    {"route": "PUT /api/superadmin/registrations/{registration_id}", "collection": "registrations", "filter": ["registration_id"], "sort": []},
+    {"route": "GET /api/events/{event_id}/waitlist", "collection": "waitlist", "filter": ["event_id", "user_id"], "sort": []},
+    {"route": "promote_waitlist", "collection": "waitlist", "filter": ["event_id"], "sort": ["seq"]},
+    {"route": "GET /api/admin/events/{event_id}/waitlist", "collection": "waitlist", "filter": ["event_id"], "sort": ["seq"]},
+    {"route": "POST /api/admin/exports", "collection": "export_jobs", "filter": ["event_id", "format", "data_version"], "sort": ["created_at"]},
+    {"route": "GET /api/admin/exports/{job_id}", "collection": "export_jobs", "filter": ["job_id"], "sort": []},
+    {"route": "GET /api/admin/analytics", "collection": "registration_stats", "filter": ["gen", "day"], "sort": []},
+    {"route": "GET /api/admin/analytics/events/{event_id}", "collection": "registration_stats", "filter": ["gen", "event_id"], "sort": []},
+    {"route": "GET /api/tickets", "collection": "help_tickets", "filter": ["user_id"], "sort": ["created_at", "ticket_id"]},
+    {"route": "GET /api/admin/tickets", "collection": "help_tickets", "filter": [], "sort": ["updated_at", "ticket_id"]},
+    {"route": "GET /api/admin/tickets?status=", "collection": "help_tickets", "filter": ["status"], "sort": ["updated_at", "ticket_id"]},
+    {"route": "POST /api/admin/tickets/{ticket_id}/reply", "collection": "help_tickets", "filter": ["ticket_id"], "sort": []},
+    {"route": "GET /api/tickets/{ticket_id}/replies", "collection": "ticket_replies", "filter": ["ticket_id"], "sort": ["created_at", "reply_id"]},
+    {"route": "GET /api/config", "collection": "system_config", "filter": ["config_key"], "sort": []},
+    {"route": "GET /api/superadmin/users", "collection": "users", "filter": [], "sort": ["created_at", "user_id"]},
+    {"route": "GET /api/superadmin/users?role=", "collection": "users", "filter": ["role"], "sort": ["created_at", "user_id"]},
+    {"route": "GET /api/superadmin/users?college=", "collection": "users", "filter": ["college"], "sort": ["created_at", "user_id"]},
+    {"route": "GET /api/superadmin/users?q=", "collection": "users", "filter": ["search_keys"], "sort": []},
+    {"route": "POST /api/superadmin/users/bulk", "collection": "users", "filter": ["user_id"], "sort": []},
+    {"route": "POST /api/superadmin/users/bulk", "collection": "user_sessions", "filter": ["user_id"], "sort": []},
+    {"route": "run_deletion_job", "collection": "deletion_jobs", "filter": ["job_id"], "sort": []},
+    {"route": "deletion_job_resumer", "collection": "deletion_jobs", "filter": ["status"], "sort": []},
+    {"route": "run_deletion_job", "collection": "waitlist", "filter": ["user_id"], "sort": []},
+    {"route": "run_deletion_job", "collection": "waitlist", "filter": ["event_id"], "sort": []},
+    {"route": "run_deletion_job", "collection": "registrations", "filter": ["user_id"], "sort": []},
+    {"route": "run_deletion_job", "collection": "registrations", "filter": ["event_id"], "sort": []},
+    {"route": "run_deletion_job", "collection": "help_tickets", "filter": ["user_id"], "sort": []},
+    {"route": "run_deletion_job", "collection": "ticket_replies", "filter": ["ticket_id"], "sort": []},
+]
+
+
+def _index_covers(index_keys: List[str], filter_fields: List[str], sort_fields: List[str]) -> bool:
+    """An index covers a query if its leading keys are the equality fields
+    (in any order) followed by the sort fields."""
+    n = len(filter_fields)
+    if set(index_keys[:n]) != set(filter_fields):
+        return False
+    return index_keys[n:n + len(sort_fields)] == sort_fields
+
+
+def check_index_coverage(indexes: Optional[Dict[str, List[List[str]]]] = None) -> List[Dict[str, Any]]:
+    """Return the route query shapes that no index covers.
+
+    ``indexes`` maps collection -> list of index key lists; defaults to the
+    registry, so the check can run without a database.
+    """
+    if indexes is None:
+        indexes = {}
+        for spec in INDEX_REGISTRY:
+            indexes.setdefault(spec["collection"], []).append([k for k, _ in spec["keys"]])
+    uncovered = []
+    for shape in ROUTE_QUERY_SHAPES:
+        candidates = indexes.get(shape["collection"], [])
+        if not any(_index_covers(keys, shape["filter"], shape["sort"]) for keys in candidates):
+            uncovered.append(shape)
+    return uncovered
+
+
+async def diff_indexes() -> Dict[str, Any]:
+    """Compare the registry against the indexes that exist in Mongo."""
+    missing, conflicting, extra = [], [], []
+    existing_keys: Dict[str, List[List[str]]] = {}
+    for collection in sorted({spec["collection"] for spec in INDEX_REGISTRY}):
+        info = await db[collection].index_information()
+        by_keys = {tuple(tuple(k) for k in idx["key"]): (name, idx) for name, idx in info.items()}
+        existing_keys[collection] = [[k for k, _ in idx["key"]] for idx in info.values()]
+        wanted = set()
+        for spec in (s for s in INDEX_REGISTRY if s["collection"] == collection):
+            key = tuple(spec["keys"])
+            wanted.add(key)
+            if key not in by_keys:
+                missing.append(spec)
+                continue
+            name, idx = by_keys[key]
+            for option, value in spec["options"].items():
+                if idx.get(option) != value:
+                    conflicting.append({**spec, "existing_name": name, "existing": {o: idx.get(o) for o in spec["options"]}})
+                    break
+        for key, (name, idx) in by_keys.items():
+            if name != "_id_" and key not in wanted:
+                extra.append({"collection": collection, "name": name, "keys": list(key)})
+    return {
+        "missing": missing,
+        "conflicting": conflicting,
+        "extra": extra,
+        "uncovered_routes": check_index_coverage(existing_keys)
+    }
+
+
+async def sync_indexes(dry_run: bool = False) -> Dict[str, Any]:
+    """Create missing registry indexes. With dry_run, only report the diff."""
+    diff = await diff_indexes()
+    created, failed = [], []
+    if not dry_run:
+        for spec in diff["missing"]:
+            try:
+                await db[spec["collection"]].create_index(spec["keys"], name=spec["name"], **spec["options"])
+                created.append(spec["name"])
+            except Exception as e:
+                # e.g. duplicate data blocking a unique index
+                logging.error(f"✗ Failed to create index {spec['collection']}.{spec['name']}: {str(e)}")
+                failed.append({
+                    "collection": spec["collection"],
+                    "name": spec["name"],
+                    "unique": bool(spec["options"].get("unique")),
+                    "error": str(e)
+                })
+    for spec in diff["conflicting"]:
+        logging.warning(f"Index {spec['collection']}.{spec['existing_name']} differs from registry: {spec['existing']} != {spec['options']}")
+    if created:
+        diff["uncovered_routes"] = (await diff_indexes())["uncovered_routes"]
+    for shape in diff["uncovered_routes"]:
+        logging.warning(f"Query not covered by an index: {shape['route']} on {shape['collection']}")
+    logging.info(f"✓ Index sync ({'dry-run' if dry_run else 'apply'}): {len(diff['missing'])} missing, {len(created)} created, {len(failed)} failed")
+    return {"dry_run": dry_run, "created": created, "failed": failed, **diff}
+
+
+def require_unique_indexes(report: Dict[str, Any]):
+    """Raise if sync_indexes() couldn't build a unique index."""
+    missing = [f"{f['collection']}.{f['name']}" for f in report["failed"] if f["unique"]]
+    if missing:
+        raise RuntimeError(
+            f"Unique indexes could not be built, remove the duplicate documents and restart: {', '.join(missing)}"
+        )
+
+
+# ===== KEYSET PAGINATION =====
+# List endpoints page with an opaque cursor holding the last row's sort key
+# values (sort field + unique id tiebreaker). The next page is a range query
+# on the same compound index, so every page costs the same regardless of
+# how deep the client has paged. Callers passing `limit` or `cursor` get
+# {"items", "next_cursor"}; legacy callers keep receiving a bare list, and
+# every response carries the next cursor in the X-Next-Cursor header.
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', '500'))
+
+
+def _encode_cursor_value(value):
+    return {"$dt": value.isoformat()} if isinstance(value, datetime) else value
+
+
+def _decode_cursor_value(value):
+    return datetime.fromisoformat(value["$dt"]) if isinstance(value, dict) and "$dt" in value else value
+
+
+def encode_cursor(doc: Dict[str, Any], sort: List[tuple]) -> str:
+    values = [_encode_cursor_value(doc.get(field)) for field, _ in sort]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: List[tuple]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return [_decode_cursor_value(v) for v in values]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(sort: List[tuple], values: List[Any]) -> Dict[str, Any]:
+    """Filter selecting rows strictly after ``values`` in ``sort`` order."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {sort[j][0]: values[j] for j in range(i)}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def page_limit(limit: Optional[int], default: int) -> int:
+    if limit is None:
+        return default
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort: List[tuple],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None
+) -> tuple:
+    """Return (items, next_cursor) for one keyset page."""
+    if cursor:
+        after = keyset_filter(sort, decode_cursor(cursor, sort))
+        query = {"$and": [query, after]} if query else after
+    docs = await collection.find(query, projection or {"_id": 0}).sort(sort).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], sort) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def page_response(response: Response, items: List[Any], next_cursor: Optional[str], envelope: bool):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if envelope:
+        return {"items": items, "next_cursor": next_cursor}
+    return items
+
+
+# ===== BATCH LOADERS =====
+# Request-scoped DataLoader for the user/event joins on list endpoints.
+# Keys requested together are coalesced into one `$in` query that fetches
+# only the fields the endpoint asked for, and every key is memoized for the
+# rest of the request. Event loaders also read through a short-TTL cache
+# shared across requests (EVENT_CACHE_TTL_SECONDS, 0 = off) that is cleared
+# whenever the catalog version changes. Users are never cached across
+# requests. Loaded documents are shared between callers: treat them as
+# read-only.
+EVENT_CACHE_TTL_SECONDS = float(os.environ.get('EVENT_CACHE_TTL_SECONDS', '5'))
+USER_SUMMARY_FIELDS = (
+    "name", "email", "picture", "phone", "prn", "college", "branch", "department", "division", "year"
+)
+EVENT_SUMMARY_FIELDS = ("title", "category", "event_type", "is_paid", "event_date", "venue")
+
+event_cache = TTLCache(max_entries=2000, ttl=EVENT_CACHE_TTL_SECONDS)
+
+
+class BatchLoader:
+    def __init__(self, collection, key_field: str, projection: Dict[str, Any], shared_cache: Optional[TTLCache] = None):
+        self.collection = collection
+        self.key_field = key_field
+        self.projection = {"_id": 0, **projection}
+        if any(v for k, v in projection.items() if k != "_id"):
+            self.projection[key_field] = 1  # inclusion projection must keep the key
+        self.shared_cache = shared_cache
+        self._cache_tag = tuple(sorted(projection.items()))
+        self._memo: Dict[Any, asyncio.Future] = {}
+        self._queue: Dict[Any, asyncio.Future] = {}
+        self.queries = 0
+
+    def _future(self, key) -> asyncio.Future:
+        future = self._memo.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = self._memo[key] = loop.create_future()
+        if self.shared_cache is not None:
+            cached = self.shared_cache.get((self._cache_tag, key))
+            if cached is not None:
+                future.set_result(cached)
+                return future
+        if not self._queue:
+            # Dispatch once the current tick has queued its keys
+            loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        self._queue[key] = future
+        return future
+
+    async def load(self, key) -> Optional[Dict[str, Any]]:
+        return await asyncio.shield(self._future(key))
+
+    async def load_many(self, keys) -> Dict[Any, Optional[Dict[str, Any]]]:
+        futures = {key: self._future(key) for key in keys}
+        docs = await asyncio.shield(asyncio.gather(*futures.values()))
+        return dict(zip(futures, docs))
+
+    async def _dispatch(self):
+        batch, self._queue = self._queue, {}
+        self.queries += 1
+        try:
+            docs = await self.collection.find(
+                {self.key_field: {"$in": list(batch)}}, self.projection
+            ).to_list(len(batch))
+        except Exception as e:
+            for key, future in batch.items():
+                self._memo.pop(key, None)  # let a later load retry
+                if not future.done():
+                    future.set_exception(e)
+            return
+        found = {doc[self.key_field]: doc for doc in docs}
+        for key, future in batch.items():
+            doc = found.get(key)
+            if doc is not None and self.shared_cache is not None:
+                self.shared_cache.set((self._cache_tag, key), doc)
+            if not future.done():
+                future.set_result(doc)
+
+
+class Loaders:
+    """Per-request loader registry, one BatchLoader per (collection, projection)."""
+
+    def __init__(self):
+        self._loaders: Dict[tuple, BatchLoader] = {}
+
+    def _get(self, collection, key_field: str, projection: Dict[str, Any], shared_cache=None) -> BatchLoader:
+        tag = (collection.name, tuple(sorted(projection.items())))
+        loader = self._loaders.get(tag)
+        if loader is None:
+            loader = self._loaders[tag] = BatchLoader(collection, key_field, projection, shared_cache)
+        return loader
+
+    def users(self, fields=USER_SUMMARY_FIELDS) -> BatchLoader:
+        return self._get(db.users, "user_id", {field: 1 for field in fields})
+
+    def events(self, projection: Optional[Dict[str, Any]] = None) -> BatchLoader:
+        projection = projection or {field: 1 for field in EVENT_SUMMARY_FIELDS}
+        return self._get(db.events, "event_id", projection, event_cache)
+
+
+def get_loaders() -> Loaders:
+    return Loaders()
+
+
+# ===== VERSIONED WRITES =====
+# Mutating routes write with one find_one_and_update and return its
+# post-image instead of update_one followed by find_one. Each such write
+# bumps the document's `version`; a client that sends back the version it
+# last read gets a 409 if someone else wrote in between (optimistic
+# concurrency). Documents that predate versioning count as version 0.
+VERSION_CONFLICT = "Modified by someone else; reload and try again"
+
+
+def version_filter(query: Dict[str, Any], version: Optional[int]) -> Dict[str, Any]:
+    if version is None:
+        return query
+    return {**query, "version": version if version else {"$in": [0, None]}}
+
+
+def bump_version(update: Dict[str, Any]) -> Dict[str, Any]:
+    return {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+
+
+async def write_miss(collection, query: Dict[str, Any], version: Optional[int], not_found: str) -> HTTPException:
+    """404 or 409 for a conditional write that matched nothing (failure path only)."""
+    if version is not None and await collection.find_one(query, {"_id": 1}):
+        return HTTPException(status_code=409, detail=VERSION_CONFLICT)
+    return HTTPException(status_code=404, detail=not_found)
+
+
+async def update_versioned(
+    collection,
+    query: Dict[str, Any],
+    update: Dict[str, Any],
+    version: Optional[int] = None,
+    not_found: str = "Not found",
+    projection: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Apply ``update`` and return the post-image, or raise 404/409."""
+    doc = await collection.find_one_and_update(
+        version_filter(query, version),
+        bump_version(update),
+        projection=projection or {"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        raise await write_miss(collection, query, version, not_found)
+    return doc
+
+
+async def upsert_user(
+    email: str,
+    fields: Dict[str, Any],
+    on_insert: Optional[Dict[str, Any]] = None,
+    default_role: Optional[str] = None
+) -> tuple:
+    """Update or create the user with ``email`` in one round trip.
+
+    ``fields`` are always written; ``on_insert`` only for a new user.
+    ``default_role`` is applied unless the user is already an admin or
+    superadmin. The email is stored lowercased. Returns (user, created).
+    """
+    email = email.lower()
+    new_user_id = f"user_{uuid.uuid4().hex[:12]}"
+    stage = {k: {"$literal": v} for k, v in fields.items()}
+    for key, value in {"created_at": datetime.now(timezone.utc), **(on_insert or {})}.items():
+        stage[key] = {"$ifNull": [f"${key}", {"$literal": value}]}
+    if default_role:
+        stage["role"] = {"$cond": [
+            {"$in": [{"$ifNull": ["$role", None]}, ["superadmin", "admin"]]}, "$role", default_role
+        ]}
+    stage["user_id"] = {"$ifNull": ["$user_id", new_user_id]}
+    stage["version"] = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+    for attempt in range(2):
+        try:
+            user = await db.users.find_one_and_update(
+                {"email": email},
+                [{"$set": stage}],
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            break
+        except DuplicateKeyError:
+            # Lost a concurrent first-login race on the unique email index
+            if attempt:
+                raise
+    created = user["user_id"] == new_user_id
+    if not created:
+        session_cache.invalidate_user(user["user_id"])
+    await sync_search_keys(user)
+    return user, created
+
+
+# Emails are stored lowercased (upsert_user, update_user, the import) so that
+# one address is one user however a provider or a spreadsheet capitalizes
+# it. Users written before that are lowercased at startup and before each
+# import; an address whose lowercase form already belongs to another user
+# is left alone and logged, as the two accounts need merging by hand.
+async def normalize_user_emails() -> int:
+    """Lowercase stored emails that have capitals. Returns users converted."""
+    converted = 0
+    try:
+        cursor = db.users.find({"email": {"$regex": "[A-Z]"}}, {"_id": 1, "user_id": 1, "email": 1})
+        async for user in cursor:
+            try:
+                await db.users.update_one(
+                    {"_id": user["_id"], "email": user["email"]},
+                    {"$set": {"email": user["email"].lower()}, "$inc": {"version": 1}}
+                )
+            except DuplicateKeyError:
+                logging.warning(f"User {user['user_id']} email {user['email']!r} clashes with another user when lowercased")
+                continue
+            session_cache.invalidate_user(user["user_id"])
+            await user_export_changed(user["user_id"], ["email"])
+            converted += 1
+        if converted:
+            logging.info(f"✓ Lowercased {converted} user emails")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"✗ User email normalization failed: {str(e)}", exc_info=True)
+    return converted
+
+
+# ===== SESSION EXPIRY =====
+# Expired sessions are removed by the TTL index on user_sessions.expires_at.
+# TTL only applies to BSON dates, so legacy documents that stored expires_at
+# as an ISO string are converted by normalize_session_expiry(). The sweeper
+# repeats that pass and deletes anything the TTL monitor hasn't reached yet.
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.environ.get('SESSION_SWEEP_INTERVAL_SECONDS', '3600'))
+
+
+async def normalize_session_expiry() -> int:
+    """Convert string expires_at values to BSON dates. Returns docs converted."""
+    converted = 0
+    cursor = db.user_sessions.find({"expires_at": {"$type": "string"}}, {"_id": 1, "expires_at": 1})
+    async for doc in cursor:
+        try:
+            expires_at = _parse_expires_at(doc["expires_at"])
+        except ValueError:
+            logging.warning(f"Unparseable session expires_at {doc['expires_at']!r}; expiring it now")
+            expires_at = datetime.now(timezone.utc)
+        await db.user_sessions.update_one({"_id": doc["_id"]}, {"$set": {"expires_at": expires_at}})
+        converted += 1
+    return converted
+
+
+async def sweep_sessions() -> Dict[str, int]:
+    converted = await normalize_session_expiry()
+    result = await db.user_sessions.delete_many({"expires_at": {"$lt": datetime.now(timezone.utc)}})
+    if converted or result.deleted_count:
+        logging.info(f"✓ Session sweep: {converted} normalized, {result.deleted_count} expired removed")
+    return {"normalized": converted, "deleted": result.deleted_count}
+
+
+async def session_sweeper():
+    while True:
+        try:
+            await sweep_sessions()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"✗ Session sweep failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+
+
+# ===== OUTBOUND HTTP =====
+# One pooled client (keep-alive, HTTP/2 when h2 is installed) is shared by the
+# Supabase and Emergent token exchanges instead of a new TCP+TLS handshake per
+# login. Base URLs are configurable so the exchanges can run against a stub.
+HTTP_CLIENT_TIMEOUT_SECONDS = float(os.environ.get('HTTP_CLIENT_TIMEOUT_SECONDS', '10'))
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.environ.get('HTTP_CLIENT_MAX_CONNECTIONS', '100'))
+HTTP_CLIENT_MAX_KEEPALIVE = int(os.environ.get('HTTP_CLIENT_MAX_KEEPALIVE', '20'))
+HTTP_CLIENT_HTTP2 = os.environ.get('HTTP_CLIENT_HTTP2', 'true').lower() in ("1", "true", "yes")
+HTTP_CLIENT_RETRIES = int(os.environ.get('HTTP_CLIENT_RETRIES', '2'))
+HTTP_CLIENT_BACKOFF_SECONDS = float(os.environ.get('HTTP_CLIENT_BACKOFF_SECONDS', '0.2'))
+HTTP_RETRY_STATUSES = {429, 502, 503, 504}
+EMERGENT_AUTH_URL = os.environ.get('EMERGENT_AUTH_URL', 'https://demobackend.emergentagent.com')
+SUPABASE_TOKEN_CACHE_TTL_SECONDS = float(os.environ.get('SUPABASE_TOKEN_CACHE_TTL_SECONDS', '60'))
+
+http_client: Optional[httpx.AsyncClient] = None
+supabase_token_cache = TTLCache(max_entries=5000, ttl=SUPABASE_TOKEN_CACHE_TTL_SECONDS)
+
+
+def start_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http2 = HTTP_CLIENT_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+        http_client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(HTTP_CLIENT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE
+            )
+        )
+    return http_client
+
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+async def http_get(url: str, headers: Dict[str, str]) -> httpx.Response:
+    """GET through the shared client, retrying transport errors and
+    429/5xx gateway responses with exponential backoff."""
+    client = start_http_client()
+    for attempt in range(HTTP_CLIENT_RETRIES + 1):
+        last_attempt = attempt == HTTP_CLIENT_RETRIES
+        try:
+            resp = await client.get(url, headers=headers)
+            if resp.status_code not in HTTP_RETRY_STATUSES or last_attempt:
+                return resp
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        await asyncio.sleep(HTTP_CLIENT_BACKOFF_SECONDS * (2 ** attempt))
+
+
+def _token_cache_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+def _token_seconds_left(access_token: str) -> Optional[float]:
+    """Seconds until the JWT's exp claim (unverified; only used to bound caching)."""
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload))["exp"]
+        return exp - time.time()
+    except Exception:
+        return None
+
+
+async def verify_supabase_token(access_token: str, supabase_url: str, supabase_anon_key: str) -> Dict[str, Any]:
+    """Resolve a Supabase access token to its user, caching successful
+    verifications briefly so repeated exchanges don't re-hit Supabase."""
+    cache_key = _token_cache_key(access_token)
+    cached = supabase_token_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    resp = await http_get(
+        f"{supabase_url.rstrip('/')}/auth/v1/user",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "apikey": supabase_anon_key
+        }
+    )
+    logging.info(f"Supabase response status: {resp.status_code}")
+    if resp.status_code != 200:
+        response_text = resp.text[:500]
+        logging.error(f"Supabase returned {resp.status_code}: {response_text}")
+    resp.raise_for_status()
+    supa_user = resp.json()
+    seconds_left = _token_seconds_left(access_token)
+    supabase_token_cache.set(cache_key, supa_user, ttl=seconds_left)
+    return supa_user
+
+
+# ===== SIGNED SESSION TOKENS =====
+# SESSION_TOKEN_MODE=db (default) keeps opaque session_{uuid} tokens that are
+# looked up in user_sessions. SESSION_TOKEN_MODE=signed issues HMAC-signed
+# tokens carrying user_id and expiry, so a request is authenticated without
+# user_sessions: store_session() writes no session document and logout only
+# records a revocation. Logout, blocking and role changes go into a
+# revocation set held in memory and refreshed from Mongo so other workers
+# see them within SESSION_REVOCATION_REFRESH_SECONDS. The one remaining
+# Mongo read is the user document, once per token and worker (on a session
+# cache miss): role, block flag and profile always come from it, never
+# from the token, so profile edits show up without reissuing tokens.
+# Switching back to db mode logs out sessions issued in signed mode.
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'db').lower()
+SESSION_SIGNING_SECRET = os.environ.get('SESSION_SIGNING_SECRET', '')
+SESSION_REVOCATION_REFRESH_SECONDS = float(os.environ.get('SESSION_REVOCATION_REFRESH_SECONDS', '5'))
+SESSION_MAX_LIFETIME = timedelta(days=7)
+SIGNED_TOKEN_PREFIX = "st1"
+
+if SESSION_TOKEN_MODE == "signed" and not SESSION_SIGNING_SECRET:
+    logging.error("✗ SESSION_TOKEN_MODE=signed requires SESSION_SIGNING_SECRET; falling back to db mode")
+    SESSION_TOKEN_MODE = "db"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SESSION_SIGNING_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def _new_session_token(user_id: str, expires_at: datetime, opaque_token: Optional[str] = None) -> str:
+    """Mint a session token for the configured mode."""
+    if SESSION_TOKEN_MODE != "signed":
+        return opaque_token or f"session_{uuid.uuid4().hex}"
+    claims = {
+        "sid": uuid.uuid4().hex,
+        "uid": user_id,
+        "iat": time.time(),
+        "exp": expires_at.timestamp()
+    }
+    body = f"{SIGNED_TOKEN_PREFIX}.{_b64encode(json.dumps(claims, separators=(',', ':')).encode())}"
+    return f"{body}.{_sign(body)}"
+
+
+def decode_session_token(session_token: str) -> Optional[Dict[str, Any]]:
+    """Return the verified claims of a signed token, or None for opaque tokens.
+
+    Raises 401 for a signed token with a bad signature or past its expiry.
+    """
+    if not SESSION_SIGNING_SECRET or not session_token.startswith(SIGNED_TOKEN_PREFIX + "."):
+        return None
+    body, _, signature = session_token.rpartition(".")
+    if not hmac.compare_digest(signature, _sign(body)):
+        raise HTTPException(status_code=401, detail="Invalid session")
+    try:
+        claims = json.loads(_b64decode(body.split(".", 1)[1]))
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    if claims["exp"] < time.time():
+        raise HTTPException(status_code=401, detail="Session expired")
+    return claims
+
+
+class RevocationSet:
+    """Revoked session ids, plus per-user cutoffs (tokens issued before the
+    cutoff are rejected). Entries are dropped once no token they could match
+    can still be valid."""
+
+    def __init__(self):
+        self.sessions: Dict[str, float] = {}  # sid -> token exp
+        self.users: Dict[str, float] = {}  # user_id -> revoked_before
+        self._synced_until = datetime.fromtimestamp(0, timezone.utc)
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        if claims["sid"] in self.sessions:
+            return True
+        revoked_before = self.users.get(claims["uid"])
+        return revoked_before is not None and claims["iat"] <= revoked_before
+
+    def _apply(self, doc: Dict[str, Any]):
+        if doc["kind"] == "session":
+            self.sessions[doc["key"]] = doc["token_exp"]
+        else:
+            self.users[doc["key"]] = max(self.users.get(doc["key"], 0), doc["revoked_before"])
+
+    async def revoke_session(self, sid: str, token_exp: float):
+        await self._record({"kind": "session", "key": sid, "token_exp": token_exp},
+                           datetime.fromtimestamp(token_exp, timezone.utc))
+
+    async def revoke_user(self, user_id: str):
+        await self.revoke_users([user_id])
+
+    async def revoke_users(self, user_ids: List[str]):
+        now = datetime.now(timezone.utc)
+        await self._record_many([{"kind": "user", "key": user_id, "revoked_before": time.time()} for user_id in user_ids],
+                                now + SESSION_MAX_LIFETIME)
+
+    async def _record(self, doc: Dict[str, Any], expires_at: datetime):
+        await self._record_many([doc], expires_at)
+
+    async def _record_many(self, docs: List[Dict[str, Any]], expires_at: datetime):
+        if not docs:
+            return
+        now = datetime.now(timezone.utc)
+        for doc in docs:
+            self._apply(doc)
+        await db.session_revocations.bulk_write([
+            UpdateOne(
+                {"kind": doc["kind"], "key": doc["key"]},
+                {"$set": {**doc, "revoked_at": now, "expires_at": expires_at}},
+                upsert=True
+            ) for doc in docs
+        ], ordered=False)
+
+    async def refresh(self):
+        """Pull revocations recorded (by any worker) since the last refresh."""
+        since = self._synced_until - timedelta(seconds=1)  # tolerate clock skew between writers
+        self._synced_until = datetime.now(timezone.utc)
+        async for doc in db.session_revocations.find({"revoked_at": {"$gte": since}}, {"_id": 0}):
+            self._apply(doc)
+        now = time.time()
+        cutoff = now - SESSION_MAX_LIFETIME.total_seconds()
+        self.sessions = {sid: exp for sid, exp in self.sessions.items() if exp > now}
+        self.users = {uid: before for uid, before in self.users.items() if before > cutoff}
+
+
+session_revocations = RevocationSet()
+
+
+async def revocation_refresher():
+    while True:
+        try:
+            await session_revocations.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"✗ Revocation refresh failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(SESSION_REVOCATION_REFRESH_SECONDS)
+
+
+async def store_session(user_id: str, session_token: str, expires_at: datetime):
+    """Record a new session. Signed tokens carry everything needed to
+    authenticate them, so only db mode stores a session document."""
+    if SESSION_TOKEN_MODE == "signed":
+        return
+    await db.user_sessions.insert_one({
+        "user_id": user_id,
+        "session_token": session_token,
+        "expires_at": expires_at,
+        "created_at": datetime.now(timezone.utc)
+    })
+
+
+async def revoke_session_token(session_token: str):
+    """Invalidate a single session (logout / refresh)."""
+    session_cache.invalidate_token(session_token)
+    if SESSION_TOKEN_MODE != "signed":
+        return
+    try:
+        claims = decode_session_token(session_token)
+    except HTTPException:
+        return  # forged or already expired: nothing to revoke
+    if claims:
+        await session_revocations.revoke_session(claims["sid"], claims["exp"])
+
+
+async def revoke_user_sessions(user_id: str):
+    """Invalidate every session of a user (block, delete, role change)."""
+    await revoke_users_sessions([user_id])
+
+
+async def revoke_users_sessions(user_ids: List[str]):
+    """Invalidate every session of many users in one pass."""
+    session_cache.invalidate_users(user_ids)
+    if SESSION_TOKEN_MODE == "signed":
+        await session_revocations.revoke_users(user_ids)
+
+
 # Authentication Helper
-async def get_current_user(request: Request) -> User:
+def _get_session_token(request: Request) -> Optional[str]:
     # Check cookie first, then Authorization header
     session_token = request.cookies.get("session_token")
     
@@ -236,30 +1370,47 @@ async def get_current_user(request: Request) -> User:
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header.replace("Bearer ", "")
     
+    return session_token
+
+
+async def get_current_user(request: Request) -> User:
+    session_token = _get_session_token(request)
+    
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find session
-    session_doc = await db.user_sessions.find_one(
-        {"session_token": session_token},
-        {"_id": 0}
-    )
-    
-    if not session_doc:
+    # Signed tokens are verified and revocation-checked in memory
+    claims = decode_session_token(session_token) if SESSION_TOKEN_MODE == "signed" else None
+    if claims and session_revocations.is_revoked(claims):
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    # Check expiry
-    expires_at = session_doc["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        raise HTTPException(status_code=401, detail="Session expired")
+    cached_user = session_cache.get(session_token)
+    if cached_user is not None:
+        return cached_user
+    generation = session_cache.generation
+    
+    if claims:
+        user_id = claims["uid"]
+        expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc)
+    else:
+        # Find session
+        session_doc = await db.user_sessions.find_one(
+            {"session_token": session_token},
+            {"_id": 0}
+        )
+        
+        if not session_doc:
+            raise HTTPException(status_code=401, detail="Invalid session")
+        
+        # Check expiry
+        expires_at = _parse_expires_at(session_doc["expires_at"])
+        if expires_at < datetime.now(timezone.utc):
+            raise HTTPException(status_code=401, detail="Session expired")
+        user_id = session_doc["user_id"]
     
     # Get user
     user_doc = await db.users.find_one(
-        {"user_id": session_doc["user_id"]},
+        {"user_id": user_id},
         {"_id": 0}
     )
     
@@ -270,7 +1421,9 @@ async def get_current_user(request: Request) -> User:
     if user_doc.get("is_blocked", False):
         raise HTTPException(status_code=403, detail="Your account has been blocked. Please contact admin.")
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    session_cache.set(session_token, user, expires_at, generation)
+    return user
 
 
 def _is_localhost(host: str) -> bool:
@@ -324,33 +1477,23 @@ async def require_superadmin(user: User = Depends(get_current_user)) -> User:
 async def admin_login(data: SuperAdminLogin, response: Response, request: Request):
     # First check default admin credentials
     if data.email == ADMIN_LOGIN_EMAIL and data.password == ADMIN_LOGIN_PASSWORD:
-        # Check if default admin user exists
-        existing_user = await db.users.find_one({"email": ADMIN_LOGIN_EMAIL}, {"_id": 0})
-        
-        if existing_user:
-            user_id = existing_user["user_id"]
-            # Update role to admin
+        # Create the default admin user, or make sure it still has the admin role
+        user, _ = await upsert_user(
+            ADMIN_LOGIN_EMAIL,
+            {"role": "admin"},
+            {"name": "RCPIT Admin", "picture": None, "is_blocked": False}
+        )
+        user_id = user["user_id"]
+        if not user.get("password_hash"):
+            # Hash once, not on every login (bcrypt is deliberately slow)
             await db.users.update_one(
-                {"user_id": user_id},
-                {"$set": {"role": "admin"}}
+                {"user_id": user_id, "password_hash": None},
+                {"$set": {"password_hash": await hash_password(ADMIN_LOGIN_PASSWORD)}}
             )
-        else:
-            # Create default admin user
-            user_id = f"user_{uuid.uuid4().hex[:12]}"
-            await db.users.insert_one({
-                "user_id": user_id,
-                "email": ADMIN_LOGIN_EMAIL,
-                "name": "RCPIT Admin",
-                "picture": None,
-                "role": "admin",
-                "is_blocked": False,
-                "password_hash": pwd_context.hash(ADMIN_LOGIN_PASSWORD),
-                "created_at": datetime.now(timezone.utc)
-            })
     else:
         # Check if admin exists in database with password
         existing_user = await db.users.find_one(
-            {"email": data.email, "role": "admin"},
+            {"email": data.email.lower(), "role": "admin"},
             {"_id": 0}
         )
         
@@ -361,29 +1504,28 @@ async def admin_login(data: SuperAdminLogin, response: Response, request: Reques
         if not existing_user.get("password_hash"):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        if not pwd_context.verify(data.password, existing_user["password_hash"]):
+        valid, new_hash = await verify_password(data.password, existing_user["password_hash"])
+        if not valid:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        user_id = existing_user["user_id"]
+        user = existing_user
+        user_id = user["user_id"]
+        
+        # Opportunistic rehash when the cost factor has changed
+        if new_hash:
+            await db.users.update_one({"user_id": user_id}, {"$set": {"password_hash": new_hash}})
     
     # Create session
-    session_token = f"session_{uuid.uuid4().hex}"
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    session_token = _new_session_token(user_id, expires_at)
     
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at,
-        "created_at": datetime.now(timezone.utc)
-    })
+    await store_session(user_id, session_token, expires_at)
     
     # Set cookie (secure flag auto-detected)
     _set_session_cookie(response, session_token, request)
     
-    user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     # Don't send password hash to frontend
-    if "password_hash" in user:
-        del user["password_hash"]
+    user.pop("password_hash", None)
     return user
 
 @api_router.post("/auth/superadmin/login")
@@ -391,108 +1533,55 @@ async def superadmin_login(data: SuperAdminLogin, response: Response, request: R
     if data.email != SUPER_ADMIN_EMAIL or data.password != SUPER_ADMIN_PASSWORD:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Check if super admin user exists
-    existing_user = await db.users.find_one({"email": SUPER_ADMIN_EMAIL}, {"_id": 0})
-    
-    if existing_user:
-        user_id = existing_user["user_id"]
-        # Update role to superadmin
-        await db.users.update_one(
-            {"user_id": user_id},
-            {"$set": {"role": "superadmin"}}
-        )
-    else:
-        # Create super admin user
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
-        await db.users.insert_one({
-            "user_id": user_id,
-            "email": SUPER_ADMIN_EMAIL,
-            "name": "Super Admin",
-            "picture": None,
-            "role": "superadmin",
-            "created_at": datetime.now(timezone.utc)
-        })
+    # Create the super admin user, or make sure it still has the superadmin role
+    user, _ = await upsert_user(SUPER_ADMIN_EMAIL, {"role": "superadmin"}, {"name": "Super Admin", "picture": None})
+    user_id = user["user_id"]
     
     # Create session
-    session_token = f"session_{uuid.uuid4().hex}"
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    session_token = _new_session_token(user_id, expires_at)
     
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at,
-        "created_at": datetime.now(timezone.utc)
-    })
+    await store_session(user_id, session_token, expires_at)
     
     # Set cookie (secure flag auto-detected)
     _set_session_cookie(response, session_token, request)
     
-    user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+    user.pop("password_hash", None)
     return user
 
 @api_router.post("/auth/session")
 async def create_session(data: SessionData, response: Response, request: Request):
     # Exchange session_id for user data from Emergent Auth
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_response = await client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": data.session_id},
-                timeout=10.0
-            )
-            auth_response.raise_for_status()
-            user_data = auth_response.json()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to verify session: {str(e)}")
+    try:
+        auth_response = await http_get(
+            f"{EMERGENT_AUTH_URL.rstrip('/')}/auth/v1/env/oauth/session-data",
+            headers={"X-Session-ID": data.session_id}
+        )
+        auth_response.raise_for_status()
+        user_data = auth_response.json()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to verify session: {str(e)}")
     
     # Check if user is admin
     role = "admin" if user_data["email"] in ADMIN_EMAILS else "user"
     
-    # Check if user exists
-    existing_user = await db.users.find_one(
-        {"email": user_data["email"]},
-        {"_id": 0}
+    # Create or update the user
+    user, _ = await upsert_user(
+        user_data["email"],
+        {"name": user_data["name"], "picture": user_data.get("picture"), "role": role}
     )
-    
-    if existing_user:
-        user_id = existing_user["user_id"]
-        # Update user data
-        await db.users.update_one(
-            {"user_id": user_id},
-            {"$set": {
-                "name": user_data["name"],
-                "picture": user_data["picture"],
-                "role": role
-            }}
-        )
-    else:
-        # Create new user
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
-        await db.users.insert_one({
-            "user_id": user_id,
-            "email": user_data["email"],
-            "name": user_data["name"],
-            "picture": user_data.get("picture"),
-            "role": role,
-            "created_at": datetime.now(timezone.utc)
-        })
+    user_id = user["user_id"]
     
     # Create session
-    session_token = user_data["session_token"]
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    session_token = _new_session_token(user_id, expires_at, opaque_token=user_data["session_token"])
     
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at,
-        "created_at": datetime.now(timezone.utc)
-    })
+    await store_session(user_id, session_token, expires_at)
     
     # Set cookie (secure flag auto-detected)
     _set_session_cookie(response, session_token, request)
     
-    # Get user data
-    user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+    user.pop("password_hash", None)
     return user
 
 
@@ -526,36 +1615,22 @@ async def exchange_supabase(data: SupabaseTokenExchange, response: Response, req
         logging.info(f"→ Verifying token with Supabase: {supabase_url}")
         logging.info(f"Token preview: {access_token[:50]}...")
         
-        # Verify token with Supabase
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(
-                    f"{supabase_url.rstrip('/')}/auth/v1/user",
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "apikey": supabase_anon_key
-                    },
-                    timeout=10.0
+        # Verify token with Supabase (shared pooled client, short-TTL cache)
+        try:
+            supa_user = await verify_supabase_token(access_token, supabase_url, supabase_anon_key)
+            logging.info(f"Supabase user info retrieved: {supa_user.get('email')}")
+        except Exception as e:
+            logging.error(f"✗ Failed to verify supabase token: {str(e)}", exc_info=True)
+            
+            # Provide more helpful error message
+            error_msg = str(e)
+            if "401" in error_msg or "Unauthorized" in error_msg:
+                raise HTTPException(
+                    status_code=400, 
+                    detail="Token verification failed with Supabase. This usually means: 1) Google OAuth isn't enabled in your Supabase project, 2) Client ID/Secret is incorrect, or 3) Token is invalid. Check https://app.supabase.com > Authentication > Providers > Google"
                 )
-                logging.info(f"Supabase response status: {resp.status_code}")
-                if resp.status_code != 200:
-                    response_text = resp.text[:500]
-                    logging.error(f"Supabase returned {resp.status_code}: {response_text}")
-                resp.raise_for_status()
-                supa_user = resp.json()
-                logging.info(f"Supabase user info retrieved: {supa_user.get('email')}")
-            except Exception as e:
-                logging.error(f"✗ Failed to verify supabase token: {str(e)}", exc_info=True)
-                
-                # Provide more helpful error message
-                error_msg = str(e)
-                if "401" in error_msg or "Unauthorized" in error_msg:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail="Token verification failed with Supabase. This usually means: 1) Google OAuth isn't enabled in your Supabase project, 2) Client ID/Secret is incorrect, or 3) Token is invalid. Check https://app.supabase.com > Authentication > Providers > Google"
-                    )
-                else:
-                    raise HTTPException(status_code=400, detail=f"Failed to verify supabase token: {str(e)}")
+            else:
+                raise HTTPException(status_code=400, detail=f"Failed to verify supabase token: {str(e)}")
 
         email = supa_user.get("email")
         if not email:
@@ -574,53 +1649,35 @@ async def exchange_supabase(data: SupabaseTokenExchange, response: Response, req
         # 4. Else -> user role
         # This allows admins added via Super Admin Panel to keep their role on login
 
-        existing_user = await db.users.find_one({"email": email}, {"_id": 0})
-        
-        # Determine role with proper hierarchy
-        if existing_user and existing_user.get("role") in ["superadmin", "admin"]:
-            # Preserve existing admin role from database
-            role = existing_user["role"]
-        elif email in SUPER_ADMIN_EMAILS:
-            role = "superadmin"
+        # Steps 2-4 pick the default; upsert_user() applies step 1 atomically
+        if email in SUPER_ADMIN_EMAILS:
+            default_role = "superadmin"
         elif email in ADMIN_EMAILS:
-            role = "admin"
-        else:
-            role = "user"
-        if existing_user:
-            user_id = existing_user["user_id"]
-            await db.users.update_one(
-                {"user_id": user_id},
-                {"$set": {"name": name, "picture": picture, "role": role}}
-            )
+            default_role = "admin"
         else:
-            user_id = f"user_{uuid.uuid4().hex[:12]}"
-            await db.users.insert_one({
-                "user_id": user_id,
-                "email": email,
-                "name": name,
-                "picture": picture,
-                "role": role,
-                "profile_complete": False,  # New users need to complete profile
-                "created_at": datetime.now(timezone.utc)
-            })
+            default_role = "user"
+        user, _ = await upsert_user(
+            email,
+            {"name": name, "picture": picture},
+            {"profile_complete": False},  # New users need to complete profile
+            default_role=default_role
+        )
+        user_id = user["user_id"]
 
         # Create backend session - expires after 1 hour (must refresh for continuous access)
-        session_token = f"session_{uuid.uuid4().hex}"
         expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        session_token = _new_session_token(user_id, expires_at)
 
-        await db.user_sessions.insert_one({
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": expires_at,
-            "created_at": datetime.now(timezone.utc)
-        })
+        await store_session(user_id, session_token, expires_at)
 
         # Set cookie (secure flag auto-detected)
         _set_session_cookie(response, session_token, request)
 
-        user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+        user.pop("password_hash", None)
         logging.info(f"✓ User session created successfully for {email}")
         return user
+    except HTTPException:
+        raise
     except Exception as outer_e:
         logging.error(f"✗ Unexpected error in exchange_supabase: {str(outer_e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(outer_e)}")
@@ -645,19 +1702,17 @@ async def refresh_session(user: User = Depends(get_current_user), response: Resp
             raise HTTPException(status_code=401, detail="Email verification failed")
         
         # Create new session token
-        new_session_token = f"session_{uuid.uuid4().hex}"
         new_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        new_session_token = _new_session_token(user.user_id, new_expires_at)
         
-        # Delete old session
-        await db.user_sessions.delete_one({"user_id": user.user_id})
+        # Delete the session being refreshed (not some other device's session)
+        old_session_token = _get_session_token(request) if request else None
+        if old_session_token:
+            await db.user_sessions.delete_one({"session_token": old_session_token, "user_id": user.user_id})
+            await revoke_session_token(old_session_token)
         
         # Insert new session
-        await db.user_sessions.insert_one({
-            "user_id": user.user_id,
-            "session_token": new_session_token,
-            "expires_at": new_expires_at,
-            "created_at": datetime.now(timezone.utc)
-        })
+        await store_session(user.user_id, new_session_token, new_expires_at)
         
         # Set new session cookie
         if response and request:
@@ -697,20 +1752,17 @@ async def update_profile(profile: UserProfileUpdate, user: User = Depends(get_cu
         {"user_id": user.user_id},
         {"$set": update_data}
     )
+    session_cache.invalidate_user(user.user_id)
     
-    updated_user = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
+    updated_user = await db.users.find_one({"user_id": user.user_id}, {"_id": 0, "password_hash": 0})
+    await sync_search_keys(updated_user)
+    await user_export_changed(user.user_id, update_data)
     return updated_user
 
 @api_router.get("/auth/profile-options")
-async def get_profile_options():
+async def get_profile_options(request: Request):
     """Get available colleges, departments, divisions, and years for profile completion dropdown."""
-    config = await get_system_config()
-    return {
-        "colleges": config.get("colleges", []),
-        "departments": config.get("departments", []),
-        "divisions": config.get("divisions", []),
-        "years": config.get("years", [])
-    }
+    return (await current_system_config()).response(request, "profile-options")
 
 @api_router.post("/auth/complete-profile")
 async def complete_profile(profile: UserProfileUpdate, user: User = Depends(get_current_user)):
@@ -739,8 +1791,12 @@ async def complete_profile(profile: UserProfileUpdate, user: User = Depends(get_
         {"user_id": user.user_id},
         {"$set": update_data}
     )
+    session_cache.invalidate_user(user.user_id)
     
-    updated_user = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
+    updated_user = await db.users.find_one({"user_id": user.user_id}, {"_id": 0, "password_hash": 0})
+    await sync_search_keys(updated_user)
+    if updated_user["name"] != user.name:
+        await user_export_changed(user.user_id, ["name"])
     return {
         "message": "Profile completed successfully",
         "user": updated_user
@@ -748,9 +1804,10 @@ async def complete_profile(profile: UserProfileUpdate, user: User = Depends(get_
 
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
-    session_token = request.cookies.get("session_token")
+    session_token = _get_session_token(request)
     if session_token:
         await db.user_sessions.delete_one({"session_token": session_token})
+        await revoke_session_token(session_token)
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out successfully"}
 
@@ -784,20 +1841,16 @@ async def test_login(response: Response, request: Request):
             "user_id": user_id,
             "email": test_email,
             "name": "Test User",
+            "search_keys": user_search_keys({"name": "Test User", "email": test_email}),
             "picture": None,
             "role": "user",
             "created_at": datetime.now(timezone.utc)
         })
     
-    session_token = f"session_{uuid.uuid4().hex}"
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    session_token = _new_session_token(user_id, expires_at)
     
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at,
-        "created_at": datetime.now(timezone.utc)
-    })
+    await store_session(user_id, session_token, expires_at)
     
     _set_session_cookie(response, session_token, request)
     
@@ -822,54 +1875,381 @@ async def test_google_login(response: Response, request: Request):
             "user_id": user_id,
             "email": test_email,
             "name": "Google Test User",
+            "search_keys": user_search_keys({"name": "Google Test User", "email": test_email}),
             "picture": "https://lh3.googleusercontent.com/a/default-user",
             "role": "user",
             "created_at": datetime.now(timezone.utc)
         })
     
-    session_token = f"session_{uuid_module.uuid4().hex}"
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    session_token = _new_session_token(user_id, expires_at)
     
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at,
-        "created_at": datetime.now(timezone.utc)
-    })
+    await store_session(user_id, session_token, expires_at)
     
     _set_session_cookie(response, session_token, request)
     
     user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     return user
 
+# ===== EVENT SEARCH =====
+# In-process inverted index over event title/description. Replaces the
+# unanchored $regex scan: tokens are looked up in a dict, the last query
+# token also matches as a prefix (type-ahead), and results are ranked by a
+# tf-idf style score with title hits weighted above description hits.
+# create/update/delete_event update this worker's index immediately, and
+# catalog_version_poller() rebuilds it when another worker changes the
+# catalog. Rebuilds are serialized; each one replays the local writes made
+# while it was scanning. The full rescan every EVENT_SEARCH_REFRESH_SECONDS
+# is only a safety net.
+EVENT_SEARCH_REFRESH_SECONDS = float(os.environ.get('EVENT_SEARCH_REFRESH_SECONDS', '3600'))
+EVENT_SEARCH_FIELDS = {"title": 3.0, "description": 1.0}
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _naive(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return None
+
+
+class EventSearchIndex:
+    def __init__(self):
+        self.ready = False
+        self.postings: Dict[str, Dict[str, float]] = {}  # term -> {event_id: weight}
+        self.docs: Dict[str, Dict[str, Any]] = {}  # event_id -> filter fields + terms
+        self._terms: List[str] = []  # sorted, for prefix lookups
+
+    def add(self, event: Dict[str, Any]):
+        event_id = event["event_id"]
+        self.remove(event_id)
+        weights: Dict[str, float] = {}
+        for field, boost in EVENT_SEARCH_FIELDS.items():
+            for term in _tokenize(event.get(field)):
+                weights[term] = weights.get(term, 0.0) + boost
+        for term, weight in weights.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                insort(self._terms, term)
+            posting[event_id] = weight
+        self.docs[event_id] = {
+            "terms": list(weights),
+            "status": event.get("status"),
+            "category": event.get("category"),
+            "event_type": event.get("event_type"),
+            "event_date": event.get("event_date")
+        }
+
+    def remove(self, event_id: str):
+        doc = self.docs.pop(event_id, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(event_id, None)
+            if not posting:
+                del self.postings[term]
+                i = bisect_left(self._terms, term)
+                if i < len(self._terms) and self._terms[i] == term:
+                    del self._terms[i]
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        i = bisect_left(self._terms, prefix)
+        out = []
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            out.append(self._terms[i])
+            i += 1
+        return out
+
+    def search(
+        self,
+        query: str,
+        status: Optional[str] = "active",
+        category: Optional[str] = None,
+        event_type: Optional[str] = None,
+        limit: int = 100
+    ) -> List[str]:
+        """Return matching event_ids, best first. Every query token must match."""
+        tokens = _tokenize(query)
+        if not tokens:
+            return []
+        n_docs = max(len(self.docs), 1)
+        scores: Optional[Dict[str, float]] = None
+        for i, token in enumerate(tokens):
+            # Exact hits score fully; the trailing token also matches as a prefix
+            candidates = [(token, 1.0)]
+            if i == len(tokens) - 1:
+                candidates += [(t, 0.5) for t in self._prefix_terms(token) if t != token]
+            token_scores: Dict[str, float] = {}
+            for term, factor in candidates:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + n_docs / len(posting))
+                for event_id, weight in posting.items():
+                    score = weight * idf * factor
+                    if score > token_scores.get(event_id, 0.0):
+                        token_scores[event_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {e: s + token_scores[e] for e, s in scores.items() if e in token_scores}
+            if not scores:
+                return []
+
+        def matches(event_id: str) -> bool:
+            doc = self.docs[event_id]
+            return ((status is None or doc["status"] == status)
+                    and (category is None or doc["category"] == category)
+                    and (event_type is None or doc["event_type"] == event_type))
+
+        return heapq.nsmallest(
+            limit,
+            (e for e in scores if matches(e)),
+            key=lambda e: (-scores[e], _naive(self.docs[e]["event_date"]) or datetime.max)
+        )
+
+
+event_search_index = EventSearchIndex()
+_search_rebuild_lock = asyncio.Lock()
+_search_rebuild_logs: List[List[tuple]] = []  # mutations made while a rebuild is scanning
+
+
+def index_event(event: Dict[str, Any]):
+    event_search_index.add(event)
+    for log in _search_rebuild_logs:
+        log.append(("add", event))
+
+
+def unindex_event(event_id: str):
+    event_search_index.remove(event_id)
+    for log in _search_rebuild_logs:
+        log.append(("remove", event_id))
+
+
+async def rebuild_event_search_index():
+    global event_search_index
+    projection = {"_id": 0, "event_id": 1, "status": 1, "category": 1, "event_type": 1, "event_date": 1,
+                  **{field: 1 for field in EVENT_SEARCH_FIELDS}}
+    async with _search_rebuild_lock:
+        index = EventSearchIndex()
+        log: List[tuple] = []
+        _search_rebuild_logs.append(log)
+        try:
+            async for event in db.events.find({}, projection):
+                index.add(event)
+            # Replay local writes the cursor may have missed
+            for op, arg in log:
+                if op == "add":
+                    index.add(arg)
+                else:
+                    index.remove(arg)
+        finally:
+            _search_rebuild_logs.remove(log)
+        index.ready = True
+        event_search_index = index
+
+
+async def event_search_refresher():
+    while True:
+        try:
+            await rebuild_event_search_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"✗ Event search index rebuild failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(EVENT_SEARCH_REFRESH_SECONDS)
+
+
+# ===== CATALOG CACHE =====
+# GET /events, /events/{id} and /config are public and read-mostly. Their
+# responses are cached pre-serialized per query shape and tagged with the
+# catalog version, a counter in system_config that every event/config
+# mutation increments (/config itself is served from the config snapshot). Workers poll the counter every
+# CATALOG_VERSION_POLL_SECONDS and drop their cache when it moves. The ETag
+# is derived from (version, query shape) alone, so a matching If-None-Match
+# is answered with 304 before touching Mongo or the cache.
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', '512'))
+CATALOG_VERSION_POLL_SECONDS = float(os.environ.get('CATALOG_VERSION_POLL_SECONDS', '2'))
+CATALOG_CACHE_CONTROL = os.environ.get('CATALOG_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+
+
+class CatalogCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (body, headers)
+
+    def etag(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return f'"{self.version}-{digest}"'
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: tuple, version: int, body: bytes, headers: Dict[str, str]):
+        if version != self.version or self.max_entries <= 0:
+            return  # catalog changed while this response was being built
+        self._entries[key] = (body, headers)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set_version(self, version: int) -> bool:
+        if version == self.version:
+            return False
+        self.version = version
+        self._entries.clear()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self.version, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_MAX_ENTRIES)
+# Seat counters change on every registration; keep them out of cached responses
+CATALOG_EVENT_PROJECTION = {"_id": 0, "seats_taken": 0, "teams_registered": 0, "waitlist_seq": 0}
+
+
+async def bump_catalog_version():
+    doc = await db.system_config.find_one_and_update(
+        {"config_key": "catalog_version"},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    catalog_cache.set_version(doc["version"])
+    event_cache.clear()
+
+
+async def catalog_version_poller():
+    first_poll = True
+    while True:
+        try:
+            doc = await db.system_config.find_one({"config_key": "catalog_version"}, {"_id": 0, "version": 1})
+            if catalog_cache.set_version(doc["version"] if doc else 0):
+                await refresh_system_config()
+                if not first_poll:
+                    # Another worker changed the catalog; pick up its event edits now
+                    event_cache.clear()
+                    await rebuild_event_search_index()
+            first_poll = False
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"✗ Catalog version poll failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(CATALOG_VERSION_POLL_SECONDS)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+
+async def serve_catalog(request: Request, key: tuple, build) -> Response:
+    """Serve a cacheable catalog response. ``build`` returns (payload, headers)."""
+    etag = catalog_cache.etag(key)
+    cache_headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        version = catalog_cache.version
+        payload, headers = await build()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        entry = (body, headers)
+        catalog_cache.set(key, version, body, headers)
+    body, headers = entry
+    return Response(content=body, media_type="application/json", headers={**headers, **cache_headers})
+
+
 # Event Routes
 @api_router.get("/events")
 async def get_events(
+    request: Request,
     event_type: Optional[str] = None,
     category: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
 ):
+    envelope = limit is not None or cursor is not None
+    key = ("events", event_type, category, search, limit, cursor)
+
+    async def build():
+        events, next_cursor = await _load_events(event_type, category, search, page_limit(limit, 100), cursor)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return ({"items": events, "next_cursor": next_cursor} if envelope else events), headers
+
+    return await serve_catalog(request, key, build)
+
+
+async def _load_events(
+    event_type: Optional[str],
+    category: Optional[str],
+    search: Optional[str],
+    limit: int,
+    cursor: Optional[str]
+) -> tuple:
     query: Dict[str, Any] = {"status": "active"}
     
     if event_type:
         query["event_type"] = event_type
     if category:
         query["category"] = category
+    if search and event_search_index.ready:
+        # Ranked results page by position in the (in-memory) ranking
+        rank_sort = [("rank", 1)]
+        offset = decode_cursor(cursor, rank_sort)[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        ranked_ids = event_search_index.search(search, category=category, event_type=event_type, limit=offset + limit + 1)
+        next_cursor = encode_cursor({"rank": offset + limit}, rank_sort) if len(ranked_ids) > offset + limit else None
+        ranked_ids = ranked_ids[offset:offset + limit]
+        if not ranked_ids:
+            return [], None
+        query["event_id"] = {"$in": ranked_ids}
+        events = await db.events.find(query, CATALOG_EVENT_PROJECTION).to_list(len(ranked_ids))
+        rank = {event_id: i for i, event_id in enumerate(ranked_ids)}
+        events.sort(key=lambda e: rank[e["event_id"]])
+        return events, next_cursor
     if search:
+        # Index not built yet (startup): fall back to a literal, escaped match
+        pattern = re.escape(search)
         query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
+            {"title": {"$regex": pattern, "$options": "i"}},
+            {"description": {"$regex": pattern, "$options": "i"}}
         ]
     
-    events = await db.events.find(query, {"_id": 0}).sort("event_date", 1).to_list(100)
-    return events
+    return await fetch_page(
+        db.events, query, [("event_date", 1), ("event_id", 1)], limit, cursor, CATALOG_EVENT_PROJECTION
+    )
 
 @api_router.get("/events/{event_id}")
-async def get_event(event_id: str):
-    event = await db.events.find_one({"event_id": event_id}, {"_id": 0})
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    return event
+async def get_event(event_id: str, request: Request):
+    async def build():
+        event = await db.events.find_one({"event_id": event_id}, CATALOG_EVENT_PROJECTION)
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return event, {}
+
+    return await serve_catalog(request, ("event", event_id), build)
 
 @api_router.post("/events")
 async def create_event(event: EventCreate, admin: User = Depends(require_admin)):
@@ -888,14 +2268,21 @@ async def create_event(event: EventCreate, admin: User = Depends(require_admin))
         "rules": event.rules,
         "organizer_info": event.organizer_info,
         "is_paid": event.is_paid,
+        "capacity": event.capacity,
+        "max_teams": event.max_teams,
+        "seats_taken": 0,
+        "teams_registered": 0,
+        "waitlist_enabled": event.waitlist_enabled,
         "created_at": datetime.now(timezone.utc)
     }
     await db.events.insert_one(event_doc)
+    index_event(event_doc)
+    await bump_catalog_version()
     return await db.events.find_one({"event_id": event_id}, {"_id": 0})
 
 @api_router.put("/events/{event_id}")
 async def update_event(event_id: str, event: EventUpdate, admin: User = Depends(require_admin)):
-    update_data = {k: v for k, v in event.model_dump().items() if v is not None}
+    update_data = {k: v for k, v in event.model_dump(exclude={"version"}).items() if v is not None}
     
     if "event_date" in update_data:
         update_data["event_date"] = datetime.fromisoformat(update_data["event_date"])
@@ -905,218 +2292,1373 @@ async def update_event(event_id: str, event: EventUpdate, admin: User = Depends(
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.events.update_one(
-        {"event_id": event_id},
-        {"$set": update_data}
+    updated_event = await update_versioned(
+        db.events, {"event_id": event_id}, {"$set": update_data}, event.version, "Event not found"
     )
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Event not found")
+    if "capacity" in update_data or "max_teams" in update_data:
+        updated_event.update(await recount_event_seats(event_id))
+    if {"capacity", "max_teams", "status"} & update_data.keys():
+        # More room (or a reopened event) may let queued students in
+        if await promote_waitlist(event_id):
+            updated_event = await db.events.find_one({"event_id": event_id}, {"_id": 0})
     
-    return await db.events.find_one({"event_id": event_id}, {"_id": 0})
+    index_event(updated_event)
+    await bump_catalog_version()
+    if "title" in update_data:
+        # Exports show the event title
+        await registrations_changed(event_id)
+    return updated_event
 
 @api_router.delete("/events/{event_id}")
-async def delete_event(event_id: str, admin: User = Depends(require_admin)):
+async def delete_event(event_id: str, response: Response, admin: User = Depends(require_admin)):
     result = await db.events.delete_one({"event_id": event_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Event not found")
-    return {"message": "Event deleted successfully"}
+    unindex_event(event_id)
+    await bump_catalog_version()
+    # Its waitlist and registrations are removed in the background
+    job = await create_deletion_job("event", event_id, admin.user_id)
+    response.status_code = 202
+    return {"message": "Event deleted successfully", "job": job}
 
-# Registration Routes
-@api_router.post("/registrations")
-async def create_registration(
-    registration: RegistrationCreate,
-    user: User = Depends(get_current_user)
-):
-    # Check if event exists
-    event = await db.events.find_one({"event_id": registration.event_id}, {"_id": 0})
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # Check if already registered
-    existing = await db.registrations.find_one({
-        "event_id": registration.event_id,
-        "user_id": user.user_id
-    })
-    if existing:
-        raise HTTPException(status_code=400, detail="Already registered for this event")
-    
-    # Create registration
-    registration_id = f"reg_{uuid.uuid4().hex[:12]}"
-    reg_doc = {
-        "registration_id": registration_id,
-        "event_id": registration.event_id,
-        "user_id": user.user_id,
-        "team_name": registration.team_name,
-        "team_members": [m.model_dump() for m in registration.team_members] if registration.team_members else None,
-        "payment_status": "pending",
-        "status": "active",
-        "certificate_type": None,
-        "created_at": datetime.now(timezone.utc)
+# ===== SEAT RESERVATION =====
+# Events may cap participant seats (`capacity`; a team takes one seat per
+# member) and team registrations (`max_teams`). Counters live on the event
+# document and are reserved with a single conditional find_one_and_update
+# that also checks status and deadline, so concurrent registrations can't
+# overbook. The unique (event_id, user_id) index rejects duplicate
+# registrations; the reserved seats are then handed back.
+ACTIVE_REGISTRATION_STATUSES = ["active", "cancellation_requested"]
+# Seats, stats and waitlists are settled per event, so a registration never
+# moves to another event (or user) through an edit
+REGISTRATION_IMMUTABLE_FIELDS = {"_id", "registration_id", "event_id", "user_id", "created_at", "version", "stats_gen"}
+# registration_seats() as aggregation expressions
+SEATS_EXPR = {"$max": [1, {"$size": {"$ifNull": ["$team_members", []]}}]}
+# (an empty team_name is no team, as in Python)
+TEAM_EXPR = {"$cond": [
+    {"$or": [
+        {"$and": [{"$gt": ["$team_name", None]}, {"$ne": ["$team_name", ""]}]},
+        {"$gt": [{"$size": {"$ifNull": ["$team_members", []]}}, 0]}
+    ]}, 1, 0
+]}
+
+
+def registration_seats(reg: Dict[str, Any]) -> Dict[str, int]:
+    """Counter increments a registration holds on its event."""
+    is_team = bool(reg.get("team_name") or reg.get("team_members"))
+    return {
+        "seats_taken": max(1, len(reg.get("team_members") or [])),
+        "teams_registered": 1 if is_team else 0
     }
-    await db.registrations.insert_one(reg_doc)
-    return await db.registrations.find_one({"registration_id": registration_id}, {"_id": 0})
 
-@api_router.get("/registrations")
-async def get_user_registrations(user: User = Depends(get_current_user)):
-    registrations = await db.registrations.find(
-        {"user_id": user.user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    
-    # Batch fetch events
-    event_ids = list(set(r["event_id"] for r in registrations))
-    if event_ids:
-        events = await db.events.find(
-            {"event_id": {"$in": event_ids}},
-            {"_id": 0}
-        ).to_list(len(event_ids))
-        event_map = {e["event_id"]: e for e in events}
-        
-        for reg in registrations:
-            reg["event"] = event_map.get(reg["event_id"])
-    
-    return registrations
 
-@api_router.put("/registrations/{registration_id}/request-cancellation")
-async def request_cancellation(registration_id: str, user: User = Depends(get_current_user)):
-    # Check if registration belongs to user
-    registration = await db.registrations.find_one({
-        "registration_id": registration_id,
-        "user_id": user.user_id
-    }, {"_id": 0})
-    
-    if not registration:
-        raise HTTPException(status_code=404, detail="Registration not found")
-    
-    if registration.get("status") == "cancelled":
-        raise HTTPException(status_code=400, detail="Registration already cancelled")
-    
-    if registration.get("status") == "cancellation_requested":
-        raise HTTPException(status_code=400, detail="Cancellation already requested")
-    
-    # Update status
-    await db.registrations.update_one(
-        {"registration_id": registration_id},
-        {"$set": {"status": "cancellation_requested"}}
+async def reserve_seats(
+    event_id: str,
+    seats: Dict[str, int],
+    enforce_deadline: bool = True
+) -> Optional[Dict[str, Any]]:
+    """Atomically take seats on an open event. Returns None if the event is
+    missing, closed, past its deadline or full. Waitlist promotion skips the
+    deadline check: those students queued before it passed."""
+    conditions = [{"$or": [
+        {"capacity": None},
+        {"$expr": {"$lte": [{"$add": [{"$ifNull": ["$seats_taken", 0]}, seats["seats_taken"]]}, "$capacity"]}}
+    ]}]
+    if seats["teams_registered"]:
+        conditions.append({"$or": [
+            {"max_teams": None},
+            {"$expr": {"$lt": [{"$ifNull": ["$teams_registered", 0]}, "$max_teams"]}}
+        ]})
+    query = {"event_id": event_id, "status": "active", "$and": conditions}
+    if enforce_deadline:
+        query["deadline"] = {"$gte": datetime.now(timezone.utc)}
+    return await db.events.find_one_and_update(
+        query,
+        {"$inc": seats},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    return await db.registrations.find_one({"registration_id": registration_id}, {"_id": 0})
 
-# Help Ticket Routes
-@api_router.post("/tickets")
-async def create_ticket(ticket: HelpTicketCreate, user: User = Depends(get_current_user)):
-    ticket_id = f"ticket_{uuid.uuid4().hex[:12]}"
-    ticket_doc = {
-        "ticket_id": ticket_id,
-        "user_id": user.user_id,
-        "subject": ticket.subject,
-        "message": ticket.message,
-        "status": "open",
-        "replies": [],
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
-    }
-    await db.help_tickets.insert_one(ticket_doc)
-    return await db.help_tickets.find_one({"ticket_id": ticket_id}, {"_id": 0})
 
-@api_router.get("/tickets")
-async def get_user_tickets(user: User = Depends(get_current_user)):
-    tickets = await db.help_tickets.find(
-        {"user_id": user.user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    return tickets
+async def return_seats(event_id: str, seats: Dict[str, int]):
+    # Guard keeps legacy (never counted) events from going negative
+    await db.events.update_one(
+        {"event_id": event_id, "seats_taken": {"$gte": seats["seats_taken"]}},
+        {"$inc": {k: -v for k, v in seats.items()}}
+    )
 
-@api_router.get("/admin/tickets")
-async def get_all_tickets(admin: User = Depends(require_admin)):
-    tickets = await db.help_tickets.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    # Batch fetch users
-    user_ids = list(set(t["user_id"] for t in tickets))
-    if user_ids:
-        users = await db.users.find(
-            {"user_id": {"$in": user_ids}},
-            {"_id": 0}
-        ).to_list(len(user_ids))
-        user_map = {u["user_id"]: u for u in users}
-        
-        for ticket in tickets:
-            ticket["user"] = user_map.get(ticket["user_id"])
-    
-    return tickets
 
-@api_router.post("/admin/tickets/{ticket_id}/reply")
-async def reply_to_ticket(
-    ticket_id: str,
-    reply: HelpTicketReply,
-    admin: User = Depends(require_admin)
-):
-    ticket = await db.help_tickets.find_one({"ticket_id": ticket_id}, {"_id": 0})
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    reply_doc = {
-        "reply_id": f"reply_{uuid.uuid4().hex[:8]}",
-        "user_id": admin.user_id,
-        "user_name": admin.name,
-        "user_role": admin.role,
-        "message": reply.message,
-        "created_at": datetime.now(timezone.utc)
-    }
-    
-    await db.help_tickets.update_one(
-        {"ticket_id": ticket_id},
-        {
-            "$push": {"replies": reply_doc},
-            "$set": {
-                "status": "in_progress",
-                "updated_at": datetime.now(timezone.utc)
-            }
-        }
-    )
-    return await db.help_tickets.find_one({"ticket_id": ticket_id}, {"_id": 0})
+async def release_seats(reg: Dict[str, Any]):
+    """Give back the seats held by an active registration."""
+    if reg.get("status", "active") not in ACTIVE_REGISTRATION_STATUSES:
+        return
+    await return_seats(reg["event_id"], registration_seats(reg))
 
-@api_router.put("/admin/tickets/{ticket_id}/close")
-async def close_ticket(ticket_id: str, admin: User = Depends(require_admin)):
-    result = await db.help_tickets.update_one(
-        {"ticket_id": ticket_id},
-        {"$set": {"status": "closed", "updated_at": datetime.now(timezone.utc)}}
+
+async def adjust_held_seats(before: Dict[str, Any], after: Dict[str, Any]):
+    """Apply the counter difference between two versions of a registration."""
+    def held(reg):
+        if reg.get("status", "active") not in ACTIVE_REGISTRATION_STATUSES:
+            return {"seats_taken": 0, "teams_registered": 0}
+        return registration_seats(reg)
+    old, new = held(before), held(after)
+    delta = {k: new[k] - old[k] for k in old if new[k] != old[k]}
+    if delta:
+        await db.events.update_one({"event_id": before["event_id"]}, {"$inc": delta})
+
+
+async def recount_event_seats(event_id: str) -> Dict[str, int]:
+    """Recompute an event's counters from its registrations (e.g. after
+    enabling a capacity on an event with pre-existing registrations)."""
+    counts = {"seats_taken": 0, "teams_registered": 0}
+    cursor = db.registrations.find(
+        {"event_id": event_id, "status": {"$in": ACTIVE_REGISTRATION_STATUSES}},
+        {"_id": 0, "team_name": 1, "team_members": 1}
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    return await db.help_tickets.find_one({"ticket_id": ticket_id}, {"_id": 0})
+    async for reg in cursor:
+        for key, value in registration_seats(reg).items():
+            counts[key] += value
+    await db.events.update_one({"event_id": event_id}, {"$set": counts})
+    return counts
 
-# Admin Routes
-@api_router.get("/admin/analytics")
-async def get_analytics(admin: User = Depends(require_admin)):
-    total_events = await db.events.count_documents({})
-    total_registrations = await db.registrations.count_documents({})
-    
-    # Today's registrations
-    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    today_registrations = await db.registrations.count_documents({
-        "created_at": {"$gte": today_start}
-    })
+
+async def _registration_rejection(event_id: str, user_id: str) -> HTTPException:
+    """Explain why reserve_seats() refused (only runs on the failure path)."""
+    event = await db.events.find_one({"event_id": event_id}, {"_id": 0})
+    if not event:
+        return HTTPException(status_code=404, detail="Event not found")
+    if await db.registrations.find_one({"event_id": event_id, "user_id": user_id}, {"_id": 1}):
+        return HTTPException(status_code=400, detail="Already registered for this event")
+    if event.get("status") != "active":
+        return HTTPException(status_code=400, detail="Registration is closed for this event")
+    if _naive(event.get("deadline")) and _naive(event["deadline"]) < datetime.now(timezone.utc).replace(tzinfo=None):
+        return HTTPException(status_code=400, detail="Registration deadline has passed")
+    if event.get("max_teams") is not None and event.get("teams_registered", 0) >= event["max_teams"]:
+        return HTTPException(status_code=400, detail="Team limit reached for this event")
+    return HTTPException(status_code=400, detail="Event is full")
+
+
+# ===== WAITLIST =====
+# When reserve_seats() refuses because an event is full (or out of team
+# slots) the student is queued instead. Each entry takes the next value of
+# the event's `waitlist_seq` counter, so the (event_id, seq) index is the
+# queue: the head is one index seek, and a student's position is an
+# index-only count of the entries ahead of them.
+#
+# Promotion is first-come-first-served: the head is promoted only if its
+# seats can be reserved, so a large team at the front is never skipped by a
+# smaller one behind it. Seats are reserved *before* the entry is claimed
+# with find_one_and_delete; if a concurrent promoter claimed it first, the
+# seats go back and the loop looks at the new head.
+WAITLIST_REASONS = {"Event is full", "Team limit reached for this event"}
+
+
+async def join_waitlist(reg_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue a registration request on a full event. Returns the waitlist
+    entry, or the registration if the entry was promoted straight away."""
+    event = await db.events.find_one_and_update(
+        {"event_id": reg_doc["event_id"], "waitlist_enabled": {"$ne": False}},
+        {"$inc": {"waitlist_seq": 1}},
+        projection={"_id": 0, "waitlist_seq": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not event:
+        raise HTTPException(status_code=400, detail="Event is full")
+    entry = {
+        "waitlist_id": f"wait_{uuid.uuid4().hex[:12]}",
+        "event_id": reg_doc["event_id"],
+        "user_id": reg_doc["user_id"],
+        "team_name": reg_doc["team_name"],
+        "team_members": reg_doc["team_members"],
+        "profile_snapshot": reg_doc.get("profile_snapshot"),
+        "seq": event["waitlist_seq"],
+        "created_at": datetime.now(timezone.utc)
+    }
+    try:
+        await db.waitlist.insert_one(entry)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Already on the waitlist for this event")
+    entry.pop("_id", None)
+    # A seat may have been freed between the failed reservation and the insert
+    await promote_waitlist(reg_doc["event_id"])
+    if not await db.waitlist.find_one({"waitlist_id": entry["waitlist_id"]}, {"_id": 1}):
+        registration = await db.registrations.find_one(
+            {"event_id": reg_doc["event_id"], "user_id": reg_doc["user_id"]}, {"_id": 0}
+        )
+        if registration:
+            return registration
+    return entry
+
+
+async def waitlist_position(entry: Dict[str, Any]) -> int:
+    """1-based queue position; counts only the index keys ahead of ``entry``."""
+    ahead = await db.waitlist.count_documents({"event_id": entry["event_id"], "seq": {"$lt": entry["seq"]}})
+    return ahead + 1
+
+
+async def promote_waitlist(event_id: str) -> int:
+    """Turn waitlist entries into registrations while seats are free.
+    Returns the number of students promoted."""
+    promoted = 0
+    while True:
+        head = await db.waitlist.find_one({"event_id": event_id}, {"_id": 0}, sort=[("seq", 1)])
+        if not head:
+            break
+        seats = registration_seats(head)
+        event = await reserve_seats(event_id, seats, enforce_deadline=False)
+        if not event:
+            break
+        if not await db.waitlist.find_one_and_delete({"waitlist_id": head["waitlist_id"]}):
+            # Another promoter took this entry; hand its seats back and retry
+            await release_seats(head)
+            continue
+        reg_doc = {
+            "registration_id": f"reg_{uuid.uuid4().hex[:12]}",
+            "event_id": event_id,
+            "user_id": head["user_id"],
+            "team_name": head.get("team_name"),
+            "team_members": head.get("team_members"),
+            "payment_status": "pending",
+            "status": "active",
+            "certificate_type": None,
+            "profile_snapshot": head.get("profile_snapshot"),
+            "waitlisted_at": head["created_at"],
+            "created_at": datetime.now(timezone.utc),
+            "stats_gen": (await stats_generations())[1]
+        }
+        try:
+            await registration_writer.insert_now(reg_doc)
+        except DuplicateKeyError:
+            # Registered by other means while queued
+            await release_seats(reg_doc)
+            continue
+        reg_doc.pop("_id", None)
+        await publish_registration(reg_doc, event)
+        promoted += 1
+        logging.info(f"✓ Promoted {head['user_id']} from the waitlist of {event_id}")
+    return promoted
+
+
+# ===== REGISTRATION STATS =====
+# `registration_stats` is a rollup with one counter document per (event_id,
+# day, college, department, year). Every registration write applies its
+# counter delta with one upserting $inc, so dashboard pipelines read a few
+# rows per event and day instead of every registration. The college,
+# department and year come from `profile_snapshot`, the student's profile
+# at registration time, so later profile edits can't move counts between
+# buckets. `registrations` includes cancelled ones (as before); `cancelled`
+# is counted separately.
+#
+# Rows belong to a generation (`gen`); analytics reads the live one named by
+# the stats marker, and until the first one is built runs the same
+# pipelines over registrations grouped on the fly. Each registration
+# carries `stats_gen`, the newest generation that counts it, and a write
+# applies its delta to every generation from the live one up to that
+# `stats_gen`, taken from the write's own pre- or post-image. A rebuild
+# (first startup, or POST /api/superadmin/analytics/rebuild) opens a new
+# generation and moves every registration below it up with one conditional
+# update each, adding the state that update saw to the new rows. A write
+# that lands before the move is part of that state; one that lands after
+# carries the new `stats_gen` and brings its own delta. Whether a delta
+# counts therefore follows from the registration itself, never from timing.
+# Once none are left below it the generation goes live and older rows are
+# dropped. A registration inserted under an older generation while that
+# happens is moved up by a last sweep or by its own writer, which checks
+# the live generation after inserting. The worker that claims the first
+# build heartbeats its claim; a claim older than STATS_BUILD_STALE_SECONDS
+# is taken over with a fresh generation.
+STATS_BUILD_STALE_SECONDS = int(os.environ.get('STATS_BUILD_STALE_SECONDS', '600'))
+STATS_MARK_BATCH_SIZE = int(os.environ.get('STATS_MARK_BATCH_SIZE', '500'))
+STATS_DIMENSIONS = ("college", "department", "year")
+STATS_COUNTERS = ("registrations", "single_registrations", "team_registrations", "participants", "cancelled")
+STATS_BREAKDOWNS = {"event": "event_id", "day": "day", "college": "college", "department": "department", "year": "year"}
+STATS_MARKER = "registration_stats"
+STATS_LEGACY_INDEX = "event_id_1_day_1_college_1_department_1_year_1"  # unique without gen
+STATS_DOC_PROJECTION = {
+    "_id": 0, "registration_id": 1, "event_id": 1, "created_at": 1, "profile_snapshot": 1,
+    "status": 1, "team_name": 1, "team_members": 1, "stats_gen": 1
+}
+
+_stats_generations: Optional[tuple] = None  # (live, newest) as last read
+_stats_rebuild_lock = asyncio.Lock()
+
+# Registrations -> rollup rows (fallback until the rollup exists)
+ROLLUP_PIPELINE = [
+    {"$group": {
+        "_id": {
+            "event_id": "$event_id",
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            **{dim: f"$profile_snapshot.{dim}" for dim in STATS_DIMENSIONS}
+        },
+        "registrations": {"$sum": 1},
+        "single_registrations": {"$sum": {"$subtract": [1, TEAM_EXPR]}},
+        "team_registrations": {"$sum": TEAM_EXPR},
+        "participants": {"$sum": SEATS_EXPR},
+        "cancelled": {"$sum": {"$cond": [{"$eq": ["$status", "cancelled"]}, 1, 0]}}
+    }},
+    {"$project": {
+        "_id": 0,
+        "event_id": "$_id.event_id",
+        "day": "$_id.day",
+        **{dim: f"$_id.{dim}" for dim in STATS_DIMENSIONS},
+        **{counter: 1 for counter in STATS_COUNTERS}
+    }}
+]
+
+
+def profile_snapshot(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {dim: user.get(dim) for dim in STATS_DIMENSIONS}
+
+
+def stats_key(reg: Dict[str, Any]) -> Dict[str, Any]:
+    snapshot = reg.get("profile_snapshot") or {}
+    return {
+        "event_id": reg["event_id"],
+        "day": _parse_expires_at(reg["created_at"]).strftime("%Y-%m-%d"),
+        **{dim: snapshot.get(dim) for dim in STATS_DIMENSIONS}
+    }
+
+
+def stats_counters(reg: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    if reg is None:
+        return dict.fromkeys(STATS_COUNTERS, 0)
+    seats = registration_seats(reg)
+    return {
+        "registrations": 1,
+        "single_registrations": 1 - seats["teams_registered"],
+        "team_registrations": seats["teams_registered"],
+        "participants": seats["seats_taken"],
+        "cancelled": 1 if reg.get("status") == "cancelled" else 0
+    }
+
+
+async def load_stats_generations() -> tuple:
+    """Read (live, newest) rollup generations from the marker. Either is
+    None before the first build."""
+    global _stats_generations
+    marker = await db.system_config.find_one(
+        {"config_key": STATS_MARKER}, {"_id": 0, "generation": 1, "building": 1}
+    ) or {}
+    live = marker.get("generation")
+    building = marker.get("building")
+    _stats_generations = (live, building if building is not None and (live is None or building > live) else live)
+    return _stats_generations
+
+
+async def stats_generations() -> tuple:
+    """(live, newest) as last read. Both only grow, so a stale pair is a
+    lower bound, which is all writers need."""
+    return _stats_generations or await load_stats_generations()
+
+
+def stats_targets(stats_gen: Optional[int], live: Optional[int]) -> range:
+    """Generations whose rows count a registration with ``stats_gen``: the
+    live one up to its own. None when nothing counts it yet, or when it was
+    inserted under a generation older than the live one and waits to be
+    moved up."""
+    if stats_gen is None or (live is not None and live > stats_gen):
+        return range(0)
+    return range(stats_gen if live is None else live, stats_gen + 1)
+
+
+def _stats_delta_ops(deltas: Dict[tuple, Dict[str, Any]]) -> List[UpdateOne]:
+    ops = []
+    for row in deltas.values():
+        inc = {k: v for k, v in row["inc"].items() if v}
+        if inc:
+            ops.append(UpdateOne(row["key"], {"$inc": inc}, upsert=True))
+    return ops
+
+
+def _add_stats_delta(deltas: Dict[tuple, Dict[str, Any]], gen: int, reg: Dict[str, Any], sign: int):
+    key = {"gen": gen, **stats_key(reg)}
+    row = deltas.setdefault(tuple(key.values()), {"key": key, "inc": dict.fromkeys(STATS_COUNTERS, 0)})
+    for counter, value in stats_counters(reg).items():
+        row["inc"][counter] += sign * value
+
+
+async def track_registration_stats(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Apply the rollup delta between two versions of a registration
+    (``before`` is None for a new one, ``after`` None for a deletion)."""
+    await track_registration_stats_many([(before, after)])
+
+
+async def track_registration_stats_many(changes: List[tuple]):
+    """Apply the rollup deltas of many (before, after) pairs, merged per
+    rollup row into one bulk write. Each side must carry the `stats_gen` of
+    the write that produced it."""
+    live, _ = await stats_generations()
+    deltas: Dict[tuple, Dict[str, Any]] = {}
+    for before, after in changes:
+        # The old version leaves its row and the new one enters its own
+        # (they differ when e.g. the profile snapshot was edited)
+        for reg, sign in ((before, -1), (after, 1)):
+            if reg is None:
+                continue
+            for gen in stats_targets(reg.get("stats_gen"), live):
+                _add_stats_delta(deltas, gen, reg, sign)
+    ops = _stats_delta_ops(deltas)
+    if not ops:
+        return
+    try:
+        await db.registration_stats.bulk_write(ops, ordered=False)
+    except Exception as e:
+        # The writes themselves succeeded; a rebuild repairs the rollup
+        logging.error(f"✗ Failed to update registration stats: {str(e)}", exc_info=True)
+
+
+async def track_new_registration(reg: Dict[str, Any]):
+    """Count a registration that was just inserted with the newest
+    generation as last read. If a newer one went live meanwhile, move it up
+    like a rebuild would."""
+    await track_registration_stats(None, reg)
+    live, _ = await load_stats_generations()
+    if live is not None and (reg.get("stats_gen") is None or reg["stats_gen"] < live):
+        await count_into_generation(live, [reg])
+
+
+async def count_into_generation(gen: int, regs: List[Dict[str, Any]]) -> int:
+    """Move registrations (each with the `stats_gen` it was read with) up
+    to generation ``gen`` and add the state each move saw to its rows. One
+    that moved meanwhile was counted by whoever moved it and is skipped.
+    Returns the number moved."""
+    async def move(reg):
+        return await db.registrations.find_one_and_update(
+            {"registration_id": reg["registration_id"], "stats_gen": reg.get("stats_gen")},
+            {"$set": {"stats_gen": gen}},
+            projection=STATS_DOC_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    moved = [doc for doc in await asyncio.gather(*(move(reg) for reg in regs)) if doc]
+    deltas: Dict[tuple, Dict[str, Any]] = {}
+    for doc in moved:
+        _add_stats_delta(deltas, gen, doc, 1)
+    ops = _stats_delta_ops(deltas)
+    if ops:
+        await db.registration_stats.bulk_write(ops, ordered=False)
+    return len(moved)
+
+
+async def sweep_into_generation(gen: int) -> int:
+    """Move every registration below generation ``gen`` up to it. Returns
+    the number moved."""
+    moved = 0
+    query = {"$or": [{"stats_gen": {"$lt": gen}}, {"stats_gen": None}]}
+    while True:
+        batch = await db.registrations.find(
+            query, {"_id": 0, "registration_id": 1, "stats_gen": 1}
+        ).limit(STATS_MARK_BATCH_SIZE).to_list(STATS_MARK_BATCH_SIZE)
+        if not batch:
+            return moved
+        moved += await count_into_generation(gen, batch)
+        await _heartbeat_stats_claim()
+
+
+async def delete_registrations(query: Dict[str, Any]) -> int:
+    """Delete the registrations matching ``query`` and take each one's
+    counts out of the rollup as it was deleted. Returns the number deleted."""
+    ids = await db.registrations.distinct("_id", query)
+    deleted = await asyncio.gather(*(
+        db.registrations.find_one_and_delete({"_id": _id}, projection=STATS_DOC_PROJECTION) for _id in ids
+    ))
+    deleted = [doc for doc in deleted if doc]
+    await track_registration_stats_many([(doc, None) for doc in deleted])
+    return len(deleted)
+
+
+async def snapshot_legacy_registrations(batch_size: int = 500) -> int:
+    """Give registrations created before the rollup a profile_snapshot from
+    the student's current profile. Returns the number updated."""
+    updated = 0
+    while True:
+        batch = await db.registrations.find(
+            {"profile_snapshot": {"$exists": False}}, {"_id": 1, "user_id": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        user_ids = list({r["user_id"] for r in batch})
+        users = await db.users.find(
+            {"user_id": {"$in": user_ids}},
+            {"_id": 0, "user_id": 1, **{dim: 1 for dim in STATS_DIMENSIONS}}
+        ).to_list(len(user_ids))
+        user_map = {u["user_id"]: u for u in users}
+        await db.registrations.bulk_write([
+            UpdateOne({"_id": r["_id"]}, {"$set": {"profile_snapshot": profile_snapshot(user_map.get(r["user_id"], {}))}})
+            for r in batch
+        ], ordered=False)
+        updated += len(batch)
+
+
+async def _heartbeat_stats_claim():
+    await db.system_config.update_one(
+        {"config_key": STATS_MARKER, "status": "building"}, {"$set": {"claimed_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def rebuild_registration_stats() -> Dict[str, int]:
+    """Build a new rollup generation from registrations and make it live,
+    without losing writes that land meanwhile."""
+    async with _stats_rebuild_lock:
+        if STATS_LEGACY_INDEX in await db.registration_stats.index_information():
+            # Rows from before generations; their unique index would clash
+            await db.registration_stats.drop_index(STATS_LEGACY_INDEX)
+        snapshotted = await snapshot_legacy_registrations()
+        marker = await db.system_config.find_one_and_update(
+            {"config_key": STATS_MARKER},
+            {"$inc": {"last_generation": 1}},
+            projection={"_id": 0, "last_generation": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        gen = marker["last_generation"]
+        await db.system_config.update_one({"config_key": STATS_MARKER}, {"$set": {"building": gen}})
+        await load_stats_generations()
+        moved = await sweep_into_generation(gen)
+        # Go live unless a newer generation already has
+        await db.system_config.update_one(
+            {"config_key": STATS_MARKER, "$or": [{"generation": {"$lt": gen}}, {"generation": None}]},
+            {"$set": {"status": "ready", "generation": gen, "built_at": datetime.now(timezone.utc)}}
+        )
+        await db.system_config.update_one({"config_key": STATS_MARKER, "building": gen}, {"$unset": {"building": ""}})
+        live, _ = await load_stats_generations()
+        # Registrations inserted under the old generation while this one went live
+        moved += await sweep_into_generation(live)
+        await db.registration_stats.delete_many({"$or": [{"gen": {"$lt": live}}, {"gen": None}]})
+        rows = await db.registration_stats.count_documents({"gen": live})
+        logging.info(f"✓ Rebuilt registration stats: generation {gen}, {moved} registrations, {rows} rollup rows")
+        return {"generation": gen, "rows": rows, "registrations": moved, "snapshotted_registrations": snapshotted}
+
+
+async def ensure_registration_stats():
+    """Build the rollup on first startup (or the first generation of a
+    rollup from before generations). One worker claims the build; the
+    others wait, and take the claim over if it stops heartbeating (the
+    claiming worker died mid-build)."""
+    stale_after = timedelta(seconds=STATS_BUILD_STALE_SECONDS)
+    while True:
+        try:
+            now = datetime.now(timezone.utc)
+            marker = await db.system_config.find_one_and_update(
+                {"config_key": STATS_MARKER},
+                {"$setOnInsert": {"status": "building", "claimed_at": now}},
+                upsert=True
+            )
+            claimed = marker is None
+            if marker and marker.get("status") == "ready" and marker.get("generation") is None:
+                claimed = await db.system_config.find_one_and_update(
+                    {"config_key": STATS_MARKER, "status": "ready", "generation": None},
+                    {"$set": {"status": "building", "claimed_at": now}}
+                ) is not None
+            elif marker and marker.get("status") == "building" and _parse_expires_at(marker["claimed_at"]) < now - stale_after:
+                claimed = await db.system_config.find_one_and_update(
+                    {"config_key": STATS_MARKER, "status": "building", "claimed_at": marker["claimed_at"]},
+                    {"$set": {"claimed_at": now}}
+                ) is not None
+                if claimed:
+                    logging.info("✓ Taking over a stale registration stats build")
+            if claimed:
+                await rebuild_registration_stats()
+                return
+            if marker.get("status") == "ready":
+                await load_stats_generations()
+                return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"✗ Registration stats build failed: {str(e)}", exc_info=True)
+            return
+        await asyncio.sleep(stale_after.total_seconds() / 2)
+
+
+async def stats_source() -> tuple:
+    """(collection, pipeline prefix) yielding rollup-shaped rows."""
+    live, _ = await load_stats_generations()
+    if live is not None:
+        return db.registration_stats, [{"$match": {"gen": live}}]
+    return db.registrations, list(ROLLUP_PIPELINE)
+
+
+def _stats_sums() -> Dict[str, Any]:
+    return {counter: {"$sum": f"${counter}"} for counter in STATS_COUNTERS}
+
+
+def _stats_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Counters of a grouped row, plus the derived active count."""
+    counts = {counter: row.get(counter, 0) for counter in STATS_COUNTERS}
+    counts["active"] = counts["registrations"] - counts["cancelled"]
+    return counts
+
+
+async def stats_breakdown(by: str, match: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    field = STATS_BREAKDOWNS[by]
+    collection, pipeline = await stats_source()
+    if match:
+        pipeline.append({"$match": match})
+    pipeline += [
+        {"$group": {"_id": f"${field}", **_stats_sums()}},
+        {"$sort": {"_id": 1} if by == "day" else {"registrations": -1, "_id": 1}}
+    ]
+    return [{by: row["_id"], **_stats_row(row)} async for row in collection.aggregate(pipeline)]
+
+
+# ===== REGISTRATION WRITE QUEUE =====
+# Optional group commit for registration bursts (REGISTRATION_WRITE_MODE=
+# buffered). Registrations that passed seat reservation are queued and a
+# single background task writes them with one unordered insert_many per
+# batch: as soon as REGISTRATION_BATCH_MAX_DOCS are waiting, or
+# REGISTRATION_BATCH_MAX_WAIT_MS after the first one arrived. Each caller
+# awaits its own future, which fails with DuplicateKeyError if only that
+# document was rejected. Beyond REGISTRATION_QUEUE_MAX pending documents
+# callers get a 503. "direct" (default) keeps one insert_one per request.
+# In both modes the on_commit hook (stats rollup, export version) runs as
+# part of the write itself, not in the request, so a caller cancelled after
+# its document committed can't skip it.
+REGISTRATION_WRITE_MODE = os.environ.get('REGISTRATION_WRITE_MODE', 'direct')  # direct | buffered
+REGISTRATION_BATCH_MAX_DOCS = int(os.environ.get('REGISTRATION_BATCH_MAX_DOCS', '200'))
+REGISTRATION_BATCH_MAX_WAIT_MS = float(os.environ.get('REGISTRATION_BATCH_MAX_WAIT_MS', '10'))
+REGISTRATION_QUEUE_MAX = int(os.environ.get('REGISTRATION_QUEUE_MAX', '5000'))
+
+
+class RegistrationWriteQueue:
+    def __init__(self, max_docs: int, max_wait_ms: float, max_pending: int, on_commit=None):
+        self.max_docs = max_docs
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.on_commit = on_commit
+        self._buffer: List[tuple] = []
+        self._inflight = 0
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def pending(self) -> int:
+        return len(self._buffer) + self._inflight
+
+    def start(self):
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop accepting work and flush whatever is still queued."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._arrived.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    def check_capacity(self):
+        if self.running and self.pending() >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Registration is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+
+    async def insert(self, doc: Dict[str, Any]):
+        """Insert one registration, batched with concurrent callers when running."""
+        if not self.running:
+            await self.insert_now(doc)
+            return
+        self.check_capacity()
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((doc, future))
+        self._arrived.set()
+        if len(self._buffer) >= self.max_docs:
+            self._full.set()
+        await future
+
+    async def insert_now(self, doc: Dict[str, Any]):
+        """Insert one registration on its own, outside any batch. The write
+        and on_commit finish even if the caller is cancelled."""
+        await asyncio.shield(self._insert_one(doc))
+
+    async def _insert_one(self, doc: Dict[str, Any]):
+        await db.registrations.insert_one(doc)
+        await self._committed([doc])
+
+    async def _committed(self, docs: List[Dict[str, Any]]):
+        """Run on_commit for written documents. Failures are logged: the
+        registrations stand either way."""
+        if self.on_commit is None or not docs:
+            return
+        results = await asyncio.gather(*(self.on_commit(doc) for doc in docs), return_exceptions=True)
+        for doc, result in zip(docs, results):
+            if isinstance(result, Exception):
+                logging.error(f"✗ Post-commit update for {doc['registration_id']} failed: {result!r}")
+
+    async def _run(self):
+        while True:
+            await self._arrived.wait()
+            if not self._buffer:
+                if self._closing:
+                    return
+                self._arrived.clear()
+                continue
+            if len(self._buffer) < self.max_docs and not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._buffer[:self.max_docs]
+            del self._buffer[:self.max_docs]
+            if len(self._buffer) < self.max_docs and not self._closing:
+                self._full.clear()
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logging.error(f"✗ Registration batch failed: {str(e)}", exc_info=True)
+
+    async def _flush(self, batch: List[tuple]):
+        self._inflight += len(batch)
+        errors: Dict[int, Exception] = {}
+        try:
+            await db.registrations.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                error_cls = DuplicateKeyError if err.get("code") == 11000 else OperationFailure
+                errors[err["index"]] = error_cls(err.get("errmsg", ""), err.get("code"))
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+        finally:
+            self._inflight -= len(batch)
+        self.batches += 1
+        self.failed += len(errors)
+        self.written += len(batch) - len(errors)
+        await self._committed([doc for i, (doc, _) in enumerate(batch) if i not in errors])
+        for i, (doc, future) in enumerate(batch):
+            if future.done():  # caller went away; the write still stands
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(doc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": REGISTRATION_WRITE_MODE,
+            "running": self.running,
+            "pending": self.pending(),
+            "max_pending": self.max_pending,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_batch_size": round((self.written + self.failed) / self.batches, 1) if self.batches else 0.0
+        }
+
+
+async def registration_committed(reg: Dict[str, Any]):
+    """Bookkeeping for a registration that has just been written."""
+    await track_new_registration(reg)
+    await registrations_changed(reg["event_id"])
+
+
+registration_writer = RegistrationWriteQueue(
+    REGISTRATION_BATCH_MAX_DOCS, REGISTRATION_BATCH_MAX_WAIT_MS, REGISTRATION_QUEUE_MAX, registration_committed
+)
+
+
+# Registration Routes
+@api_router.post("/registrations")
+async def create_registration(
+    registration: RegistrationCreate,
+    response: Response,
+    user: User = Depends(get_current_user)
+):
+    reg_doc = {
+        "registration_id": f"reg_{uuid.uuid4().hex[:12]}",
+        "event_id": registration.event_id,
+        "user_id": user.user_id,
+        "team_name": registration.team_name,
+        "team_members": [m.model_dump() for m in registration.team_members] if registration.team_members else None,
+        "payment_status": "pending",
+        "status": "active",
+        "certificate_type": None,
+        "profile_snapshot": profile_snapshot(user.model_dump()),
+        "created_at": datetime.now(timezone.utc),
+        "stats_gen": (await stats_generations())[1]
+    }
+    
+    # Shed load before touching the event counters
+    registration_writer.check_capacity()
+    
+    # Reserve seats (existence, status, deadline and capacity in one round trip)
+    seats = registration_seats(reg_doc)
+    event = await reserve_seats(registration.event_id, seats)
+    if not event:
+        rejection = await _registration_rejection(registration.event_id, user.user_id)
+        if rejection.detail not in WAITLIST_REASONS:
+            raise rejection
+        entry = await join_waitlist(reg_doc)
+        if "registration_id" in entry:
+            return entry
+        response.status_code = 202
+        return {**entry, "status": "waitlisted", "position": await waitlist_position(entry)}
+    
+    # Create registration; the unique (event_id, user_id) index catches duplicates
+    try:
+        await registration_writer.insert(reg_doc)
+    except DuplicateKeyError:
+        await release_seats(reg_doc)
+        raise HTTPException(status_code=400, detail="Already registered for this event")
+    except Exception:
+        await release_seats(reg_doc)
+        raise
+    reg_doc.pop("_id", None)
+    await publish_registration(reg_doc, event)
+    return reg_doc
+
+@api_router.get("/registrations")
+async def get_user_registrations(
+    response: Response,
+    user: User = Depends(get_current_user),
+    loaders: Loaders = Depends(get_loaders),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    envelope = limit is not None or cursor is not None
+    registrations, next_cursor = await fetch_page(
+        db.registrations,
+        {"user_id": user.user_id},
+        [("created_at", -1), ("registration_id", -1)],
+        page_limit(limit, 100),
+        cursor
+    )
+    
+    # Batch fetch events (public view, as in the catalog)
+    event_map = await loaders.events(CATALOG_EVENT_PROJECTION).load_many(r["event_id"] for r in registrations)
+    for reg in registrations:
+        reg["event"] = event_map[reg["event_id"]]
+    
+    return page_response(response, registrations, next_cursor, envelope)
+
+@api_router.get("/events/{event_id}/waitlist")
+async def get_waitlist_position(event_id: str, user: User = Depends(get_current_user)):
+    entry = await db.waitlist.find_one({"event_id": event_id, "user_id": user.user_id}, {"_id": 0})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Not on the waitlist for this event")
+    return {**entry, "position": await waitlist_position(entry)}
+
+@api_router.delete("/events/{event_id}/waitlist")
+async def leave_waitlist(event_id: str, user: User = Depends(get_current_user)):
+    result = await db.waitlist.delete_one({"event_id": event_id, "user_id": user.user_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Not on the waitlist for this event")
+    return {"message": "Left the waitlist"}
+
+@api_router.put("/registrations/{registration_id}/request-cancellation")
+async def request_cancellation(
+    registration_id: str,
+    user: User = Depends(get_current_user),
+    version: Optional[int] = None
+):
+    # Ownership and status are part of the write condition
+    query = {"registration_id": registration_id, "user_id": user.user_id}
+    registration = await db.registrations.find_one_and_update(
+        version_filter({**query, "status": {"$nin": ["cancelled", "cancellation_requested"]}}, version),
+        bump_version({"$set": {"status": "cancellation_requested"}}),
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if registration:
+        await publish_registration(registration)
+        return registration
     
-    # Single vs Team registrations
-    all_registrations = await db.registrations.find({}, {"_id": 0}).to_list(1000)
-    single_count = sum(1 for r in all_registrations if not r.get("team_name"))
-    team_count = len(all_registrations) - single_count
+    # Work out why nothing matched
+    current = await db.registrations.find_one(query, {"_id": 0, "status": 1})
+    if not current:
+        raise HTTPException(status_code=404, detail="Registration not found")
+    if current.get("status") == "cancelled":
+        raise HTTPException(status_code=400, detail="Registration already cancelled")
+    if current.get("status") == "cancellation_requested":
+        raise HTTPException(status_code=400, detail="Cancellation already requested")
+    raise HTTPException(status_code=409, detail=VERSION_CONFLICT)
+
+# ===== LIVE UPDATES =====
+# Server-Sent Events push channel. Routes publish to an in-process hub and
+# each GET /stream connection subscribes to topics its user may see:
+#   tickets           every ticket change (admins)
+#   registrations     registration counts of every event (admins)
+#   event:<event_id>  registration counts of one event (admins)
+#   user:<user_id>    the user's own tickets and registrations ("user:me")
+# A message is serialized once and shared by all its subscribers. Each
+# connection buffers at most SSE_BUFFER_SIZE messages; a client that falls
+# that far behind is evicted and reconnects. One hub task sends heartbeats
+# to idle connections, so a quiet connection holds no timer of its own. The
+# hub is per process: a connection sees what its own worker publishes.
+SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', '64'))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', '20'))
+SSE_MAX_CONNECTIONS = int(os.environ.get('SSE_MAX_CONNECTIONS', '5000'))
+SSE_MAX_TOPICS = 20
+SSE_RETRY_MS = 3000
+SSE_HEARTBEAT = b": ping\n\n"
+EVENT_COUNT_PROJECTION = {
+    "_id": 0, "event_id": 1, "seats_taken": 1, "teams_registered": 1, "capacity": 1, "max_teams": 1
+}
+
+
+def sse_message(event: str, data: Any) -> bytes:
+    payload = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    __slots__ = ("topics", "buffer", "ready", "evicted")
+
+    def __init__(self, topics: set):
+        self.topics = topics
+        self.buffer: deque = deque()
+        self.ready = asyncio.Event()
+        self.evicted = False
+
+    def push(self, message: bytes) -> bool:
+        if len(self.buffer) >= SSE_BUFFER_SIZE:
+            return False
+        self.buffer.append(message)
+        self.ready.set()
+        return True
+
+
+class LiveHub:
+    def __init__(self):
+        self._topics: Dict[str, set] = {}
+        self._subscriptions: set = set()
+        self.published = 0
+        self.delivered = 0
+        self.evictions = 0
+
+    def subscribe(self, topics: set) -> Subscription:
+        if len(self._subscriptions) >= SSE_MAX_CONNECTIONS:
+            raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "30"})
+        sub = Subscription(topics)
+        self._subscriptions.add(sub)
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscriptions.discard(sub)
+        for topic in sub.topics:
+            subs = self._topics.get(topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[topic]
+
+    def has_subscribers(self, *topics: str) -> bool:
+        return any(topic in self._topics for topic in topics)
+
+    def publish(self, topics: List[str], event: str, data: Any):
+        targets = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        if not targets:
+            return
+        message = sse_message(event, data)
+        self.published += 1
+        for sub in targets:
+            if sub.push(message):
+                self.delivered += 1
+            else:
+                self._evict(sub)
+
+    def _evict(self, sub: Subscription):
+        sub.evicted = True
+        sub.ready.set()
+        self.unsubscribe(sub)
+        self.evictions += 1
+
+    async def run_heartbeats(self):
+        while True:
+            await asyncio.sleep(SSE_HEARTBEAT_SECONDS)
+            for sub in list(self._subscriptions):
+                if not sub.buffer:
+                    sub.push(SSE_HEARTBEAT)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._subscriptions),
+            "topics": len(self._topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evictions": self.evictions
+        }
+
+
+live_hub = LiveHub()
+
+
+def authorize_topic(user: User, topic: str) -> str:
+    """Resolve a requested topic for ``user``; 400 if unknown, 403 if not allowed."""
+    kind, _, key = topic.partition(":")
+    is_admin = user.role in ["admin", "superadmin"]
+    if topic in ("tickets", "registrations") or (kind == "event" and key):
+        if is_admin:
+            return topic
+    elif kind == "user" and key:
+        if key == "me":
+            return f"user:{user.user_id}"
+        if key == user.user_id or is_admin:
+            return topic
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown topic: {topic}")
+    raise HTTPException(status_code=403, detail=f"Not allowed to subscribe to {topic}")
+
+
+def publish_ticket(event: str, ticket: Dict[str, Any], reply: Optional[Dict[str, Any]] = None):
+    live_hub.publish(["tickets", f"user:{ticket['user_id']}"], event, {"ticket": ticket, "reply": reply})
+
+
+async def publish_event_counts(event_id: str, event: Optional[Dict[str, Any]] = None):
+    """Push an event's seat counters to admins watching it; only read when
+    someone is listening."""
+    topics = ["registrations", f"event:{event_id}"]
+    if not live_hub.has_subscribers(*topics):
+        return
+    if event is None:
+        event = await db.events.find_one({"event_id": event_id}, EVENT_COUNT_PROJECTION)
+        if event is None:
+            return
+    live_hub.publish(topics, "registration_counts", {k: event.get(k) for k in EVENT_COUNT_PROJECTION if k != "_id"})
+
+
+async def publish_registration(reg: Dict[str, Any], event: Optional[Dict[str, Any]] = None):
+    """Tell the student about their registration and admins about the counts."""
+    live_hub.publish([f"user:{reg['user_id']}"], "registration", reg)
+    await publish_event_counts(reg["event_id"], event)
+
+
+@api_router.get("/stream")
+async def live_updates(topics: str, user: User = Depends(get_current_user)):
+    """SSE stream of the comma-separated ``topics``."""
+    wanted = {authorize_topic(user, topic.strip()) for topic in topics.split(",") if topic.strip()}
+    if not wanted or len(wanted) > SSE_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"Subscribe to 1-{SSE_MAX_TOPICS} topics")
+    sub = live_hub.subscribe(wanted)
+    
+    async def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            while True:
+                await sub.ready.wait()
+                sub.ready.clear()
+                if sub.evicted:
+                    yield sse_message("evicted", {"reason": "Too far behind; reconnect and reload"})
+                    return
+                chunk = b"".join(sub.buffer)
+                sub.buffer.clear()
+                yield chunk
+        finally:
+            live_hub.unsubscribe(sub)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ===== TICKET REPLIES =====
+# Replies live in ticket_replies, one document each, and are read a page at
+# a time in (created_at, reply_id) order. The ticket itself only carries a
+# summary (reply_count, last_reply_at, last_reply_by, last_reply_role), so
+# inbox lists never load a thread. Tickets from before the split keep an
+# embedded `replies` array until migrate_ticket_replies() moves it over.
+TICKET_STATUSES = ["open", "in_progress", "closed"]
+TICKET_REPLY_SORT = [("created_at", 1), ("reply_id", 1)]
+TICKET_PROJECTION = {"_id": 0, "replies": 0}
+
+
+async def ticket_reply_summary(ticket_id: str) -> Dict[str, Any]:
+    """Recount a ticket's summary fields from ticket_replies."""
+    count, last = await asyncio.gather(
+        db.ticket_replies.count_documents({"ticket_id": ticket_id}),
+        db.ticket_replies.find(
+            {"ticket_id": ticket_id}, {"_id": 0, "created_at": 1, "user_name": 1, "user_role": 1}
+        ).sort([("created_at", -1), ("reply_id", -1)]).limit(1).to_list(1)
+    )
+    last_reply = last[0] if last else {}
+    return {
+        "reply_count": count,
+        "last_reply_at": last_reply.get("created_at"),
+        "last_reply_by": last_reply.get("user_name"),
+        "last_reply_role": last_reply.get("user_role")
+    }
+
+
+async def migrate_ticket_replies(batch_size: int = 100) -> int:
+    """Move embedded replies into ticket_replies. Safe to interrupt or run
+    on several workers at once: replies are upserted by (ticket_id,
+    reply_id) and the summary is recounted before the array is dropped.
+    Returns the number of tickets migrated."""
+    migrated = 0
+    try:
+        while True:
+            tickets = await db.help_tickets.find(
+                {"replies": {"$exists": True}}, {"_id": 0, "ticket_id": 1, "replies": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not tickets:
+                break
+            ops = [
+                UpdateOne(
+                    {"ticket_id": ticket["ticket_id"], "reply_id": reply["reply_id"]},
+                    {"$setOnInsert": {**reply, "ticket_id": ticket["ticket_id"]}},
+                    upsert=True
+                )
+                for ticket in tickets for reply in ticket.get("replies") or []
+            ]
+            if ops:
+                await db.ticket_replies.bulk_write(ops, ordered=False)
+            for ticket in tickets:
+                await db.help_tickets.update_one(
+                    {"ticket_id": ticket["ticket_id"]},
+                    {"$set": await ticket_reply_summary(ticket["ticket_id"]), "$unset": {"replies": ""}}
+                )
+            migrated += len(tickets)
+        if migrated:
+            logging.info(f"✓ Moved replies of {migrated} tickets to ticket_replies")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"✗ Ticket reply migration failed: {str(e)}", exc_info=True)
+    return migrated
+
+
+# Help Ticket Routes
+@api_router.post("/tickets")
+async def create_ticket(ticket: HelpTicketCreate, user: User = Depends(get_current_user)):
+    ticket_id = f"ticket_{uuid.uuid4().hex[:12]}"
+    ticket_doc = {
+        "ticket_id": ticket_id,
+        "user_id": user.user_id,
+        "subject": ticket.subject,
+        "message": ticket.message,
+        "status": "open",
+        "reply_count": 0,
+        "last_reply_at": None,
+        "last_reply_by": None,
+        "last_reply_role": None,
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
+    }
+    await db.help_tickets.insert_one(ticket_doc)
+    ticket = await db.help_tickets.find_one({"ticket_id": ticket_id}, {"_id": 0})
+    publish_ticket("ticket_created", ticket)
+    return ticket
+
+@api_router.get("/tickets")
+async def get_user_tickets(
+    response: Response,
+    user: User = Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    tickets, next_cursor = await fetch_page(
+        db.help_tickets,
+        {"user_id": user.user_id},
+        [("created_at", -1), ("ticket_id", -1)],
+        page_limit(limit, 100),
+        cursor,
+        TICKET_PROJECTION
+    )
+    return page_response(response, tickets, next_cursor, limit is not None or cursor is not None)
+
+@api_router.get("/admin/tickets")
+async def get_all_tickets(
+    response: Response,
+    admin: User = Depends(require_admin),
+    loaders: Loaders = Depends(get_loaders),
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Inbox: ticket summaries (no replies), most recently active first."""
+    if status is not None and status not in TICKET_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of: {', '.join(TICKET_STATUSES)}")
+    envelope = limit is not None or cursor is not None
+    tickets, next_cursor = await fetch_page(
+        db.help_tickets,
+        {"status": status} if status else {},
+        [("updated_at", -1), ("ticket_id", -1)],
+        page_limit(limit, 1000),
+        cursor,
+        TICKET_PROJECTION
+    )
+    
+    # Batch fetch users
+    user_map = await loaders.users(("name", "email", "picture")).load_many(t["user_id"] for t in tickets)
+    for ticket in tickets:
+        ticket["user"] = user_map[ticket["user_id"]]
+    
+    return page_response(response, tickets, next_cursor, envelope)
+
+@api_router.post("/admin/tickets/{ticket_id}/reply")
+async def reply_to_ticket(
+    ticket_id: str,
+    reply: HelpTicketReply,
+    admin: User = Depends(require_admin)
+):
+    now = datetime.now(timezone.utc)
+    reply_doc = {
+        "reply_id": f"reply_{uuid.uuid4().hex[:12]}",
+        "ticket_id": ticket_id,
+        "user_id": admin.user_id,
+        "user_name": admin.name,
+        "user_role": admin.role,
+        "message": reply.message,
+        "created_at": now
+    }
+    
+    # The reply goes in first so the summary never counts one that isn't
+    # there. The versioned summary update doubles as the existence check;
+    # if it fails the reply is taken back out.
+    await db.ticket_replies.insert_one(reply_doc)
+    reply_doc.pop("_id", None)
+    try:
+        ticket = await update_versioned(
+            db.help_tickets,
+            {"ticket_id": ticket_id},
+            {
+                "$inc": {"reply_count": 1},
+                "$set": {
+                    "status": "in_progress",
+                    "updated_at": now,
+                    "last_reply_at": now,
+                    "last_reply_by": admin.name,
+                    "last_reply_role": admin.role
+                }
+            },
+            reply.version,
+            "Ticket not found",
+            TICKET_PROJECTION
+        )
+    except HTTPException:
+        await db.ticket_replies.delete_one({"reply_id": reply_doc["reply_id"]})
+        raise
+    publish_ticket("ticket_reply", ticket, reply_doc)
+    return {**ticket, "reply": reply_doc}
+
+@api_router.get("/tickets/{ticket_id}/replies")
+async def get_ticket_replies(
+    ticket_id: str,
+    response: Response,
+    user: User = Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """One page of a thread, oldest first; for the ticket's owner or an admin."""
+    query = {"ticket_id": ticket_id}
+    if user.role not in ["admin", "superadmin"]:
+        query["user_id"] = user.user_id
+    if not await db.help_tickets.find_one(query, {"_id": 0, "ticket_id": 1}):
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    replies, next_cursor = await fetch_page(
+        db.ticket_replies, {"ticket_id": ticket_id}, TICKET_REPLY_SORT, page_limit(limit, 50), cursor
+    )
+    return page_response(response, replies, next_cursor, True)
+
+@api_router.put("/admin/tickets/{ticket_id}/close")
+async def close_ticket(ticket_id: str, admin: User = Depends(require_admin), version: Optional[int] = None):
+    ticket = await update_versioned(
+        db.help_tickets,
+        {"ticket_id": ticket_id},
+        {"$set": {"status": "closed", "updated_at": datetime.now(timezone.utc)}},
+        version,
+        "Ticket not found",
+        TICKET_PROJECTION
+    )
+    publish_ticket("ticket_closed", ticket)
+    return ticket
+
+# Admin Routes
+@api_router.get("/admin/analytics")
+async def get_analytics(admin: User = Depends(require_admin)):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    collection, pipeline = await stats_source()
+    pipeline.append({"$facet": {
+        "totals": [{"$group": {"_id": None, **_stats_sums()}}],
+        "today": [{"$match": {"day": today}}, {"$group": {"_id": None, "registrations": {"$sum": "$registrations"}}}]
+    }})
+    total_events, facets = await asyncio.gather(
+        db.events.count_documents({}),
+        collection.aggregate(pipeline).to_list(1)
+    )
+    totals = _stats_row(facets[0]["totals"][0] if facets[0]["totals"] else {})
+    today_rows = facets[0]["today"]
     
     return {
         "total_events": total_events,
-        "total_registrations": total_registrations,
-        "today_registrations": today_registrations,
-        "single_registrations": single_count,
-        "team_registrations": team_count
+        "total_registrations": totals["registrations"],
+        "today_registrations": today_rows[0]["registrations"] if today_rows else 0,
+        "single_registrations": totals["single_registrations"],
+        "team_registrations": totals["team_registrations"],
+        "active_registrations": totals["active"],
+        "cancelled_registrations": totals["cancelled"],
+        "participants": totals["participants"]
     }
 
+@api_router.get("/admin/analytics/breakdown")
+async def get_analytics_breakdown(
+    by: str = "event",
+    admin: User = Depends(require_admin),
+    event_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """Registration counters grouped by event, day, college, department or
+    year; optionally for one event and/or an inclusive YYYY-MM-DD range."""
+    if by not in STATS_BREAKDOWNS:
+        raise HTTPException(status_code=400, detail=f"by must be one of: {', '.join(STATS_BREAKDOWNS)}")
+    match: Dict[str, Any] = {}
+    if event_id:
+        match["event_id"] = event_id
+    if start or end:
+        match["day"] = {**({"$gte": start} if start else {}), **({"$lte": end} if end else {})}
+    return await stats_breakdown(by, match)
+
+@api_router.get("/admin/analytics/events/{event_id}")
+async def get_event_analytics(event_id: str, admin: User = Depends(require_admin)):
+    """Totals plus day/college/department/year breakdowns for one event."""
+    collection, pipeline = await stats_source()
+    pipeline.append({"$match": {"event_id": event_id}})
+    pipeline.append({"$facet": {
+        "totals": [{"$group": {"_id": None, **_stats_sums()}}],
+        **{
+            f"by_{by}": [
+                {"$group": {"_id": f"${STATS_BREAKDOWNS[by]}", **_stats_sums()}},
+                {"$sort": {"_id": 1} if by == "day" else {"registrations": -1, "_id": 1}}
+            ]
+            for by in ("day", *STATS_DIMENSIONS)
+        }
+    }})
+    facets = (await collection.aggregate(pipeline).to_list(1))[0]
+    result = {"event_id": event_id, **_stats_row(facets["totals"][0] if facets["totals"] else {})}
+    for by in ("day", *STATS_DIMENSIONS):
+        result[f"by_{by}"] = [{by: row["_id"], **_stats_row(row)} for row in facets[f"by_{by}"]]
+    return result
+
 @api_router.get("/admin/registrations")
 async def get_all_registrations(
+    response: Response,
     admin: User = Depends(require_admin),
+    loaders: Loaders = Depends(get_loaders),
     event_id: Optional[str] = None,
-    user_id: Optional[str] = None
+    user_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
 ):
     query = {}
     if event_id:
@@ -1124,130 +3666,1104 @@ async def get_all_registrations(
     if user_id:
         query["user_id"] = user_id
     
-    registrations = await db.registrations.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    envelope = limit is not None or cursor is not None
+    registrations, next_cursor = await fetch_page(
+        db.registrations, query, [("created_at", -1), ("registration_id", -1)], page_limit(limit, 1000), cursor
+    )
     
     # Batch fetch users and events
-    user_ids = list(set(r["user_id"] for r in registrations))
-    event_ids = list(set(r["event_id"] for r in registrations))
+    user_map, event_map = await asyncio.gather(
+        loaders.users().load_many(r["user_id"] for r in registrations),
+        loaders.events().load_many(r["event_id"] for r in registrations)
+    )
+    for reg in registrations:
+        reg["user"] = user_map[reg["user_id"]]
+        reg["event"] = event_map[reg["event_id"]]
     
-    async def get_users():
-        if user_ids:
-            return await db.users.find({"user_id": {"$in": user_ids}}, {"_id": 0}).to_list(len(user_ids))
-        return []
+    return page_response(response, registrations, next_cursor, envelope)
+
+# ===== REGISTRATION EXPORT =====
+# Exports stream: registrations are read from one cursor in batches of
+# EXPORT_BATCH_SIZE, users/events are joined per batch, and each batch is
+# encoded and sent before the next is fetched. CSV and NDJSON are encoded on
+# the event loop. XLSX uses openpyxl's write-only mode (rows spill to a temp
+# file) on the export thread pool; the worker pulls batches from the loop
+# and pushes the zip bytes back through a bounded queue as save() produces
+# them, so memory stays flat regardless of row count.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+EXPORT_HEADERS = [
+    "Registration ID", "Event Name", "Team Name", "Participant Name",
+    "Email", "Phone", "College", "Date & Time", "Payment Status"
+]
+EXPORT_FIELDS = [
+    "registration_id", "event_name", "team_name", "participant_name",
+    "email", "phone", "college", "created_at", "payment_status"
+]
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+EXPORT_PROJECTION = {
+    "_id": 0, "registration_id": 1, "event_id": 1, "user_id": 1, "team_name": 1,
+    "team_members": 1, "created_at": 1, "payment_status": 1
+}
+
+export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _export_rows(reg: Dict[str, Any], event: Optional[Dict[str, Any]], user: Optional[Dict[str, Any]]) -> List[list]:
+    created_at = reg["created_at"].strftime("%Y-%m-%d %H:%M:%S") if isinstance(reg["created_at"], datetime) else str(reg["created_at"])
+    event_name = event["title"] if event else "N/A"
+    if reg.get("team_members"):
+        # Team registration - one row per member
+        return [[
+            reg["registration_id"], event_name, reg.get("team_name", "N/A"),
+            member.get("name"), member.get("email"), member.get("phone"), member.get("college"),
+            created_at, reg["payment_status"]
+        ] for member in reg["team_members"]]
+    # Single registration
+    return [[
+        reg["registration_id"], event_name, "N/A",
+        user["name"] if user else "N/A", user["email"] if user else "N/A", "N/A", "N/A",
+        created_at, reg["payment_status"]
+    ]]
+
+
+async def iter_export_batches(query: Dict[str, Any], progress=None):
+    """Yield lists of export rows, one list per registration batch.
+    ``progress(registrations, rows)`` is awaited after each batch."""
+    cursor = db.registrations.find(query, EXPORT_PROJECTION).sort(
+        [("created_at", -1), ("registration_id", -1)]
+    ).batch_size(EXPORT_BATCH_SIZE)
+    # Events are few, so one loader memoizes them for the whole export;
+    # users get a fresh loader per batch to keep memory flat
+    events = Loaders().events({"title": 1})
+    while True:
+        registrations = await cursor.to_list(EXPORT_BATCH_SIZE)
+        if not registrations:
+            return
+        user_map, event_map = await asyncio.gather(
+            Loaders().users(("name", "email")).load_many(
+                r["user_id"] for r in registrations if not r.get("team_members")
+            ),
+            events.load_many(r["event_id"] for r in registrations)
+        )
+        
+        rows = []
+        for reg in registrations:
+            rows.extend(_export_rows(reg, event_map.get(reg["event_id"]), user_map.get(reg["user_id"])))
+        if progress:
+            await progress(len(registrations), len(rows))
+        yield rows
+
+
+async def stream_csv(batches):
+    yield "\ufeff".encode("utf-8")  # BOM so Excel detects UTF-8
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_ndjson(batches):
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+class _ChunkSink(RawIOBase):
+    """Write-only, unseekable file handed to openpyxl's save()."""
+
+    def __init__(self, push):
+        self.push = push
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.push(bytes(data))
+        return len(data)
+
+
+def _write_xlsx(pull, sink):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Registrations")
+    ws.append(EXPORT_HEADERS)
+    rows = pull()
+    while rows is not None:
+        for row in rows:
+            ws.append(row)
+        rows = pull()
+    wb.save(sink)
+
+
+async def stream_xlsx(batches, max_chunks: int = 16):
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max_chunks)
+    stop = threading.Event()
+    done = object()
     
-    async def get_events():
-        if event_ids:
-            return await db.events.find({"event_id": {"$in": event_ids}}, {"_id": 0}).to_list(len(event_ids))
-        return []
+    async def next_batch():
+        try:
+            return await batches.__anext__()
+        except StopAsyncIteration:
+            return None
     
-    users, events = await asyncio.gather(get_users(), get_events())
+    def pull():
+        if stop.is_set():
+            raise ExportCancelled()
+        return asyncio.run_coroutine_threadsafe(next_batch(), loop).result()
     
-    user_map = {u["user_id"]: u for u in users} if users else {}
-    event_map = {e["event_id"]: e for e in events} if events else {}
+    def push(chunk):
+        # Blocks the worker while the client is max_chunks behind
+        while not slots.acquire(timeout=0.5):
+            if stop.is_set():
+                raise ExportCancelled()
+        loop.call_soon_threadsafe(chunks.put_nowait, chunk)
     
-    for reg in registrations:
-        reg["user"] = user_map.get(reg["user_id"])
-        reg["event"] = event_map.get(reg["event_id"])
+    def work():
+        try:
+            _write_xlsx(pull, _ChunkSink(push))
+        finally:
+            loop.call_soon_threadsafe(chunks.put_nowait, done)
     
-    return registrations
+    worker = loop.run_in_executor(export_executor, work)
+    try:
+        while True:
+            chunk = await chunks.get()
+            if chunk is done:
+                break
+            slots.release()
+            yield chunk
+        await worker
+    finally:
+        # Client went away (or the export failed): stop the worker
+        stop.set()
+        try:
+            await worker
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            logging.error(f"✗ XLSX export failed: {str(e)}", exc_info=True)
+        await batches.aclose()
+
+
+EXPORT_STREAMERS = {"xlsx": stream_xlsx, "csv": stream_csv, "ndjson": stream_ndjson}
+
 
 @api_router.get("/admin/registrations/export")
 async def export_registrations(
     admin: User = Depends(require_admin),
-    event_id: Optional[str] = None
+    event_id: Optional[str] = None,
+    format: str = "xlsx"
 ):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
     query = {}
     if event_id:
         query["event_id"] = event_id
     
-    registrations = await db.registrations.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    return StreamingResponse(
+        EXPORT_STREAMERS[format](iter_export_batches(query)),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=registrations.{format}"}
+    )
+
+# ===== EXPORT JOBS =====
+# Exports can also run as background jobs: POST enqueues, GET polls progress
+# and GET .../download serves the file. Finished files are kept in
+# EXPORT_DIR and keyed by (event_id, format, data version). The data version
+# is a counter bumped by every write that changes exported registration
+# data, so repeating a request reuses the file until that event's
+# registrations change. At most EXPORT_JOB_CONCURRENCY jobs run at once per
+# worker; the rest wait queued. Jobs run in the worker that accepted them;
+# one whose heartbeat is older than EXPORT_JOB_STALE_SECONDS (e.g. the
+# worker restarted) is ignored and redone on the next request. Event ids
+# are only used in file names and version keys through export_key(), which
+# keeps them to a safe character set.
+EXPORT_DIR = Path(os.environ.get('EXPORT_DIR', str(ROOT_DIR / 'exports')))
+EXPORT_JOB_CONCURRENCY = int(os.environ.get('EXPORT_JOB_CONCURRENCY', '2'))
+EXPORT_JOB_STALE_SECONDS = int(os.environ.get('EXPORT_JOB_STALE_SECONDS', '300'))
+EXPORT_VERSION_KEY = "registrations_version"
+EXPORT_USER_FIELDS = ("name", "email")  # user fields in export rows
+EXPORT_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+EXPORT_ARTIFACT_VERSION = re.compile(r"_v(\d+)\.[a-z]+$")
+
+_export_job_slots: Optional[asyncio.Semaphore] = None
+_export_job_tasks: set = set()
+
+
+def export_key(event_id: Optional[str]) -> str:
+    """The name an export of ``event_id`` goes by in file names and in the
+    version document. Ids outside [A-Za-z0-9_-] get their other characters
+    replaced and a hash of the original appended, so distinct ids never
+    share a key."""
+    if not event_id:
+        return "all"
+    safe = EXPORT_UNSAFE_CHARS.sub("_", event_id)
+    if safe != event_id:
+        safe = f"{safe}_{hashlib.sha256(event_id.encode()).hexdigest()[:12]}"
+    return safe
+
+
+async def registrations_changed(*event_ids: str):
+    """Bump the export data version of these events (and of "all events")."""
+    await db.system_config.update_one(
+        {"config_key": EXPORT_VERSION_KEY},
+        {"$inc": {"all": 1, **{f"events.{export_key(event_id)}": 1 for event_id in set(event_ids)}}},
+        upsert=True
+    )
+
+
+async def user_export_changed(user_id: str, fields):
+    """Bump the export data version of every event ``user_id`` registered
+    for, if ``fields`` include what exports show of a user."""
+    if not {field.split(".")[0] for field in fields} & set(EXPORT_USER_FIELDS):
+        return
+    event_ids = await db.registrations.distinct("event_id", {"user_id": user_id})
+    if event_ids:
+        await registrations_changed(*event_ids)
+
+
+async def export_data_version(event_id: Optional[str]) -> int:
+    key = export_key(event_id)
+    field = f"events.{key}" if event_id else "all"
+    doc = await db.system_config.find_one({"config_key": EXPORT_VERSION_KEY}, {"_id": 0, field: 1})
+    if not doc:
+        return 0
+    return (doc.get("events") or {}).get(key, 0) if event_id else doc.get("all", 0)
+
+
+def export_artifact_path(event_id: Optional[str], format: str, version: int) -> Path:
+    root = EXPORT_DIR.resolve()
+    path = (root / f"registrations_{export_key(event_id)}_v{int(version)}.{format}").resolve()
+    if path.parent != root:
+        raise HTTPException(status_code=400, detail="Invalid export target")
+    return path
+
+
+async def run_export_job(job: Dict[str, Any]):
+    global _export_job_slots
+    if _export_job_slots is None:
+        _export_job_slots = asyncio.Semaphore(EXPORT_JOB_CONCURRENCY)
+    job_id = job["job_id"]
+    path = export_artifact_path(job["event_id"], job["format"], job["data_version"])
+    partial = path.with_name(f"{path.name}.{job_id}.part")
+    counts = {"processed": 0, "rows": 0}
     
-    # Batch fetch users and events
-    user_ids = list(set(r["user_id"] for r in registrations))
-    event_ids = list(set(r["event_id"] for r in registrations))
+    async def progress(registrations: int, rows: int):
+        counts["processed"] += registrations
+        counts["rows"] += rows
+        await db.export_jobs.update_one(
+            {"job_id": job_id},
+            {"$set": {**counts, "updated_at": datetime.now(timezone.utc)}}
+        )
     
-    async def get_users():
-        if user_ids:
-            return await db.users.find({"user_id": {"$in": user_ids}}, {"_id": 0}).to_list(len(user_ids))
-        return []
+    async with _export_job_slots:
+        try:
+            query = {"event_id": job["event_id"]} if job["event_id"] else {}
+            await db.export_jobs.update_one({"job_id": job_id}, {"$set": {
+                "status": "running",
+                "total": await db.registrations.count_documents(query),
+                "started_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
+            }})
+            EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+            loop = asyncio.get_running_loop()
+            with open(partial, "wb") as f:
+                async for chunk in EXPORT_STREAMERS[job["format"]](iter_export_batches(query, progress)):
+                    await loop.run_in_executor(None, f.write, chunk)
+            os.replace(partial, path)
+            await db.export_jobs.update_one({"job_id": job_id}, {"$set": {
+                "status": "done",
+                "artifact": path.name,
+                "finished_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
+            }})
+            # Older versions of the same export are superseded; a newer one
+            # (a later job that finished first) is left alone
+            for old in path.parent.glob(f"registrations_{export_key(job['event_id'])}_v*.{job['format']}"):
+                match = EXPORT_ARTIFACT_VERSION.search(old.name)
+                if match and int(match.group(1)) < job["data_version"]:
+                    old.unlink(missing_ok=True)
+            logging.info(f"✓ Export job {job_id} finished: {counts['rows']} rows")
+        except asyncio.CancelledError:
+            await db.export_jobs.update_one({"job_id": job_id}, {"$set": {"status": "failed", "error": "Interrupted"}})
+            raise
+        except Exception as e:
+            logging.error(f"✗ Export job {job_id} failed: {str(e)}", exc_info=True)
+            await db.export_jobs.update_one({"job_id": job_id}, {"$set": {
+                "status": "failed",
+                "error": str(e),
+                "updated_at": datetime.now(timezone.utc)
+            }})
+        finally:
+            partial.unlink(missing_ok=True)
+
+
+def _export_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    total = job.get("total")
+    job["progress"] = round(job.get("processed", 0) / total, 4) if total else (1.0 if job["status"] == "done" else 0.0)
+    return job
+
+
+@api_router.post("/admin/exports")
+async def create_export_job(data: ExportJobCreate, response: Response, admin: User = Depends(require_admin)):
+    if data.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if data.event_id and not await db.events.find_one({"event_id": data.event_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Event not found")
+    version = await export_data_version(data.event_id)
+    artifact = export_artifact_path(data.event_id, data.format, version)
+    key = {"event_id": data.event_id, "format": data.format, "data_version": version}
+    
+    # Reuse a finished artifact, or join a job that is still making progress
+    fresh = datetime.now(timezone.utc) - timedelta(seconds=EXPORT_JOB_STALE_SECONDS)
+    existing = await db.export_jobs.find_one(
+        {**key, "$or": [
+            {"status": "done"},
+            {"status": {"$in": ["queued", "running"]}, "updated_at": {"$gte": fresh}}
+        ]},
+        {"_id": 0},
+        sort=[("created_at", -1)]
+    )
+    if existing and (existing["status"] != "done" or artifact.exists()):
+        return _export_job_view(existing)
     
-    async def get_events():
+    now = datetime.now(timezone.utc)
+    job = {
+        "job_id": f"export_{uuid.uuid4().hex[:12]}",
+        **key,
+        "status": "queued",
+        "processed": 0,
+        "rows": 0,
+        "total": None,
+        "artifact": None,
+        "error": None,
+        "created_by": admin.user_id,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.export_jobs.insert_one(job)
+    job.pop("_id", None)
+    task = asyncio.create_task(run_export_job(job))
+    _export_job_tasks.add(task)
+    task.add_done_callback(_export_job_tasks.discard)
+    response.status_code = 202
+    return _export_job_view(job)
+
+@api_router.get("/admin/exports/{job_id}")
+async def get_export_job(job_id: str, admin: User = Depends(require_admin)):
+    job = await db.export_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return _export_job_view(job)
+
+@api_router.get("/admin/exports/{job_id}/download")
+async def download_export(job_id: str, admin: User = Depends(require_admin)):
+    job = await db.export_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
+    path = EXPORT_DIR / job["artifact"]
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Export file is no longer available; request a new export")
+    return FileResponse(path, media_type=EXPORT_FORMATS[job["format"]], filename=f"registrations.{job['format']}")
+
+# ===== CASCADE DELETION =====
+# Deleting a user or an event removes the document itself inline and hands
+# its dependents to a background job; the request returns 202 with the job
+# to poll. A job walks a fixed list of steps (sessions, waitlist,
+# registrations, tickets, settle), deleting DELETION_BATCH_SIZE documents at
+# a time with a short pause between batches so a large event doesn't
+# monopolize the primary. The current step and per-step counts live on the
+# job document. Every step is "delete whatever still matches", so re-running
+# one is harmless: a job interrupted by a shutdown, a crash or an error is
+# picked up again by deletion_job_resumer() in any worker (once its
+# heartbeat is older than DELETION_JOB_STALE_SECONDS), up to
+# DELETION_JOB_MAX_ATTEMPTS times. Seats are not handed back per
+# registration; the settle step recounts each affected event from the
+# registrations that are left and promotes its waitlist, which is exact
+# however often it runs.
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', '500'))
+DELETION_BATCH_PAUSE_SECONDS = float(os.environ.get('DELETION_BATCH_PAUSE_SECONDS', '0.05'))
+DELETION_JOB_CONCURRENCY = int(os.environ.get('DELETION_JOB_CONCURRENCY', '1'))
+DELETION_JOB_STALE_SECONDS = int(os.environ.get('DELETION_JOB_STALE_SECONDS', '120'))
+DELETION_JOB_MAX_ATTEMPTS = int(os.environ.get('DELETION_JOB_MAX_ATTEMPTS', '5'))
+DELETION_RESUME_INTERVAL_SECONDS = int(os.environ.get('DELETION_RESUME_INTERVAL_SECONDS', '60'))
+DELETION_STEPS = {
+    "user": ["sessions", "waitlist", "registrations", "tickets", "settle"],
+    "event": ["waitlist", "registrations", "settle"]
+}
+
+_deletion_job_slots: Optional[asyncio.Semaphore] = None
+_deletion_job_tasks: Dict[str, asyncio.Task] = {}  # job_id -> task in this worker
+
+
+def deletion_step_target(job: Dict[str, Any], step: str) -> tuple:
+    """(collection, query) holding the dependents a step deletes."""
+    field = f"{job['kind']}_id"
+    collection = {
+        "sessions": db.user_sessions,
+        "waitlist": db.waitlist,
+        "registrations": db.registrations,
+        "tickets": db.help_tickets
+    }[step]
+    return collection, {field: job["target_id"]}
+
+
+async def _deletion_heartbeat(job_id: str, update: Optional[Dict[str, Any]] = None):
+    update = update or {}
+    await db.deletion_jobs.update_one(
+        {"job_id": job_id},
+        {**update, "$set": {**update.get("$set", {}), "updated_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def delete_in_batches(
+    job_id: str, step: str, collection, query: Dict[str, Any], before=None, delete=None
+) -> int:
+    """Delete everything matching ``query`` DELETION_BATCH_SIZE documents at
+    a time. ``before(batch_query)`` runs ahead of each batch's delete;
+    ``delete(batch_query)`` replaces the plain delete_many and returns the
+    number deleted."""
+    deleted = 0
+    while True:
+        batch = await collection.find(query, {"_id": 1}).limit(DELETION_BATCH_SIZE).to_list(DELETION_BATCH_SIZE)
+        if not batch:
+            return deleted
+        batch_query = {"_id": {"$in": [doc["_id"] for doc in batch]}}
+        if before:
+            await before(batch_query)
+        if delete:
+            count = await delete(batch_query)
+        else:
+            count = (await collection.delete_many(batch_query)).deleted_count
+        deleted += count
+        await _deletion_heartbeat(job_id, {"$inc": {f"deleted.{step}": count}})
+        await asyncio.sleep(DELETION_BATCH_PAUSE_SECONDS)
+
+
+async def run_deletion_step(job: Dict[str, Any], step: str):
+    job_id = job["job_id"]
+    if step == "settle":
+        # Re-read: the registrations step recorded the events it touched
+        job = await db.deletion_jobs.find_one({"job_id": job_id}, {"_id": 0, "kind": 1, "events": 1})
+        event_ids = job.get("events") or []
+        if job["kind"] == "user":
+            for event_id in event_ids:
+                await recount_event_seats(event_id)
+                await promote_waitlist(event_id)
+                await _deletion_heartbeat(job_id)
         if event_ids:
-            return await db.events.find({"event_id": {"$in": event_ids}}, {"_id": 0}).to_list(len(event_ids))
-        return []
+            await registrations_changed(*event_ids)
+        return
+
+    collection, query = deletion_step_target(job, step)
+    before = delete = None
+    if step == "registrations":
+        async def before(batch_query):
+            # Remember the affected events before their registrations go
+            event_ids = await db.registrations.distinct("event_id", batch_query)
+            await _deletion_heartbeat(job_id, {"$addToSet": {"events": {"$each": event_ids}}})
+        delete = delete_registrations
+    elif step == "tickets":
+        async def before(batch_query):
+            ticket_ids = await db.help_tickets.distinct("ticket_id", batch_query)
+            await delete_in_batches(job_id, "ticket_replies", db.ticket_replies, {"ticket_id": {"$in": ticket_ids}})
+    await delete_in_batches(job_id, step, collection, query, before, delete)
+
+
+async def run_deletion_job(job_id: str):
+    global _deletion_job_slots
+    if _deletion_job_slots is None:
+        _deletion_job_slots = asyncio.Semaphore(DELETION_JOB_CONCURRENCY)
+
+    async with _deletion_job_slots:
+        # Claim the job; another worker may have resumed it meanwhile
+        job = await db.deletion_jobs.find_one_and_update(
+            {"job_id": job_id, "status": {"$in": ["queued", "interrupted"]}},
+            {"$set": {"status": "running", "updated_at": datetime.now(timezone.utc)}, "$inc": {"attempts": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            return
+        try:
+            steps = DELETION_STEPS[job["kind"]]
+            for step in steps[steps.index(job["step"]):]:
+                await _deletion_heartbeat(job_id, {"$set": {"step": step}})
+                await run_deletion_step(job, step)
+            await _deletion_heartbeat(job_id, {"$set": {
+                "status": "done", "step": None, "finished_at": datetime.now(timezone.utc)
+            }})
+            logging.info(f"✓ Deletion job {job_id} finished ({job['kind']} {job['target_id']})")
+        except asyncio.CancelledError:
+            await db.deletion_jobs.update_one({"job_id": job_id}, {"$set": {"status": "interrupted"}})
+            raise
+        except Exception as e:
+            logging.error(f"✗ Deletion job {job_id} failed: {str(e)}", exc_info=True)
+            retry = job["attempts"] < DELETION_JOB_MAX_ATTEMPTS
+            await _deletion_heartbeat(job_id, {"$set": {"status": "interrupted" if retry else "failed", "error": str(e)}})
+
+
+def start_deletion_job(job_id: str):
+    if job_id in _deletion_job_tasks:
+        return
+    task = asyncio.create_task(run_deletion_job(job_id))
+    _deletion_job_tasks[job_id] = task
+    task.add_done_callback(lambda _: _deletion_job_tasks.pop(job_id, None))
+
+
+async def create_deletion_job(kind: str, target_id: str, created_by: str) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    job = {
+        "job_id": f"delete_{uuid.uuid4().hex[:12]}",
+        "kind": kind,
+        "target_id": target_id,
+        "status": "queued",
+        "step": DELETION_STEPS[kind][0],
+        "deleted": {},
+        "events": [target_id] if kind == "event" else [],
+        "attempts": 0,
+        "error": None,
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.deletion_jobs.insert_one(job)
+    job.pop("_id", None)
+    start_deletion_job(job["job_id"])
+    return job
+
+
+async def deletion_job_resumer():
+    """Requeue deletion jobs whose worker stopped heartbeating and run every
+    interrupted job that has attempts left."""
+    while True:
+        try:
+            stale = datetime.now(timezone.utc) - timedelta(seconds=DELETION_JOB_STALE_SECONDS)
+            await db.deletion_jobs.update_many(
+                {"status": {"$in": ["queued", "running"]}, "updated_at": {"$lt": stale}},
+                {"$set": {"status": "interrupted"}}
+            )
+            async for job in db.deletion_jobs.find(
+                {"status": "interrupted", "attempts": {"$lt": DELETION_JOB_MAX_ATTEMPTS}}, {"_id": 0, "job_id": 1}
+            ):
+                start_deletion_job(job["job_id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"✗ Deletion job resume failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(DELETION_RESUME_INTERVAL_SECONDS)
+
+
+@api_router.get("/admin/deletion-jobs/{job_id}")
+async def get_deletion_job(job_id: str, admin: User = Depends(require_admin)):
+    job = await db.deletion_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job
+
+# Super Admin Routes
+@api_router.get("/superadmin/stats/session-cache")
+async def get_session_cache_stats(superadmin: User = Depends(require_superadmin)):
+    """Hit/miss counters for the in-process session cache (per worker)."""
+    return session_cache.stats()
+
+@api_router.post("/admin/events/{event_id}/recount-seats")
+async def recount_seats(event_id: str, admin: User = Depends(require_admin)):
+    """Resync an event's seat counters from its registrations."""
+    if not await db.events.find_one({"event_id": event_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Event not found")
+    return await recount_event_seats(event_id)
+
+@api_router.get("/admin/events/{event_id}/waitlist")
+async def get_event_waitlist(
+    event_id: str,
+    response: Response,
+    admin: User = Depends(require_admin),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    entries, next_cursor = await fetch_page(
+        db.waitlist, {"event_id": event_id}, [("seq", 1)], page_limit(limit, 100), cursor
+    )
+    return page_response(response, entries, next_cursor, limit is not None or cursor is not None)
+
+@api_router.get("/superadmin/stats/registration-queue")
+async def get_registration_queue_stats(superadmin: User = Depends(require_superadmin)):
+    return registration_writer.stats()
+
+@api_router.get("/superadmin/stats/live")
+async def get_live_stats(superadmin: User = Depends(require_superadmin)):
+    return live_hub.stats()
+
+@api_router.post("/superadmin/analytics/rebuild")
+async def rebuild_analytics(superadmin: User = Depends(require_superadmin)):
+    """Recompute the registration_stats rollup from registrations."""
+    return await rebuild_registration_stats()
+
+@api_router.get("/superadmin/stats/catalog-cache")
+async def get_catalog_cache_stats(superadmin: User = Depends(require_superadmin)):
+    return {**catalog_cache.stats(), "event_loader": event_cache.stats()}
+
+@api_router.get("/superadmin/stats/sessions")
+async def get_session_stats(limit: int = 50, superadmin: User = Depends(require_superadmin)):
+    """Live session counts, overall and per user (highest first). Sessions
+    only have documents in db token mode; signed-mode sessions aren't counted."""
+    now = datetime.now(timezone.utc)
+    total, live, live_users = await asyncio.gather(
+        db.user_sessions.count_documents({}),
+        db.user_sessions.count_documents({"expires_at": {"$gt": now}}),
+        db.user_sessions.distinct("user_id", {"expires_at": {"$gt": now}})
+    )
+    per_user = await db.user_sessions.aggregate([
+        {"$match": {"expires_at": {"$gt": now}}},
+        {"$group": {"_id": "$user_id", "live_sessions": {"$sum": 1}, "latest_expiry": {"$max": "$expires_at"}}},
+        {"$sort": {"live_sessions": -1}},
+        {"$limit": max(1, min(limit, 500))},
+        {"$project": {"_id": 0, "user_id": "$_id", "live_sessions": 1, "latest_expiry": 1}}
+    ]).to_list(None)
+    return {
+        "token_mode": SESSION_TOKEN_MODE,
+        "total_sessions": total,
+        "live_sessions": live,
+        "expired_pending_removal": total - live,
+        "users_with_live_sessions": len(live_users),
+        "per_user": per_user
+    }
+
+@api_router.get("/superadmin/indexes")
+async def get_index_report(superadmin: User = Depends(require_superadmin)):
+    """Dry-run diff of the index registry against Mongo, plus uncovered routes."""
+    return await sync_indexes(dry_run=True)
+
+@api_router.post("/superadmin/indexes/sync")
+async def apply_indexes(dry_run: bool = False, superadmin: User = Depends(require_superadmin)):
+    return await sync_indexes(dry_run=dry_run)
+
+# ===== USER DIRECTORY =====
+# Server-side search for the superadmin user list. Each user stores
+# `search_keys`: the lowercased full name, each word of it, the email and
+# the PRN. A search is an anchored prefix regex on that multikey index, so
+# "kum" finds "Rahul Kumar" without scanning the collection. The keys are
+# refreshed by sync_search_keys() wherever a user is written and backfilled
+# for older users at startup. Directory responses never include
+# password_hash or the search keys.
+USER_DIRECTORY_PROJECTION = {"_id": 0, "password_hash": 0, "search_keys": 0}
+USER_DIRECTORY_SORT = [("created_at", -1), ("user_id", -1)]
+USER_SEARCH_MAX_LENGTH = 64
+USER_SEARCH_FIELDS = ("name", "email", "prn")  # what user_search_keys() reads
+
+
+def user_search_keys(user: Dict[str, Any]) -> List[str]:
+    name = " ".join((user.get("name") or "").lower().split())
+    keys = {name, *name.split()} if name else set()
+    if user.get("email"):
+        keys.add(user["email"].lower())
+    if user.get("prn"):
+        keys.add(str(user["prn"]))
+    return sorted(keys)
+
+
+async def sync_search_keys(user: Dict[str, Any]):
+    """Store fresh search keys for ``user`` if its name/email/PRN changed,
+    then drop them from the dict (they are not part of any response)."""
+    keys = user_search_keys(user)
+    if user.pop("search_keys", None) != keys:
+        await db.users.update_one({"user_id": user["user_id"]}, {"$set": {"search_keys": keys}})
+
+
+async def backfill_search_keys(batch_size: int = 500) -> int:
+    """Give users created before the directory their search keys."""
+    updated = 0
+    try:
+        while True:
+            batch = await db.users.find(
+                {"search_keys": {"$exists": False}}, {"_id": 1, "name": 1, "email": 1, "prn": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            await db.users.bulk_write([
+                UpdateOne({"_id": u["_id"]}, {"$set": {"search_keys": user_search_keys(u)}}) for u in batch
+            ], ordered=False)
+            updated += len(batch)
+        if updated:
+            logging.info(f"✓ Indexed {updated} users for directory search")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"✗ User search key backfill failed: {str(e)}", exc_info=True)
+    return updated
+
+
+def user_directory_query(
+    q: Optional[str],
+    role: Optional[str],
+    college: Optional[str],
+    department: Optional[str],
+    year: Optional[str],
+    is_blocked: Optional[bool],
+    profile_complete: Optional[bool]
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if q is not None and q.strip():
+        term = " ".join(q.lower().split())
+        if len(term) > USER_SEARCH_MAX_LENGTH:
+            raise HTTPException(status_code=400, detail=f"q must be at most {USER_SEARCH_MAX_LENGTH} characters")
+        query["search_keys"] = {"$regex": f"^{re.escape(term)}"}
+    if role:
+        roles = [r.strip() for r in role.split(",") if r.strip()]
+        query["role"] = roles[0] if len(roles) == 1 else {"$in": roles}
+    for field, value in (("college", college), ("department", department), ("year", year)):
+        if value:
+            query[field] = value
+    # Older documents may lack the flags; treat missing as False
+    if is_blocked is not None:
+        query["is_blocked"] = True if is_blocked else {"$ne": True}
+    if profile_complete is not None:
+        query["profile_complete"] = True if profile_complete else {"$ne": True}
+    return query
+
+
+@api_router.get("/superadmin/users")
+async def get_all_users(
+    response: Response,
+    superadmin: User = Depends(require_superadmin),
+    q: Optional[str] = None,
+    role: Optional[str] = None,
+    college: Optional[str] = None,
+    department: Optional[str] = None,
+    year: Optional[str] = None,
+    is_blocked: Optional[bool] = None,
+    profile_complete: Optional[bool] = None,
+    include_total: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """User directory: prefix search on name/email/PRN plus filters, newest
+    first, keyset paginated. ``include_total`` adds the match count to the
+    first page."""
+    query = user_directory_query(q, role, college, department, year, is_blocked, profile_complete)
+    envelope = limit is not None or cursor is not None or include_total
+    page = fetch_page(
+        db.users, query, USER_DIRECTORY_SORT, page_limit(limit, 1000), cursor, USER_DIRECTORY_PROJECTION
+    )
+    if not (include_total and cursor is None):
+        users, next_cursor = await page
+        return page_response(response, users, next_cursor, envelope)
+    # The unfiltered total comes from collection metadata
+    count = db.users.estimated_document_count() if not query else db.users.count_documents(query)
+    (users, next_cursor), total = await asyncio.gather(page, count)
+    response.headers["X-Total-Count"] = str(total)
+    return {**page_response(response, users, next_cursor, True), "total": total}
+
+# ===== USER IMPORT =====
+# Pre-provisions a batch of students/admins from a CSV or XLSX file. The
+# request body (the file itself, not multipart) is streamed to IMPORT_DIR,
+# then a background job reads it IMPORT_BATCH_SIZE rows at a time in a
+# worker thread, so memory stays flat however long the file is. Each row is
+# checked against the UserProfileUpdate rules and the configured colleges,
+# departments, divisions and years. Each batch is one unordered bulk_write
+# of upserts keyed by the lowercased email, after normalize_user_emails()
+# has lowercased any stored ones. New users get the row's role (user or admin);
+# existing users keep theirs and only have the provided profile fields
+# updated. Rejected rows go to a CSV error report served by
+# GET .../errors.
+IMPORT_DIR = Path(os.environ.get('IMPORT_DIR', str(ROOT_DIR / 'imports')))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', str(50 * 1024 * 1024)))
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', '1'))
+IMPORT_FORMATS = ("csv", "xlsx")
+IMPORT_PROFILE_FIELDS = ("name", "phone", "college", "department", "division", "year", "prn")
+IMPORT_CONFIGURED_FIELDS = {"college": "colleges", "department": "departments", "division": "divisions", "year": "years"}
+IMPORT_ROLES = ("user", "admin")
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+_import_job_tasks: set = set()
+
+# Row reading has its own threads so an import never waits behind (or
+# holds up) XLSX export streaming on export_executor
+import_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+
+
+def _import_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet numbers, e.g. PRN and phone
+    return str(value).strip()
+
+
+def iter_import_rows(path: Path, format: str):
+    """Yield (row number, {column: value}) from an uploaded file. Runs in a
+    worker thread; column names are lowercased with spaces as underscores."""
+    def header(cells):
+        return [_import_cell(c).lower().replace(" ", "_") for c in cells]
     
-    users, events = await asyncio.gather(get_users(), get_events())
+    if format == "csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            columns = header(next(reader, []))
+            for number, cells in enumerate(reader, start=2):
+                if any(c.strip() for c in cells):
+                    yield number, dict(zip(columns, (_import_cell(c) for c in cells)))
+        return
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        columns = header(next(rows, ()))
+        for number, cells in enumerate(rows, start=2):
+            values = [_import_cell(c) for c in cells]
+            if any(values):
+                yield number, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def validate_import_row(row: Dict[str, str], config: Dict[str, Any]) -> tuple:
+    """Return (email, profile fields, role) or raise ValueError with the reason."""
+    email = row.get("email", "").lower()
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError("Invalid or missing email")
+    if not row.get("name"):
+        raise ValueError("Missing name")
+    role = (row.get("role") or "user").lower()
+    if role not in IMPORT_ROLES:
+        raise ValueError(f"role must be one of: {', '.join(IMPORT_ROLES)}")
+    try:
+        profile = UserProfileUpdate(**{k: row[k] for k in IMPORT_PROFILE_FIELDS if row.get(k)})
+    except ValidationError as e:
+        raise ValueError("; ".join(str(err.get("ctx", {}).get("error") or err["msg"]) for err in e.errors()))
+    fields = profile.model_dump(exclude_none=True)
+    for field, option_key in IMPORT_CONFIGURED_FIELDS.items():
+        allowed = config.get(option_key) or []
+        if field in fields and allowed and fields[field] not in allowed:
+            raise ValueError(f"Unknown {field}: {fields[field]}")
+    return email, fields, role
+
+
+async def import_user_batch(batch: List[tuple], config: Dict[str, Any], report) -> Dict[str, int]:
+    """Validate and upsert one batch of (row number, row). Returns counts."""
+    counts = {"created": 0, "updated": 0, "failed": 0}
+    ops, rows = [], []
+    now = datetime.now(timezone.utc)
+    for number, row in batch:
+        try:
+            email, fields, role = validate_import_row(row, config)
+        except ValueError as e:
+            report.writerow([number, row.get("email", ""), str(e)])
+            counts["failed"] += 1
+            continue
+        update: Dict[str, Any] = {
+            "$set": {**fields, "updated_at": now},
+            "$setOnInsert": {
+                "user_id": f"user_{uuid.uuid4().hex[:12]}",
+                "email": email,
+                "role": role,
+                "picture": None,
+                "is_blocked": False,
+                "created_at": now
+            },
+            "$inc": {"version": 1}
+        }
+        if all(fields.get(k) for k in IMPORT_PROFILE_FIELDS):
+            update["$set"]["profile_complete"] = True
+        ops.append(UpdateOne({"email": email}, update, upsert=True))
+        rows.append((number, email))
+    if not ops:
+        return counts
     
-    user_map = {u["user_id"]: u for u in users} if users else {}
-    event_map = {e["event_id"]: e for e in events} if events else {}
+    # Names as they were, to tell which existing users the batch renamed
+    emails = [email for _, email in rows]
+    previous_names = {
+        user["email"]: user.get("name")
+        async for user in db.users.find({"email": {"$in": emails}}, {"_id": 0, "email": 1, "name": 1})
+    }
     
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Registrations"
+    failed: Dict[int, str] = {}
+    try:
+        result = await db.users.bulk_write(ops, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+    for index, (number, email) in enumerate(rows):
+        if index in failed:
+            report.writerow([number, email, failed[index]])
+            counts["failed"] += 1
+        elif index in upserted:
+            counts["created"] += 1
+        else:
+            counts["updated"] += 1
     
-    # ===== EXCEL EXPORT WITH LOOKUPS =====
-    # Uses user_map and event_map for efficient data retrieval
-    # Headers
-    headers = [
-        "Registration ID", "Event Name", "Team Name", "Participant Name",
-        "Email", "Phone", "College", "Date & Time", "Payment Status"
-    ]
-    ws.append(headers)
+    # Refresh search keys, cached sessions and export versions of the
+    # written users
+    written = [email for index, (_, email) in enumerate(rows) if index not in failed]
+    users = await db.users.find(
+        {"email": {"$in": written}}, {"_id": 0, "user_id": 1, "name": 1, "email": 1, "prn": 1, "search_keys": 1}
+    ).to_list(len(written))
+    key_ops = []
+    for user in users:
+        keys = user_search_keys(user)
+        if user.get("search_keys") != keys:
+            key_ops.append(UpdateOne({"user_id": user["user_id"]}, {"$set": {"search_keys": keys}}))
+        session_cache.invalidate_user(user["user_id"])
+        if user["email"] in previous_names and previous_names[user["email"]] != user.get("name"):
+            await user_export_changed(user["user_id"], ["name"])
+    if key_ops:
+        await db.users.bulk_write(key_ops, ordered=False)
+    return counts
+
+
+def import_report_path(job_id: str) -> Path:
+    return IMPORT_DIR / f"{job_id}_errors.csv"
+
+
+async def run_import_job(job: Dict[str, Any], upload: Path):
+    job_id = job["job_id"]
+    counts = {"processed": 0, "created": 0, "updated": 0, "failed": 0}
+    report_path = import_report_path(job_id)
+    loop = asyncio.get_running_loop()
+    try:
+        await db.import_jobs.update_one({"job_id": job_id}, {"$set": {
+            "status": "running", "started_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc)
+        }})
+        config = await get_system_config()
+        await normalize_user_emails()
+        rows = iter_import_rows(upload, job["format"])
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            report = csv.writer(f)
+            report.writerow(["row", "email", "error"])
+            while True:
+                batch = await loop.run_in_executor(import_executor, lambda: list(islice(rows, IMPORT_BATCH_SIZE)))
+                if not batch:
+                    break
+                for key, value in (await import_user_batch(batch, config, report)).items():
+                    counts[key] += value
+                counts["processed"] += len(batch)
+                await db.import_jobs.update_one(
+                    {"job_id": job_id}, {"$set": {**counts, "updated_at": datetime.now(timezone.utc)}}
+                )
+        if not counts["failed"]:
+            report_path.unlink(missing_ok=True)
+        await db.import_jobs.update_one({"job_id": job_id}, {"$set": {
+            "status": "done",
+            "error_report": report_path.name if counts["failed"] else None,
+            "finished_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
+        }})
+        logging.info(f"✓ Import job {job_id} finished: {counts}")
+    except asyncio.CancelledError:
+        await db.import_jobs.update_one({"job_id": job_id}, {"$set": {"status": "failed", "error": "Interrupted"}})
+        raise
+    except Exception as e:
+        logging.error(f"✗ Import job {job_id} failed: {str(e)}", exc_info=True)
+        await db.import_jobs.update_one({"job_id": job_id}, {"$set": {
+            "status": "failed",
+            "error": str(e),
+            "updated_at": datetime.now(timezone.utc)
+        }})
+    finally:
+        upload.unlink(missing_ok=True)
+
+
+@api_router.post("/superadmin/users/import")
+async def import_users(
+    request: Request,
+    response: Response,
+    superadmin: User = Depends(require_superadmin),
+    format: Optional[str] = None
+):
+    """Upload a CSV or XLSX file as the request body (columns: email, name,
+    prn, phone, college, department, division, year, role). Returns the job
+    to poll."""
+    content_type = request.headers.get("content-type", "")
+    format = format or ("xlsx" if "spreadsheetml" in content_type else "csv")
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(IMPORT_FORMATS)}")
     
-    # Data
-    for reg in registrations:
-        event = event_map.get(reg["event_id"])
-        user = user_map.get(reg["user_id"])
-        
-        if reg.get("team_members"):
-            # Team registration - one row per member
-            for member in reg["team_members"]:
-                ws.append([
-                    reg["registration_id"],
-                    event["title"] if event else "N/A",
-                    reg.get("team_name", "N/A"),
-                    member["name"],
-                    member["email"],
-                    member["phone"],
-                    member["college"],
-                    reg["created_at"].strftime("%Y-%m-%d %H:%M:%S") if isinstance(reg["created_at"], datetime) else str(reg["created_at"]),
-                    reg["payment_status"]
-                ])
-        else:
-            # Single registration
-            ws.append([
-                reg["registration_id"],
-                event["title"] if event else "N/A",
-                "N/A",
-                user["name"] if user else "N/A",
-                user["email"] if user else "N/A",
-                "N/A",
-                "N/A",
-                reg["created_at"].strftime("%Y-%m-%d %H:%M:%S") if isinstance(reg["created_at"], datetime) else str(reg["created_at"]),
-                reg["payment_status"]
-            ])
-    
-    # Save to BytesIO
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    job_id = f"import_{uuid.uuid4().hex[:12]}"
+    IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    upload = IMPORT_DIR / f"{job_id}.{format}"
+    size = 0
+    loop = asyncio.get_running_loop()
+    try:
+        with open(upload, "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > IMPORT_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File larger than {IMPORT_MAX_BYTES} bytes")
+                await loop.run_in_executor(None, f.write, chunk)
+    except BaseException:
+        upload.unlink(missing_ok=True)
+        raise
+    if not size:
+        upload.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Empty upload")
     
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=registrations.xlsx"}
-    )
+    now = datetime.now(timezone.utc)
+    job = {
+        "job_id": job_id,
+        "format": format,
+        "status": "queued",
+        "bytes": size,
+        "processed": 0,
+        "created": 0,
+        "updated": 0,
+        "failed": 0,
+        "error_report": None,
+        "error": None,
+        "created_by": superadmin.user_id,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.import_jobs.insert_one(job)
+    job.pop("_id", None)
+    task = asyncio.create_task(run_import_job(job, upload))
+    _import_job_tasks.add(task)
+    task.add_done_callback(_import_job_tasks.discard)
+    response.status_code = 202
+    return job
 
-# Super Admin Routes
-@api_router.get("/superadmin/users")
-async def get_all_users(superadmin: User = Depends(require_superadmin)):
-    users = await db.users.find({}, {"_id": 0}).to_list(1000)
-    return users
+@api_router.get("/superadmin/users/import/{job_id}")
+async def get_import_job(job_id: str, superadmin: User = Depends(require_superadmin)):
+    job = await db.import_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@api_router.get("/superadmin/users/import/{job_id}/errors")
+async def download_import_errors(job_id: str, superadmin: User = Depends(require_superadmin)):
+    job = await db.import_jobs.find_one({"job_id": job_id}, {"_id": 0, "status": 1, "error_report": 1})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if not job.get("error_report"):
+        raise HTTPException(status_code=409 if job["status"] != "done" else 404, detail="No error report for this import")
+    path = IMPORT_DIR / job["error_report"]
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Error report no longer available")
+    return FileResponse(path, media_type="text/csv", filename=f"{job_id}_errors.csv")
 
 @api_router.get("/superadmin/users/{user_id}")
 async def get_user_by_id(user_id: str, admin: User = Depends(require_admin)):
-    user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+    user = await db.users.find_one({"user_id": user_id}, USER_DIRECTORY_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -1262,6 +4778,7 @@ async def block_user(user_id: str, superadmin: User = Depends(require_superadmin
         raise HTTPException(status_code=404, detail="User not found")
     # Delete all active sessions
     await db.user_sessions.delete_many({"user_id": user_id})
+    await revoke_user_sessions(user_id)
     return {"message": "User blocked successfully"}
 
 @api_router.put("/superadmin/users/{user_id}/unblock")
@@ -1276,28 +4793,17 @@ async def unblock_user(user_id: str, superadmin: User = Depends(require_superadm
 
 @api_router.post("/superadmin/admins")
 async def add_admin(admin_data: AdminCreate, superadmin: User = Depends(require_superadmin)):
-    # Check if user exists
-    existing_user = await db.users.find_one({"email": admin_data.email}, {"_id": 0})
-    
-    if existing_user:
-        # Update role to admin
-        await db.users.update_one(
-            {"email": admin_data.email},
-            {"$set": {"role": "admin"}}
-        )
-        return await db.users.find_one({"email": admin_data.email}, {"_id": 0})
-    else:
-        # Create new admin user
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
-        await db.users.insert_one({
-            "user_id": user_id,
-            "email": admin_data.email,
-            "name": admin_data.name,
-            "role": "admin",
-            "is_blocked": False,
-            "created_at": datetime.now(timezone.utc)
-        })
-        return await db.users.find_one({"user_id": user_id}, {"_id": 0})
+    # Promote an existing user or create a new admin user
+    user, created = await upsert_user(
+        admin_data.email,
+        {"role": "admin"},
+        {"name": admin_data.name, "is_blocked": False}
+    )
+    if not created:
+        # Existing sessions carry the old role
+        await revoke_user_sessions(user["user_id"])
+    user.pop("password_hash", None)
+    return user
 
 @api_router.delete("/superadmin/admins/{user_id}")
 async def remove_admin(user_id: str, superadmin: User = Depends(require_superadmin)):
@@ -1308,61 +4814,361 @@ async def remove_admin(user_id: str, superadmin: User = Depends(require_superadm
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Admin not found")
+    await revoke_user_sessions(user_id)
     return {"message": "Admin removed successfully"}
 
 @api_router.put("/superadmin/users/{user_id}")
 async def update_user(user_id: str, updates: Dict[str, Any], superadmin: User = Depends(require_superadmin)):
     # Super admin can update any user field
-    result = await db.users.update_one(
-        {"user_id": user_id},
-        {"$set": updates}
+    version = updates.pop("version", None)
+    if isinstance(updates.get("email"), str):
+        updates["email"] = updates["email"].lower()
+    user = await update_versioned(
+        db.users, {"user_id": user_id}, {"$set": updates}, version, "User not found",
+        projection=USER_DIRECTORY_PROJECTION
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
-    return await db.users.find_one({"user_id": user_id}, {"_id": 0})
+    if {field.split(".")[0] for field in updates} & set(USER_SEARCH_FIELDS):
+        await sync_search_keys(user)
+    await user_export_changed(user_id, updates)
+    if "role" in updates or "is_blocked" in updates:
+        await revoke_user_sessions(user_id)
+    else:
+        session_cache.invalidate_user(user_id)
+    return user
 
 @api_router.delete("/superadmin/users/{user_id}")
-async def delete_user(user_id: str, superadmin: User = Depends(require_superadmin)):
-    # Delete user sessions
-    await db.user_sessions.delete_many({"user_id": user_id})
-    # Delete user registrations
-    await db.registrations.delete_many({"user_id": user_id})
-    # Delete user
+async def delete_user(user_id: str, response: Response, superadmin: User = Depends(require_superadmin)):
     result = await db.users.delete_one({"user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"message": "User deleted successfully"}
+    await revoke_user_sessions(user_id)
+    # Sessions, waitlist entries, registrations and tickets go in the background
+    job = await create_deletion_job("user", user_id, superadmin.user_id)
+    response.status_code = 202
+    return {"message": "User deleted successfully", "job": job}
 
 @api_router.put("/superadmin/registrations/{registration_id}/cancel")
-async def cancel_registration(registration_id: str, superadmin: User = Depends(require_superadmin)):
-    result = await db.registrations.update_one(
-        {"registration_id": registration_id},
-        {"$set": {"status": "cancelled"}}
+async def cancel_registration(
+    registration_id: str,
+    superadmin: User = Depends(require_superadmin),
+    version: Optional[int] = None
+):
+    # Only the transition out of a seat-holding status releases seats
+    query = {"registration_id": registration_id}
+    registration = await db.registrations.find_one_and_update(
+        version_filter({**query, "status": {"$in": ACTIVE_REGISTRATION_STATUSES}}, version),
+        bump_version({"$set": {"status": "cancelled"}}),
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    if result.matched_count == 0:
+    if registration:
+        await return_seats(registration["event_id"], registration_seats(registration))
+        await track_registration_stats({**registration, "status": "active"}, registration)
+        await promote_waitlist(registration["event_id"])
+        await publish_registration(registration)
+        return registration
+    
+    # Already cancelled (idempotent), missing, or a version conflict
+    current = await db.registrations.find_one(query, {"_id": 0})
+    if not current:
         raise HTTPException(status_code=404, detail="Registration not found")
-    return await db.registrations.find_one({"registration_id": registration_id}, {"_id": 0})
+    if version is not None and current.get("version", 0) != version:
+        raise HTTPException(status_code=409, detail=VERSION_CONFLICT)
+    return current
 
 @api_router.delete("/superadmin/registrations/{registration_id}")
 async def delete_registration(registration_id: str, superadmin: User = Depends(require_superadmin)):
-    result = await db.registrations.delete_one({"registration_id": registration_id})
-    if result.deleted_count == 0:
+    deleted = await db.registrations.find_one_and_delete({"registration_id": registration_id}, projection={"_id": 0})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Registration not found")
+    await release_seats(deleted)
+    await track_registration_stats(deleted, None)
+    await registrations_changed(deleted["event_id"])
+    await promote_waitlist(deleted["event_id"])
+    await publish_event_counts(deleted["event_id"])
     return {"message": "Registration deleted successfully"}
 
+# ===== BULK REGISTRATION ACTIONS =====
+# Finalizing an event (certificates, payments, cancellations) in one request:
+# the targets are read once, every eligible registration gets an UpdateOne
+# guarded by the status and version that were read (and, for status
+# changes, the stats generation), and the lot goes out as a single
+# unordered bulk_write. Each write also stamps the batch's token
+# under ``bulk_token.<field>``, so when some writes miss, the ones that
+# landed are read back by token instead of guessed from the version. Seats,
+# the stats rollup and the waitlist are then settled per event rather than
+# per registration.
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '5000'))
+BULK_ACTIONS = {
+    # action: (field set on the registration, statuses it applies to)
+    "certificate": ("certificate_type", ACTIVE_REGISTRATION_STATUSES),
+    "cancel": ("status", ACTIVE_REGISTRATION_STATUSES),
+    "approve_cancellation": ("status", ["cancellation_requested"]),
+    "payment_status": ("payment_status", None)
+}
+BULK_PROJECTION = {
+    "_id": 0, "registration_id": 1, "event_id": 1, "user_id": 1, "status": 1, "version": 1,
+    "team_name": 1, "team_members": 1, "created_at": 1, "profile_snapshot": 1,
+    "certificate_type": 1, "payment_status": 1, "stats_gen": 1
+}
+
+
+def bulk_action_value(data: BulkRegistrationAction) -> str:
+    if data.action == "certificate":
+        value = data.certificate_type
+    elif data.action == "payment_status":
+        value = data.payment_status
+    else:
+        return "cancelled"
+    if not value:
+        raise HTTPException(status_code=400, detail=f"{data.action} requires a {BULK_ACTIONS[data.action][0]} value")
+    return value
+
+
+async def bulk_targets(data: BulkRegistrationAction) -> tuple:
+    """Read the registrations a bulk action addresses. Returns (requested
+    ids, docs by id)."""
+    if (data.registration_ids is None) == (data.event_id is None):
+        raise HTTPException(status_code=400, detail="Provide either registration_ids or event_id")
+    if data.registration_ids is not None:
+        ids = list(dict.fromkeys(data.registration_ids))
+        if not ids or len(ids) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"registration_ids must hold 1-{BULK_MAX_ITEMS} ids")
+        query: Dict[str, Any] = {"registration_id": {"$in": ids}}
+    else:
+        query = {"event_id": data.event_id}
+        if data.status:
+            query["status"] = data.status
+        if await db.registrations.count_documents(query, limit=BULK_MAX_ITEMS + 1) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"More than {BULK_MAX_ITEMS} registrations match; narrow the filter")
+        ids = None
+    docs = await db.registrations.find(query, BULK_PROJECTION).to_list(BULK_MAX_ITEMS)
+    by_id = {doc["registration_id"]: doc for doc in docs}
+    return (ids if ids is not None else list(by_id)), by_id
+
+
+async def bulk_update_registrations(data: BulkRegistrationAction) -> Dict[str, Any]:
+    field, statuses = BULK_ACTIONS[data.action]
+    value = bulk_action_value(data)
+    ids, by_id = await bulk_targets(data)
+    
+    results: Dict[str, str] = {}
+    todo: Dict[str, Dict[str, Any]] = {}
+    for registration_id in ids:
+        doc = by_id.get(registration_id)
+        if doc is None:
+            results[registration_id] = "not_found"
+        elif statuses is not None and doc.get("status", "active") not in statuses:
+            results[registration_id] = "skipped"
+        elif doc.get(field) == value:
+            results[registration_id] = "unchanged"
+        else:
+            todo[registration_id] = doc
+    
+    def bulk_op(doc: Dict[str, Any]) -> UpdateOne:
+        query = {"registration_id": doc["registration_id"], "status": doc.get("status", "active")}
+        if field == "status":
+            # The stats delta goes to the rollup generations of the doc as read
+            query["stats_gen"] = doc.get("stats_gen")
+        return UpdateOne(
+            version_filter(query, doc.get("version", 0)),
+            bump_version({"$set": {field: value, f"bulk_token.{field}": token}})
+        )
+    
+    pending: Dict[str, Dict[str, Any]] = {}
+    token = uuid.uuid4().hex
+    for attempt in range(2):
+        if not todo:
+            break
+        result = await db.registrations.bulk_write([bulk_op(doc) for doc in todo.values()], ordered=False)
+        if result.modified_count == len(todo):
+            pending.update(todo)
+            break
+        # Something changed a registration since it was read; only the
+        # ones carrying this batch's token were written by it
+        written = set(await db.registrations.distinct(
+            "registration_id", {"registration_id": {"$in": list(todo)}, f"bulk_token.{field}": token}
+        ))
+        pending.update({rid: doc for rid, doc in todo.items() if rid in written})
+        missed = {rid: doc for rid, doc in todo.items() if rid not in written}
+        todo = {}
+        if field == "status" and not attempt:
+            # A stats rebuild moving a registration to a new generation is
+            # not a conflict; retry those once with the generation re-read
+            current = await db.registrations.find(
+                {"registration_id": {"$in": list(missed)}},
+                {"_id": 0, "registration_id": 1, "status": 1, "version": 1, "stats_gen": 1}
+            ).to_list(len(missed))
+            for now in current:
+                doc = missed[now["registration_id"]]
+                if now.get("version", 0) == doc.get("version", 0) and now.get("status", "active") == doc.get("status", "active"):
+                    todo[doc["registration_id"]] = {**doc, "stats_gen": now.get("stats_gen")}
+        for registration_id in missed:
+            if registration_id not in todo:
+                results[registration_id] = "conflict"
+    for registration_id in pending:
+        results[registration_id] = "updated"
+    
+    if field == "status" and pending:
+        # Hand the seats back per event, then promote from each waitlist
+        freed: Dict[str, Dict[str, int]] = {}
+        for doc in pending.values():
+            seats = registration_seats(doc)
+            totals = freed.setdefault(doc["event_id"], {"seats_taken": 0, "teams_registered": 0})
+            for k in totals:
+                totals[k] += seats[k]
+        for event_id, seats in freed.items():
+            await return_seats(event_id, seats)
+        await track_registration_stats_many([(doc, {**doc, "status": value}) for doc in pending.values()])
+        await registrations_changed(*freed)
+        for event_id in freed:
+            await promote_waitlist(event_id)
+            await publish_event_counts(event_id)
+    elif pending:
+        await registrations_changed(*{doc["event_id"] for doc in pending.values()})
+    for doc in pending.values():
+        live_hub.publish(
+            [f"user:{doc['user_id']}"], "registration", {**doc, field: value, "version": doc.get("version", 0) + 1}
+        )
+    
+    summary = dict.fromkeys(["updated", "unchanged", "skipped", "conflict", "not_found"], 0)
+    for outcome in results.values():
+        summary[outcome] += 1
+    return {
+        "action": data.action,
+        "requested": len(ids),
+        "summary": summary,
+        "results": [{"registration_id": rid, "result": results[rid]} for rid in ids]
+    }
+
+
+@api_router.post("/superadmin/registrations/bulk")
+async def bulk_registration_action(data: BulkRegistrationAction, superadmin: User = Depends(require_superadmin)):
+    """Issue certificates, cancel, approve cancellation requests or set the
+    payment status for many registrations (ids or a whole event) at once."""
+    if data.action not in BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"action must be one of: {', '.join(BULK_ACTIONS)}")
+    return await bulk_update_registrations(data)
+
+# ===== BULK USER ACTIONS =====
+# Blocking, unblocking or changing the role of a batch of users (say, a
+# graduated year) in one request. The targets are an id list or a directory
+# filter; superadmins and the caller are never touched. The change goes out
+# as one update_many guarded by the same query the ids were read with, and
+# every affected user's sessions are deleted/revoked in a single pass.
+# ``dry_run`` returns the match count and a sample without writing.
+BULK_USER_ACTIONS = {
+    # action: (field set on the user, how sessions are ended)
+    "block": ("is_blocked", "delete"),  # like block_user: sessions are gone for good
+    "unblock": ("is_blocked", None),  # a blocked user holds no sessions
+    "set_role": ("role", "revoke")  # sessions carry the old role
+}
+BULK_USER_ROLES = ["user", "admin"]
+BULK_USER_SAMPLE_SIZE = 20
+BULK_USER_SAMPLE_PROJECTION = {"_id": 0, "user_id": 1, "name": 1, "email": 1, "role": 1, "is_blocked": 1}
+
+
+def bulk_user_query(data: BulkUserAction, superadmin: User) -> tuple:
+    """Build the query for the users a bulk action would change. Returns
+    (query, $set)."""
+    if data.action not in BULK_USER_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"action must be one of: {', '.join(BULK_USER_ACTIONS)}")
+    if (data.user_ids is None) == (data.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either user_ids or filter")
+    if data.user_ids is not None:
+        ids = list(dict.fromkeys(data.user_ids))
+        if not ids or len(ids) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"user_ids must hold 1 to {BULK_MAX_ITEMS} ids")
+        target: Dict[str, Any] = {"user_id": {"$in": ids}}
+    else:
+        target = user_directory_query(**data.filter.model_dump())
+        if not target:
+            raise HTTPException(status_code=400, detail="filter must set at least one field")
+
+    if data.action == "set_role":
+        if data.role not in BULK_USER_ROLES:
+            raise HTTPException(status_code=400, detail=f"role must be one of: {', '.join(BULK_USER_ROLES)}")
+        changes: Dict[str, Any] = {"role": data.role}
+        pending = {"role": {"$ne": data.role}}
+    elif data.action == "block":
+        changes, pending = {"is_blocked": True}, {"is_blocked": {"$ne": True}}
+    else:
+        changes, pending = {"is_blocked": False}, {"is_blocked": True}
+    # Superadmins and the caller are never touched
+    query = {"$and": [target, pending, {"role": {"$ne": "superadmin"}}, {"user_id": {"$ne": superadmin.user_id}}]}
+    return query, changes
+
+
+@api_router.post("/superadmin/users/bulk")
+async def bulk_user_action(data: BulkUserAction, superadmin: User = Depends(require_superadmin)):
+    """Block, unblock or set the role of many users (ids or a directory
+    filter) at once, revoking the affected sessions in one pass."""
+    query, changes = bulk_user_query(data, superadmin)
+    requested = len(set(data.user_ids)) if data.user_ids is not None else None
+    if data.dry_run:
+        matched, sample = await asyncio.gather(
+            db.users.count_documents(query),
+            db.users.find(query, BULK_USER_SAMPLE_PROJECTION).limit(BULK_USER_SAMPLE_SIZE).to_list(BULK_USER_SAMPLE_SIZE)
+        )
+        return {"action": data.action, "dry_run": True, "requested": requested, "matched": matched, "sample": sample}
+
+    user_ids = [u["user_id"] async for u in db.users.find(query, {"_id": 0, "user_id": 1}).limit(BULK_MAX_ITEMS + 1)]
+    if len(user_ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Filter matches more than {BULK_MAX_ITEMS} users; narrow it")
+    if not user_ids:
+        return {"action": data.action, "dry_run": False, "requested": requested, "matched": 0, "updated": 0, "sessions_deleted": 0}
+
+    # A user changed since the read no longer matches and is left alone
+    result = await db.users.update_many(
+        {"$and": [query, {"user_id": {"$in": user_ids}}]}, bump_version({"$set": changes})
+    )
+    sessions = BULK_USER_ACTIONS[data.action][1]
+    sessions_deleted = 0
+    if sessions == "delete":
+        sessions_deleted = (await db.user_sessions.delete_many({"user_id": {"$in": user_ids}})).deleted_count
+    if sessions:
+        await revoke_users_sessions(user_ids)
+    logging.info(f"✓ Bulk {data.action} by {superadmin.user_id}: {result.modified_count} users updated")
+    return {
+        "action": data.action,
+        "dry_run": False,
+        "requested": requested,
+        "matched": len(user_ids),
+        "updated": result.modified_count,
+        "sessions_deleted": sessions_deleted
+    }
+
 @api_router.put("/superadmin/registrations/{registration_id}/certificate")
 async def issue_certificate(
     registration_id: str,
     cert_data: CertificateIssue,
     superadmin: User = Depends(require_superadmin)
 ):
-    result = await db.registrations.update_one(
+    registration = await update_versioned(
+        db.registrations,
         {"registration_id": registration_id},
-        {"$set": {"certificate_type": cert_data.certificate_type}}
+        {"$set": {"certificate_type": cert_data.certificate_type}},
+        cert_data.version,
+        "Registration not found"
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Registration not found")
-    return await db.registrations.find_one({"registration_id": registration_id}, {"_id": 0})
+    await registrations_changed(registration["event_id"])
+    return registration
+
+def apply_set(doc: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """What ``{"$set": updates}`` turns ``doc`` into, dotted paths included
+    (numeric parts index into arrays)."""
+    doc = copy.deepcopy(doc)
+    for path, value in updates.items():
+        *parents, last = path.split(".")
+        node = doc
+        for part in parents:
+            node = node[int(part)] if isinstance(node, list) else node.setdefault(part, {})
+        if isinstance(node, list):
+            node[int(last)] = value
+        else:
+            node[last] = value
+    return doc
+
 
 @api_router.put("/superadmin/registrations/{registration_id}")
 async def update_registration(
@@ -1370,107 +5176,157 @@ async def update_registration(
     updates: Dict[str, Any],
     superadmin: User = Depends(require_superadmin)
 ):
-    result = await db.registrations.update_one(
-        {"registration_id": registration_id},
-        {"$set": updates}
+    # The pre-image is needed for the seat delta; the post-image is derived
+    # from it, so both describe this write alone
+    version = updates.pop("version", None)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    locked = sorted({key.split(".")[0] for key in updates} & REGISTRATION_IMMUTABLE_FIELDS)
+    if locked:
+        raise HTTPException(status_code=400, detail=f"Cannot change {', '.join(locked)}")
+    query = {"registration_id": registration_id}
+    previous = await db.registrations.find_one_and_update(
+        version_filter(query, version),
+        bump_version({"$set": updates}),
+        projection={"_id": 0}
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Registration not found")
-    return await db.registrations.find_one({"registration_id": registration_id}, {"_id": 0})
+    if not previous:
+        raise await write_miss(db.registrations, query, version, "Registration not found")
+    registration = {**apply_set(previous, updates), "version": previous.get("version", 0) + 1}
+    # Status/team edits change how many seats the registration holds
+    await adjust_held_seats(previous, registration)
+    await track_registration_stats(previous, registration)
+    await registrations_changed(previous["event_id"])
+    await promote_waitlist(previous["event_id"])
+    return registration
+
+# ===== SYSTEM CONFIG =====
+# The system_settings document carries a `version` that every update
+# increments. Each worker holds the config as an immutable snapshot with
+# its /config and /auth/profile-options bodies serialized once per version,
+# so requests never read Mongo for it. An update installs the new snapshot
+# on the writing worker at once; other workers reload when the catalog
+# version poller sees the catalog version move (config updates bump it).
+# Stored values are layered over DEFAULT_SYSTEM_CONFIG, so keys added later
+# always have a value. Snapshot values are shared: treat them as read-only.
+SYSTEM_CONFIG_KEY = "system_settings"
+DEFAULT_SYSTEM_CONFIG: Dict[str, Any] = {
+    "colleges": [],
+    "departments": [],
+    "divisions": [],
+    "years": [],
+    "popup_enabled": False,
+    "popup_type": "instagram",
+    "popup_content": {},
+    "required_fields": ["name", "email", "phone", "college"],
+    "social_links": {
+        "instagram": "",
+        "facebook": "",
+        "whatsapp": "",
+        "linkedin": "",
+        "twitter": "",
+        "youtube": "",
+        "website": ""
+    },
+    "support_email": "",
+    "support_phone": "",
+    "help_link": "",
+    "terms_link": "",
+    "privacy_link": "",
+    "about_link": "",
+    "event_registration_enabled": True,
+    "max_team_size": 5,
+    "custom_footer_text": ""
+}
+PROFILE_OPTION_KEYS = ("colleges", "departments", "divisions", "years")
+
+
+class ConfigSnapshot:
+    __slots__ = ("version", "value", "bodies")
+
+    def __init__(self, version: int, stored: Dict[str, Any]):
+        self.version = version
+        self.value = {**DEFAULT_SYSTEM_CONFIG, **stored}
+        profile_options = {key: self.value.get(key, []) for key in PROFILE_OPTION_KEYS}
+        self.bodies = {
+            name: json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+            for name, payload in (("config", self.value), ("profile-options", profile_options))
+        }
+
+    def response(self, request: Request, name: str) -> Response:
+        etag = f'"{name}-{self.version}"'
+        headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.bodies[name], media_type="application/json", headers=headers)
+
+
+_config_snapshot: Optional[ConfigSnapshot] = None
+
+
+def install_system_config(doc: Optional[Dict[str, Any]]) -> ConfigSnapshot:
+    """Adopt ``doc`` unless this worker already holds a newer version."""
+    global _config_snapshot
+    version = (doc or {}).get("version", 0)
+    if _config_snapshot is None or version > _config_snapshot.version:
+        _config_snapshot = ConfigSnapshot(version, (doc or {}).get("config_value") or {})
+    return _config_snapshot
+
+
+async def load_system_config() -> ConfigSnapshot:
+    doc = await db.system_config.find_one(
+        {"config_key": SYSTEM_CONFIG_KEY}, {"_id": 0, "config_value": 1, "version": 1}
+    )
+    return install_system_config(doc)
+
+
+async def refresh_system_config():
+    """Reload the snapshot if the stored version moved (one tiny read otherwise)."""
+    doc = await db.system_config.find_one({"config_key": SYSTEM_CONFIG_KEY}, {"_id": 0, "version": 1})
+    if _config_snapshot is None or (doc or {}).get("version", 0) != _config_snapshot.version:
+        await load_system_config()
+
+
+async def current_system_config() -> ConfigSnapshot:
+    if _config_snapshot is None:
+        return await load_system_config()
+    return _config_snapshot
+
+
+async def get_system_config() -> Dict[str, Any]:
+    return (await current_system_config()).value
+
 
 # System Configuration Routes
 @api_router.get("/config")
-async def get_system_config():
-    config = await db.system_config.find_one({"config_key": "system_settings"}, {"_id": 0})
-    if not config:
-        # Return default config
-        return {
-            "colleges": [],
-            "departments": [],
-            "divisions": [],
-            "years": [],
-            "popup_enabled": False,
-            "popup_type": "instagram",
-            "popup_content": {},
-            "required_fields": ["name", "email", "phone", "college"],
-            "social_links": {
-                "instagram": "",
-                "facebook": "",
-                "whatsapp": "",
-                "linkedin": "",
-                "twitter": "",
-                "youtube": "",
-                "website": ""
-            },
-            "support_email": "",
-            "support_phone": "",
-            "help_link": "",
-            "terms_link": "",
-            "privacy_link": "",
-            "about_link": "",
-            "event_registration_enabled": True,
-            "max_team_size": 5,
-            "custom_footer_text": ""
-        }
-    return config.get("config_value", {})
+async def get_public_config(request: Request):
+    return (await current_system_config()).response(request, "config")
 
 @api_router.put("/superadmin/config")
 async def update_system_config(
     config_update: SystemConfigUpdate,
     superadmin: User = Depends(require_superadmin)
 ):
-    existing_config = await db.system_config.find_one({"config_key": "system_settings"}, {"_id": 0})
-    
-    if existing_config:
-        current_value = existing_config.get("config_value", {})
-    else:
-        current_value = {
-            "colleges": [],
-            "departments": [],
-            "divisions": [],
-            "years": [],
-            "popup_enabled": False,
-            "popup_type": "instagram",
-            "popup_content": {},
-            "required_fields": ["name", "email", "phone", "college"],
-            "social_links": {
-                "instagram": "",
-                "facebook": "",
-                "whatsapp": "",
-                "linkedin": "",
-                "twitter": "",
-                "youtube": "",
-                "website": ""
-            },
-            "support_email": "",
-            "support_phone": "",
-            "help_link": "",
-            "terms_link": "",
-            "privacy_link": "",
-            "about_link": "",
-            "event_registration_enabled": True,
-            "max_team_size": 5,
-            "custom_footer_text": ""
-        }
-    
-    # Update only provided fields
+    # Only the provided fields are written, so concurrent updates of
+    # different fields don't overwrite each other
     update_data = config_update.model_dump(exclude_none=True)
-    for key, value in update_data.items():
-        current_value[key] = value
-    
-    # Upsert config
-    await db.system_config.update_one(
-        {"config_key": "system_settings"},
+    doc = await db.system_config.find_one_and_update(
+        {"config_key": SYSTEM_CONFIG_KEY},
         {
             "$set": {
-                "config_value": current_value,
+                **{f"config_value.{key}": value for key, value in update_data.items()},
                 "updated_at": datetime.now(timezone.utc)
-            }
+            },
+            "$inc": {"version": 1}
         },
-        upsert=True
+        projection={"_id": 0, "config_value": 1, "version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
+    snapshot = install_system_config(doc)
+    await bump_catalog_version()
     
-    return current_value
+    return snapshot.value
 
 # Include router
 app.include_router(api_router)
@@ -1496,6 +5352,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 logging.basicConfig(
@@ -0,0 +1,39 @@
+import { useEffect, useRef } from 'react'
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL
+
+// Subscribe to server-sent live updates. `handlers` maps event names
+// (e.g. 'ticket_reply', 'registration_counts') to callbacks receiving the
+// parsed payload. The server ends the stream of a client that fell behind
+// and the browser reconnects on its own; `onReconnect` lets the page reload
+// whatever it missed meanwhile.
+export function useLiveUpdates(topics, handlers, onReconnect) {
+  const handlersRef = useRef(handlers)
+  const reconnectRef = useRef(onReconnect)
+  handlersRef.current = handlers
+  reconnectRef.current = onReconnect
+
+  const key = topics.join(',')
+  const eventNames = Object.keys(handlers).join(',')
+
+  useEffect(() => {
+    if (!key) return undefined
+    const source = new EventSource(
+      `${BACKEND_URL}/api/stream?topics=${encodeURIComponent(key)}`,
+      { withCredentials: true }
+    )
+    const listeners = eventNames.split(',').filter(Boolean).map((name) => {
+      const listener = (e) => handlersRef.current[name]?.(JSON.parse(e.data))
+      source.addEventListener(name, listener)
+      return [name, listener]
+    })
+    const onEvicted = () => reconnectRef.current?.()
+    source.addEventListener('evicted', onEvicted)
+
+    return () => {
+      listeners.forEach(([name, listener]) => source.removeEventListener(name, listener))
+      source.removeEventListener('evicted', onEvicted)
+      source.close()
+    }
+  }, [key, eventNames])
+}
@@ -0,0 +1,23 @@
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const PAGE_SIZE = 500; // the server's PAGE_SIZE_MAX
+
+// Load every row of a keyset-paginated list endpoint (`path` plus query
+// `params`), following `next_cursor` until the server reports no more.
+// Without `limit`/`cursor` those endpoints answer with a bare list that
+// stops at a fixed size, so pages that show a whole list go through here.
+export async function fetchAllPages(path, params = {}) {
+  const items = [];
+  let cursor = null;
+  do {
+    const query = new URLSearchParams({ ...params, limit: String(PAGE_SIZE) });
+    if (cursor) query.set('cursor', cursor);
+    const response = await fetch(`${BACKEND_URL}${path}?${query}`, {
+      credentials: 'include'
+    });
+    if (!response.ok) throw new Error(`Request failed (${response.status})`);
+    const data = await response.json();
+    items.push(...data.items);
+    cursor = data.next_cursor;
+  } while (cursor);
+  return items;
+}
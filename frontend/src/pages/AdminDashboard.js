@@ -1,7 +1,8 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Calendar, Users, TrendingUp, UserCheck, Eye } from 'lucide-react';
 import { toast } from 'sonner';
+import { useLiveUpdates } from '../hooks/useLiveUpdates';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -10,10 +11,23 @@ export default function AdminDashboard() {
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
 
+  const refreshTimer = useRef(null);
+
   useEffect(() => {
     fetchAnalytics();
+    return () => clearTimeout(refreshTimer.current);
   }, []);
 
+  // Registration counts change in bursts; refresh at most every few seconds
+  const scheduleRefresh = () => {
+    if (refreshTimer.current) return;
+    refreshTimer.current = setTimeout(() => {
+      refreshTimer.current = null;
+      fetchAnalytics();
+    }, 3000);
+  };
+  useLiveUpdates(['registrations'], { registration_counts: scheduleRefresh }, () => fetchAnalytics());
+
   const fetchAnalytics = async () => {
     try {
       const response = await fetch(`${BACKEND_URL}/api/admin/analytics`, {
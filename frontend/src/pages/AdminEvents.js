@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Plus, Edit, Trash2, Calendar, Settings, FileText, Copy } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -46,11 +47,7 @@ export default function AdminEvents() {
 
   const fetchEvents = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/events`, {
-        credentials: 'include'
-      });
-      const data = await response.json();
-      setEvents(data);
+      setEvents(await fetchAllPages('/api/events'));
     } catch (error) {
       toast.error('Failed to load events');
     } finally {
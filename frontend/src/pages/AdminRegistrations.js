@@ -1,6 +1,7 @@
 import { useState, useEffect, useCallback } from 'react';
 import { Download, Users, Filter, Award, XCircle, Trash2, Eye } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -28,11 +29,7 @@ export default function AdminRegistrations() {
 
   const fetchEvents = useCallback(async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/events`, {
-        credentials: 'include'
-      });
-      const data = await response.json();
-      setEvents(data);
+      setEvents(await fetchAllPages('/api/events'));
     } catch (error) {
       console.error('Failed to load events');
     }
@@ -40,15 +37,8 @@ export default function AdminRegistrations() {
 
   const fetchRegistrations = useCallback(async () => {
     try {
-      const params = new URLSearchParams();
-      if (eventFilter) params.append('event_id', eventFilter);
-
-      const response = await fetch(`${BACKEND_URL}/api/admin/registrations?${params}`, {
-        credentials: 'include'
-      });
-      if (!response.ok) throw new Error('Failed to load registrations');
-      const data = await response.json();
-      setRegistrations(data);
+      const params = eventFilter ? { event_id: eventFilter } : {};
+      setRegistrations(await fetchAllPages('/api/admin/registrations', params));
     } catch (error) {
       toast.error('Failed to load registrations');
     } finally {
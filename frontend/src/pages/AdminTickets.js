@@ -1,6 +1,8 @@
 import { useState, useEffect } from 'react';
 import { MessageCircle, Clock, CheckCircle, Send, X } from 'lucide-react';
 import { toast } from 'sonner';
+import { useLiveUpdates } from '../hooks/useLiveUpdates';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -10,19 +12,31 @@ export default function AdminTickets() {
   const [selectedTicket, setSelectedTicket] = useState(null);
   const [replyMessage, setReplyMessage] = useState('');
   const [submitting, setSubmitting] = useState(false);
+  const [replies, setReplies] = useState([]);
+  const [repliesCursor, setRepliesCursor] = useState(null);
 
   useEffect(() => {
     fetchTickets();
   }, []);
 
+  // New tickets, replies and closures from other admins
+  const onTicketChange = ({ ticket, reply }) => {
+    fetchTickets();
+    if (selectedTicket?.ticket_id !== ticket.ticket_id) return;
+    setSelectedTicket((prev) => ({ ...prev, ...ticket }));
+    if (reply && !repliesCursor) {
+      setReplies((prev) => (prev.some((r) => r.reply_id === reply.reply_id) ? prev : [...prev, reply]));
+    }
+  };
+  useLiveUpdates(
+    ['tickets'],
+    { ticket_created: onTicketChange, ticket_reply: onTicketChange, ticket_closed: onTicketChange },
+    () => fetchTickets()
+  );
+
   const fetchTickets = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/admin/tickets`, {
-        credentials: 'include'
-      });
-      if (!response.ok) throw new Error('Failed to load tickets');
-      const data = await response.json();
-      setTickets(data);
+      setTickets(await fetchAllPages('/api/admin/tickets'));
     } catch (error) {
       toast.error('Failed to load tickets');
     } finally {
@@ -30,6 +44,29 @@ export default function AdminTickets() {
     }
   };
 
+  const loadReplies = async (ticketId, cursor = null) => {
+    try {
+      const params = new URLSearchParams({ limit: '50' });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${BACKEND_URL}/api/tickets/${ticketId}/replies?${params}`, {
+        credentials: 'include'
+      });
+      if (!response.ok) throw new Error('Failed to load replies');
+      const data = await response.json();
+      setReplies((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setRepliesCursor(data.next_cursor);
+    } catch (error) {
+      toast.error('Failed to load replies');
+    }
+  };
+
+  const selectTicket = (ticket) => {
+    setSelectedTicket(ticket);
+    setReplies([]);
+    setRepliesCursor(null);
+    loadReplies(ticket.ticket_id);
+  };
+
   const handleReply = async (e) => {
     e.preventDefault();
     if (!replyMessage.trim()) return;
@@ -47,8 +84,12 @@ export default function AdminTickets() {
       toast.success('Reply sent successfully');
       setReplyMessage('');
       fetchTickets();
-      const updated = await response.json();
+      const { reply, ...updated } = await response.json();
       setSelectedTicket(updated);
+      // Replies are oldest first; the new one belongs at the end once loaded
+      if (!repliesCursor) {
+        setReplies((prev) => (prev.some((r) => r.reply_id === reply.reply_id) ? prev : [...prev, reply]));
+      }
     } catch (error) {
       toast.error('Failed to send reply');
     } finally {
@@ -105,7 +146,7 @@ export default function AdminTickets() {
               {tickets.map((ticket) => (
                 <div
                   key={ticket.ticket_id}
-                  onClick={() => setSelectedTicket(ticket)}
+                  onClick={() => selectTicket(ticket)}
                   data-testid={`admin-ticket-${ticket.ticket_id}`}
                   className={`bg-white rounded-xl border p-4 cursor-pointer transition-all ${
                     selectedTicket?.ticket_id === ticket.ticket_id
@@ -123,7 +164,7 @@ export default function AdminTickets() {
                   <p className="text-xs text-slate-600 line-clamp-2">{ticket.message}</p>
                   <div className="mt-2 flex items-center justify-between">
                     <span className="text-xs text-slate-500">{ticket.user?.name}</span>
-                    <span className="text-xs text-indigo-600">{ticket.replies?.length || 0} replies</span>
+                    <span className="text-xs text-indigo-600">{ticket.reply_count || 0} replies</span>
                   </div>
                 </div>
               ))}
@@ -162,7 +203,7 @@ export default function AdminTickets() {
                       <p className="text-xs text-slate-500 mt-2">{new Date(selectedTicket.created_at).toLocaleString()}</p>
                     </div>
 
-                    {selectedTicket.replies && selectedTicket.replies.map((reply) => (
+                    {replies.map((reply) => (
                       <div key={reply.reply_id} className="bg-indigo-50 rounded-xl p-4">
                         <div className="flex items-center space-x-2 mb-2">
                           <span className="text-sm font-semibold text-indigo-900">{reply.user_name}</span>
@@ -172,6 +213,14 @@ export default function AdminTickets() {
                         <p className="text-xs text-slate-500 mt-2">{new Date(reply.created_at).toLocaleString()}</p>
                       </div>
                     ))}
+                    {repliesCursor && (
+                      <button
+                        onClick={() => loadReplies(selectedTicket.ticket_id, repliesCursor)}
+                        className="text-sm text-indigo-600 hover:text-indigo-700 font-medium"
+                      >
+                        Load more replies
+                      </button>
+                    )}
                   </div>
 
                   {selectedTicket.status !== 'closed' && (
@@ -2,6 +2,7 @@ import { useState, useEffect, useCallback } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { ArrowLeft, Mail, Phone, BookOpen, Hash, MapPin, Calendar, User as UserIcon, Shield, CheckCircle, XCircle } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -25,13 +26,9 @@ export default function AdminUserProfile() {
       setUser(userData);
 
       // Fetch user registrations
-      const regResponse = await fetch(`${BACKEND_URL}/api/admin/registrations?user_id=${userId}`, {
-        credentials: 'include'
-      });
-      if (regResponse.ok) {
-        const regData = await regResponse.json();
-        setRegistrations(Array.isArray(regData) ? regData : []);
-      } else {
+      try {
+        setRegistrations(await fetchAllPages('/api/admin/registrations', { user_id: userId }));
+      } catch (regError) {
         // Don't fail if registrations fail to load, just continue
         console.warn('Failed to load registrations');
       }
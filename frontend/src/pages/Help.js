@@ -1,6 +1,8 @@
 import { useState, useEffect } from 'react';
 import { HelpCircle, Plus, MessageCircle, Clock, CheckCircle, XCircle } from 'lucide-react';
 import { toast } from 'sonner';
+import { useLiveUpdates } from '../hooks/useLiveUpdates';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -12,19 +14,27 @@ export default function Help() {
   const [subject, setSubject] = useState('');
   const [message, setMessage] = useState('');
   const [submitting, setSubmitting] = useState(false);
+  const [replies, setReplies] = useState([]);
+  const [repliesCursor, setRepliesCursor] = useState(null);
 
   useEffect(() => {
     fetchTickets();
   }, []);
 
+  // Replies and status changes on the student's own tickets
+  const onTicketChange = ({ ticket, reply }) => {
+    fetchTickets();
+    if (selectedTicket?.ticket_id !== ticket.ticket_id) return;
+    setSelectedTicket((prev) => ({ ...prev, ...ticket }));
+    if (reply && !repliesCursor) {
+      setReplies((prev) => (prev.some((r) => r.reply_id === reply.reply_id) ? prev : [...prev, reply]));
+    }
+  };
+  useLiveUpdates(['user:me'], { ticket_reply: onTicketChange, ticket_closed: onTicketChange }, () => fetchTickets());
+
   const fetchTickets = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/tickets`, {
-        credentials: 'include'
-      });
-      if (!response.ok) throw new Error('Failed to load tickets');
-      const data = await response.json();
-      setTickets(data);
+      setTickets(await fetchAllPages('/api/tickets'));
     } catch (error) {
       toast.error('Failed to load tickets');
     } finally {
@@ -32,6 +42,29 @@ export default function Help() {
     }
   };
 
+  const loadReplies = async (ticketId, cursor = null) => {
+    try {
+      const params = new URLSearchParams({ limit: '50' });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${BACKEND_URL}/api/tickets/${ticketId}/replies?${params}`, {
+        credentials: 'include'
+      });
+      if (!response.ok) throw new Error('Failed to load replies');
+      const data = await response.json();
+      setReplies((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setRepliesCursor(data.next_cursor);
+    } catch (error) {
+      toast.error('Failed to load replies');
+    }
+  };
+
+  const selectTicket = (ticket) => {
+    setSelectedTicket(ticket);
+    setReplies([]);
+    setRepliesCursor(null);
+    loadReplies(ticket.ticket_id);
+  };
+
   const handleCreateTicket = async (e) => {
     e.preventDefault();
     setSubmitting(true);
@@ -124,7 +157,7 @@ export default function Help() {
             {tickets.map((ticket) => (
               <div
                 key={ticket.ticket_id}
-                onClick={() => setSelectedTicket(ticket)}
+                onClick={() => selectTicket(ticket)}
                 data-testid={`ticket-${ticket.ticket_id}`}
                 className="bg-white rounded-xl border border-slate-200 p-6 shadow-sm hover:shadow-md transition-all cursor-pointer"
               >
@@ -142,7 +175,7 @@ export default function Help() {
                 </div>
                 <div className="flex items-center justify-between text-sm text-slate-500">
                   <span>{new Date(ticket.created_at).toLocaleDateString()}</span>
-                  <span>{ticket.replies?.length || 0} replies</span>
+                  <span>{ticket.reply_count || 0} replies</span>
                 </div>
               </div>
             ))}
@@ -231,10 +264,10 @@ export default function Help() {
               <p className="text-xs text-slate-500 mt-2">{new Date(selectedTicket.created_at).toLocaleString()}</p>
             </div>
 
-            {selectedTicket.replies && selectedTicket.replies.length > 0 && (
+            {replies.length > 0 && (
               <div className="space-y-4">
                 <h3 className="font-semibold text-slate-900">Replies</h3>
-                {selectedTicket.replies.map((reply) => (
+                {replies.map((reply) => (
                   <div key={reply.reply_id} className="bg-indigo-50 rounded-xl p-4">
                     <div className="flex items-center space-x-2 mb-2">
                       <span className="text-sm font-semibold text-indigo-900">{reply.user_name}</span>
@@ -244,6 +277,14 @@ export default function Help() {
                     <p className="text-xs text-slate-500 mt-2">{new Date(reply.created_at).toLocaleString()}</p>
                   </div>
                 ))}
+                {repliesCursor && (
+                  <button
+                    onClick={() => loadReplies(selectedTicket.ticket_id, repliesCursor)}
+                    className="text-sm text-indigo-600 hover:text-indigo-700 font-medium"
+                  >
+                    Load more replies
+                  </button>
+                )}
               </div>
             )}
           </div>
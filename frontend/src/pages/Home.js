@@ -2,6 +2,7 @@ import { useState, useEffect, useCallback } from 'react';
 import { Link } from 'react-router-dom';
 import { Search, Calendar, Users, MapPin, Filter } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -23,16 +24,12 @@ export default function Home() {
         return;
       }
 
-      const params = new URLSearchParams();
-      if (eventTypeFilter) params.append('event_type', eventTypeFilter);
-      if (categoryFilter) params.append('category', categoryFilter);
-      if (search) params.append('search', search);
+      const params = {};
+      if (eventTypeFilter) params.event_type = eventTypeFilter;
+      if (categoryFilter) params.category = categoryFilter;
+      if (search) params.search = search;
 
-      const response = await fetch(`${BACKEND_URL}/api/events?${params}`, {
-        credentials: 'include'
-      });
-      const data = await response.json();
-      setEvents(data);
+      setEvents(await fetchAllPages('/api/events', params));
     } catch (error) {
       console.error('Failed to load events', error);
       // Don't show toast error for development; just set empty events
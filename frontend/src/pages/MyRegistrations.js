@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Calendar, MapPin, Users, CheckCircle, Clock, Eye } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchAllPages } from '../lib/api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -14,12 +15,7 @@ export default function MyRegistrations() {
 
   const fetchRegistrations = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/registrations`, {
-        credentials: 'include'
-      });
-      if (!response.ok) throw new Error('Failed to load registrations');
-      const data = await response.json();
-      setRegistrations(data);
+      setRegistrations(await fetchAllPages('/api/registrations'));
     } catch (error) {
       toast.error('Failed to load registrations');
     } finally {
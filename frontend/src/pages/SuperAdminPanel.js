@@ -1,30 +1,61 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { Users, Shield, Ban, Check, Trash2, UserPlus, Award, XCircle, FormInput } from 'lucide-react';
+import { Users, Shield, Ban, Check, Trash2, UserPlus, Award, XCircle, FormInput, Search } from 'lucide-react';
 import { toast } from 'sonner';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
 export default function SuperAdminPanel() {
   const navigate = useNavigate();
-  const [users, setUsers] = useState([]);
+  const [admins, setAdmins] = useState([]);
+  const [students, setStudents] = useState([]);
+  const [studentsTotal, setStudentsTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [search, setSearch] = useState('');
+  const [blockedFilter, setBlockedFilter] = useState('');
   const [loading, setLoading] = useState(true);
   const [showAddAdmin, setShowAddAdmin] = useState(false);
   const [newAdminEmail, setNewAdminEmail] = useState('');
   const [newAdminName, setNewAdminName] = useState('');
 
   useEffect(() => {
-    fetchUsers();
+    fetchAdmins();
   }, []);
 
-  const fetchUsers = async () => {
+  // Search runs on the server; wait for a pause in typing
+  useEffect(() => {
+    const timer = setTimeout(() => fetchStudents(), 300);
+    return () => clearTimeout(timer);
+  }, [search, blockedFilter]);
+
+  const fetchAdmins = async () => {
+    try {
+      const response = await fetch(`${BACKEND_URL}/api/superadmin/users?role=admin,superadmin&limit=200`, {
+        credentials: 'include'
+      });
+      if (!response.ok) throw new Error('Failed to load admins');
+      const data = await response.json();
+      setAdmins(data.items);
+    } catch (error) {
+      toast.error('Failed to load admins');
+    }
+  };
+
+  const fetchStudents = async (cursor = null) => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/superadmin/users`, {
+      const params = new URLSearchParams({ role: 'user', limit: '50' });
+      if (search.trim()) params.set('q', search.trim());
+      if (blockedFilter) params.set('is_blocked', blockedFilter);
+      if (cursor) params.set('cursor', cursor);
+      else params.set('include_total', 'true');
+      const response = await fetch(`${BACKEND_URL}/api/superadmin/users?${params}`, {
         credentials: 'include'
       });
       if (!response.ok) throw new Error('Failed to load users');
       const data = await response.json();
-      setUsers(data);
+      setStudents((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
+      if (!cursor) setStudentsTotal(data.total);
     } catch (error) {
       toast.error('Failed to load users');
     } finally {
@@ -32,6 +63,11 @@ export default function SuperAdminPanel() {
     }
   };
 
+  const fetchUsers = () => {
+    fetchAdmins();
+    fetchStudents();
+  };
+
   const handleBlockUser = async (userId) => {
     if (!window.confirm('Are you sure you want to block this user?')) return;
     try {
@@ -111,9 +147,6 @@ export default function SuperAdminPanel() {
     }
   };
 
-  const admins = users.filter(u => u.role === 'admin' || u.role === 'superadmin');
-  const students = users.filter(u => u.role === 'user');
-
   return (
     <div className="min-h-screen bg-slate-50 pb-20 md:pb-8 md:pt-16">
       <div className="max-w-7xl mx-auto px-4 py-6">
@@ -215,10 +248,33 @@ export default function SuperAdminPanel() {
           <div className="flex items-center space-x-3 mb-6">
             <Users className="w-6 h-6 text-indigo-600" />
             <h2 className="text-2xl font-bold text-slate-900" style={{ fontFamily: 'Outfit, sans-serif' }}>
-              Students ({students.length})
+              Students ({studentsTotal})
             </h2>
           </div>
 
+          <div className="flex flex-col md:flex-row gap-3 mb-6">
+            <div className="relative flex-1">
+              <Search className="w-5 h-5 text-slate-400 absolute left-3 top-1/2 -translate-y-1/2" />
+              <input
+                type="text"
+                value={search}
+                onChange={(e) => setSearch(e.target.value)}
+                data-testid="student-search"
+                placeholder="Search by name, email or PRN"
+                className="w-full h-12 pl-10 pr-4 bg-slate-50 border border-slate-200 rounded-lg focus:outline-none focus:ring-2 focus:ring-indigo-500 focus:border-indigo-500"
+              />
+            </div>
+            <select
+              value={blockedFilter}
+              onChange={(e) => setBlockedFilter(e.target.value)}
+              className="h-12 px-4 bg-slate-50 border border-slate-200 rounded-lg focus:outline-none focus:ring-2 focus:ring-indigo-500"
+            >
+              <option value="">All students</option>
+              <option value="false">Active</option>
+              <option value="true">Blocked</option>
+            </select>
+          </div>
+
           {loading ? (
             <div className="flex justify-center py-12">
               <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-indigo-600"></div>
@@ -273,6 +329,14 @@ export default function SuperAdminPanel() {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  onClick={() => fetchStudents(nextCursor)}
+                  className="w-full bg-slate-100 hover:bg-slate-200 text-slate-700 rounded-lg px-4 py-3 font-medium transition-all"
+                >
+                  Load more
+                </button>
+              )}
             </div>
           )}
         </div>